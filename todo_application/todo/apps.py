@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class TodoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'todo'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from . import signals, metrics  # noqa: F401
+
+        connection_created.connect(metrics.install_query_recorder)
@@ -0,0 +1,228 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAcceptable, NotAuthenticated, Throttled
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.parsers import JSONParser, FormParser, MultiPartParser
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from . import (serializers, paginations, models, filters, renderers, cache, routers, events, tasks, authentication,
+               throttling, idempotency)
+
+"""
+    async versions of the todo apis for deployments under asgi
+    (uvicorn todo_application.asgi:application).
+    they answer exactly like the views in views.py, but every query goes
+    through the async orm so a request waiting on the database does not
+    hold a worker thread of its own. drf views are sync only, so these are
+    plain django views that reuse the serializers, filters and paginators.
+    they authenticate the token with the async orm too, and like the sync
+    views only see the todos of its user.
+"""
+
+
+class AsyncApiView(View):
+    """
+    the small part of drf APIView we need: request parsing, rendering in
+    the negotiated format, token authentication, throttling and turning api
+    exceptions into responses
+    """
+    parser_classes = (JSONParser, FormParser, MultiPartParser)
+    # the browsable api needs a drf view
+    renderer_classes = tuple(
+        renderer for renderer in api_settings.DEFAULT_RENDERER_CLASSES if renderer.format != 'api'
+    ) or (renderers.FastJSONRenderer,)
+    content_negotiation_class = DefaultContentNegotiation
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # like drf APIView, clients send a token, not a session cookie a
+        # foreign page could ride on, so CsrfViewMiddleware must let them in
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        request = Request(request, parsers=[parser() for parser in self.parser_classes])
+        self.renderer = self.select_renderer(request)
+        try:
+            await self.authenticate(request)
+            await sync_to_async(self.check_throttles)(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            response = self.render(detail, status=exc.status_code)
+            if isinstance(exc, NotAuthenticated):
+                response.headers['WWW-Authenticate'] = authentication.KEYWORD
+            if getattr(exc, 'wait', None) is not None:
+                response.headers['Retry-After'] = '%d' % exc.wait
+            return response
+
+    async def authenticate(self, request):
+        user = await authentication.aauthenticate(request)
+        if user is None:
+            raise NotAuthenticated()
+        request.user = user
+
+    def check_throttles(self, request):
+        waits = []
+        for throttle in [throttle_class() for throttle_class in self.throttle_classes]:
+            if not throttle.allow_request(request, self):
+                waits.append(throttle.wait())
+        if waits:
+            raise Throttled(max(waits))
+
+    def select_renderer(self, request):
+        renderers_ = [renderer() for renderer in self.renderer_classes]
+        try:
+            return self.content_negotiation_class().select_renderer(request, renderers_)[0]
+        except NotAcceptable:
+            return renderers_[0]
+
+    def render(self, data=None, status=status.HTTP_200_OK):
+        content = self.renderer.render(data)
+        content_type = self.renderer.media_type if content else None
+        response = HttpResponse(content, status=status, content_type=content_type)
+        # like a drf Response, an idempotency key keeps it
+        response.data = data
+        return response
+
+
+class AsyncTodoListCreateView(AsyncApiView):
+    """
+    this api do post and get http method
+    """
+    serializer_class = serializers.ToDoSerializer
+    read_serializer_class = serializers.ToDoReadSerializer
+    pagination_class = paginations.CustomPagination
+    cursor_pagination_class = paginations.CustomCursorPagination
+    throttle_scope = 'todo_list'
+
+    def get_throttle_cost(self, request):
+        if request.method != 'GET':
+            return 1
+        return throttling.read_cost(request, self.pagination_class)
+
+    @routers.replica_reads
+    async def get(self, request):
+        todo_s = filters.filter_todos(models.Todo.objects.owned_by(request.user), request.query_params)
+
+        paginator = paginations.select_paginator(request, self.pagination_class, self.cursor_pagination_class)
+        page = await paginator.apaginate_queryset(self.read_serializer_class.get_queryset(todo_s), request=request)
+
+        serializer = self.read_serializer_class(page, many=True)
+        return self.render(paginator.get_paginated_response(serializer.data).data)
+
+    @idempotency.idempotent
+    async def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        if not serializer.is_valid():
+            return self.render(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        todo = await models.Todo.objects.acreate(owner=request.user, **serializer.validated_data)
+        return self.render(self.serializer_class(todo).data, status=status.HTTP_201_CREATED)
+
+
+class AsyncTodoDetailsView(AsyncApiView):
+    """
+    this api do get put and delete http method
+    """
+    serializer_class = serializers.ToDoSerializer
+    throttle_scope = 'todo_detail'
+
+    @routers.replica_reads
+    async def get(self, request, pk):
+        try:
+            todo = await models.Todo.objects.owned_by(request.user).aget(id=pk)
+        except ObjectDoesNotExist:
+            return self.render(status=status.HTTP_404_NOT_FOUND)
+
+        return self.render(self.serializer_class(todo).data)
+
+    async def put(self, request, pk):
+        return await self.write(request, pk, partial=False)
+
+    async def patch(self, request, pk):
+        return await self.write(request, pk, partial=True)
+
+    @idempotency.idempotent
+    async def write(self, request, pk, partial):
+        serializer = self.serializer_class(data=request.data, partial=partial)
+        if not serializer.is_valid():
+            return self.render(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        todo_s = await self.get_write_queryset(request, pk).aupdate_returning(**serializer.validated_data)
+        if not todo_s:
+            return await self.missing_response(request, pk)
+
+        cache.invalidate_todos(request.user.pk, [pk])
+        data = self.serializer_class(todo_s[0]).data
+        await events.apublish('updated', [data], request.user.pk)
+        await sync_to_async(tasks.enqueue_due_checks)([data])
+        return self.render(data)
+
+    async def delete(self, request, pk):
+        if not await self.get_write_queryset(request, pk).adelete_returning():
+            return await self.missing_response(request, pk)
+
+        cache.invalidate_todos(request.user.pk, [pk])
+        await events.apublish('deleted', [{'id': pk}], request.user.pk)
+        return self.render(status=status.HTTP_204_NO_CONTENT)
+
+    def get_write_queryset(self, request, pk):
+        todo_s = models.Todo.objects.owned_by(request.user).filter(id=pk)
+        updated_at = cache.updated_at_from_if_match(request)
+        if updated_at is not None:
+            todo_s = todo_s.filter(updated_at__in=updated_at)
+        return todo_s
+
+    async def missing_response(self, request, pk):
+        if request.headers.get('If-Match') and await models.Todo.objects.owned_by(request.user).filter(id=pk).aexists():
+            return self.render(status=status.HTTP_412_PRECONDITION_FAILED)
+        return self.render(status=status.HTTP_404_NOT_FOUND)
+
+
+class TodoEventsView(View):
+    """
+    the change feed as server sent events, one `created`, `updated` or
+    `deleted` event per todo of the user with the todo as data, see
+    todo/events.py. the token goes in the Authorization header or ?token=.
+    filter with ?types=created,updated, ?ids=<id>,<id> and ?completed=true,
+    resume with the Last-Event-ID header (browsers send it when they
+    reconnect) or ?last_event_id=
+    """
+
+    async def get(self, request):
+        user = await authentication.aauthenticate(request, allow_query=True)
+        if user is None:
+            return HttpResponse(status=status.HTTP_401_UNAUTHORIZED,
+                                headers={'WWW-Authenticate': authentication.KEYWORD})
+        filters_ = events.parse_filters(request.GET, user.pk)
+        last_event_id = events.parse_last_event_id(
+            request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        )
+        response = StreamingHttpResponse(self.stream(last_event_id, filters_), content_type='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        # ask nginx not to buffer the stream
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def stream(self, last_event_id, filters_):
+        subscription = events.get_broker().subscribe(last_event_id)
+        heartbeat = getattr(settings, 'TODO_EVENTS_HEARTBEAT_SECONDS', 15)
+        try:
+            yield b'retry: 3000\n\n'
+            while True:
+                event = await subscription.next(heartbeat)
+                if event is None:
+                    # keeps proxies from closing an idle stream
+                    yield b': keepalive\n\n'
+                elif events.matches(event, filters_):
+                    yield events.format_sse(event)
+                if event is not None and event['type'] == 'reset':
+                    return
+        finally:
+            subscription.close()
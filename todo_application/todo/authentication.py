@@ -0,0 +1,105 @@
+import hashlib
+
+from django.conf import settings
+from rest_framework import HTTP_HEADER_ENCODING
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+
+from . import cache
+
+"""
+    token authentication of the todo apis.
+    clients get a key from `POST /api/todo/token/` (username and password)
+    and send it as `Authorization: Token <key>`, the drf views check it with
+    CachedTokenAuthentication: no session lookup and no csrf check, and the
+    user of a key is kept in the todo cache for TODO_TOKEN_CACHE_TTL seconds
+    so a response served from the cache runs no query at all. deleting a
+    token or saving its user drops the cached entry (see todo/signals.py).
+    every todo query is then scoped to the owner of the token
+    (Todo.objects.owned_by).
+    the async views and the change feed can not use drf authentication,
+    its query is sync only, they call aauthenticate below. browsers can not
+    set headers on an EventSource or a WebSocket, so the change feed also
+    takes the key as ?token=.
+"""
+
+KEYWORD = TokenAuthentication.keyword
+
+
+def get_ttl():
+    return getattr(settings, 'TODO_TOKEN_CACHE_TTL', 60)
+
+
+def token_cache_key(key):
+    # the key is a secret, keep it out of the cache keys
+    return f'todo:token:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def forget_tokens(keys):
+    cache.get_cache().delete_many([token_cache_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    drf token authentication that caches the user of a valid key
+    """
+
+    def authenticate_credentials(self, key):
+        if not get_ttl():
+            return super().authenticate_credentials(key)
+        cache_key = token_cache_key(key)
+        credentials = cache.get_cache().get(cache_key)
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            cache.get_cache().set(cache_key, credentials, get_ttl())
+        return credentials
+
+
+def get_key(authorization, query_token=None):
+    """
+    the token key of an Authorization header value (bytes), else of the
+    query, None without a valid one
+    """
+    parts = authorization.split()
+    if parts and parts[0].lower() == KEYWORD.lower().encode():
+        if len(parts) != 2:
+            return None
+        try:
+            return parts[1].decode(HTTP_HEADER_ENCODING)
+        except UnicodeError:
+            return None
+    return query_token or None
+
+
+async def aget_user(key):
+    """
+    the active user owning the token `key`, None for an unknown key
+    """
+    if not key:
+        return None
+    cache_key = token_cache_key(key)
+    credentials = await cache.get_cache().aget(cache_key) if get_ttl() else None
+    if credentials is not None:
+        return credentials[0]
+    token = await Token.objects.select_related('user').filter(key=key).afirst()
+    if token is None or not token.user.is_active:
+        return None
+    if get_ttl():
+        await cache.get_cache().aset(cache_key, (token.user, token), get_ttl())
+    return token.user
+
+
+async def aauthenticate(request, allow_query=False):
+    """
+    the user of the token of a django request, None when it has no valid one
+    """
+    query_token = request.GET.get('token') if allow_query else None
+    return await aget_user(get_key(get_authorization_header(request), query_token))
+
+
+async def aauthenticate_scope(scope, query_token=None):
+    """
+    the user of the token of an asgi connection (the websocket change feed)
+    """
+    headers = dict(scope.get('headers', []))
+    return await aget_user(get_key(headers.get(b'authorization', b''), query_token))
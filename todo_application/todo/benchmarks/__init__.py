@@ -0,0 +1,158 @@
+import datetime
+import pkgutil
+import importlib
+import statistics
+import time
+
+from django.utils import timezone
+
+"""
+    performance benchmarks for the todo api, run them with
+    `python manage.py benchmark`. every module of this package registers
+    its suites with the @suite decorator, a suite gets the options of the
+    command and returns a list of results made by `measure`.
+"""
+
+SUITES = {}
+
+
+def suite(name):
+    def register(func):
+        SUITES[name] = func
+        return func
+    return register
+
+
+def load_suites():
+    for module in pkgutil.iter_modules(__path__):
+        importlib.import_module(f'{__name__}.{module.name}')
+    return SUITES
+
+
+def measure(name, func, repeat=5, number=1, **extra):
+    """
+    run func `number` times per round for `repeat` rounds after one warm up
+    call and return the timing of a single call in milliseconds
+    """
+    func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number * 1000)
+    return {
+        'name': name,
+        'min_ms': round(min(timings), 4),
+        'median_ms': round(statistics.median(timings), 4),
+        'mean_ms': round(statistics.mean(timings), 4),
+        'repeat': repeat,
+        'number': number,
+        **extra,
+    }
+
+
+def throughput(name, elapsed, latencies, **extra):
+    """
+    summarize a load run of len(latencies) requests that took `elapsed` seconds
+    """
+    latencies = sorted(latency * 1000 for latency in latencies)
+    return {
+        'name': name,
+        'requests_per_second': round(len(latencies) / elapsed, 2),
+        'min_ms': round(latencies[0], 4),
+        'median_ms': round(statistics.median(latencies), 4),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1], 4),
+        'mean_ms': round(statistics.mean(latencies), 4),
+        **extra,
+    }
+
+
+def checked(response, status=200):
+    """
+    a benchmark that times error responses measures nothing, fail loudly
+    """
+    assert response.status_code == status, (response.status_code, getattr(response, 'content', b'')[:200])
+    return response
+
+
+def get_tenants(count=1):
+    """
+    the users owning the seeded todos, the suites measure the first one
+    """
+    from django.contrib.auth import get_user_model
+
+    user_model = get_user_model()
+    return [user_model._default_manager.get_or_create(username=f'benchmark-{index}')[0] for index in range(count)]
+
+
+def get_user():
+    return get_tenants()[0]
+
+
+def auth_headers():
+    """
+    the Authorization header of the measured user
+    """
+    from rest_framework.authtoken.models import Token
+
+    token, _ = Token.objects.get_or_create(user=get_user())
+    return {'Authorization': f'Token {token.key}'}
+
+
+def authenticated_client():
+    """
+    a test client sending the token of the measured user
+    """
+    from django.test import Client
+
+    return Client(headers=auth_headers())
+
+
+def seed_todos(count, start=0, batch_size=5000, tenants=1):
+    """
+    insert `count` todos with due dates spread over a year, numbered from
+    `start` so a bigger volume can be seeded on top of a smaller one, and
+    spread over `tenants` users.
+    postgres loads them with COPY, which is the only sane way to reach
+    millions of rows
+    """
+    from django.db import connection
+    from todo.imports import bulk_create_todos, copy_todos
+
+    load = copy_todos if connection.vendor == 'postgresql' else bulk_create_todos
+    owners = [user.pk for user in get_tenants(tenants)]
+    now = timezone.now()
+    created = 0
+    while created < count:
+        size = min(batch_size, count - created)
+        load([
+            {
+                'title': f'Benchmark todo {number}',
+                'description': f'Seeded todo number {number} for the benchmarks.',
+                'due_date': now + datetime.timedelta(hours=number % 8760),
+                'completed': number % 3 == 0,
+                'owner_id': owners[number % tenants],
+            } for number in range(start + created, start + created + size)
+        ], batch_size)
+        created += size
+    return created
+
+
+def compare_reports(old, new):
+    """
+    match the results of two reports by name and seeded rows and return
+    (name, rows, old median, new median, change in percent) for each
+    result found in both, a positive change means the new run is slower
+    """
+    # reports written before volumes were configurable keep rows at the top
+    baseline = {(result['name'], result.get('rows', old.get('rows'))): result for result in old['results']}
+    comparison = []
+    for result in new['results']:
+        key = (result['name'], result.get('rows', new.get('rows')))
+        if key not in baseline:
+            continue
+        before, after = baseline[key]['median_ms'], result['median_ms']
+        change = (after - before) / before * 100 if before else 0.0
+        comparison.append((*key, before, after, round(change, 2)))
+    return comparison
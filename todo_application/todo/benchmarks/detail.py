@@ -0,0 +1,42 @@
+from django.urls import reverse
+
+from todo.models import Todo
+from . import suite, measure, checked, seed_todos, authenticated_client, get_user
+
+
+@suite('detail')
+def detail_suite(options):
+    """
+    get, put, patch and delete of a single todo through the detail api
+    """
+    client, repeat = authenticated_client(), options['repeat']
+    todo_s = Todo.objects.owned_by(get_user())
+    todo = todo_s.order_by('-created_at', '-id').first()
+    url = reverse('update_delete_retrieve', args=[todo.pk])
+    body = {
+        'title': todo.title,
+        'description': todo.description,
+        'due_date': todo.due_date.isoformat(),
+        'completed': todo.completed,
+    }
+
+    def put():
+        return checked(client.put(url, body, content_type='application/json'))
+
+    def patch():
+        return checked(client.patch(url, {'completed': True}, content_type='application/json'))
+
+    # every delete needs a row of its own, seed them now so the inserts are
+    # not timed, the suite deletes all of them so the volume stays the same
+    seed_todos(repeat + 1, start=Todo.objects.count())
+    pending = list(todo_s.order_by('-created_at', '-id').values_list('pk', flat=True)[:repeat + 1])
+
+    def delete():
+        return checked(client.delete(reverse('update_delete_retrieve', args=[pending.pop()])), 204)
+
+    return [
+        measure('detail.get', lambda: checked(client.get(url)), repeat, 10),
+        measure('detail.put', put, repeat, 10),
+        measure('detail.patch', patch, repeat, 10),
+        measure('detail.delete', delete, repeat),
+    ]
@@ -0,0 +1,40 @@
+from django.urls import reverse
+
+from todo.models import Todo
+from . import suite, measure, checked, authenticated_client, get_user
+
+
+def filter_params():
+    """
+    one set of query params per filter of the list api, the values come from
+    a row in the middle of the todos of the user so every filter matches something
+    """
+    todo_s = Todo.objects.owned_by(get_user())
+    todo = todo_s.order_by('-created_at', '-id')[todo_s.count() // 2]
+    number = todo.title.rsplit(' ', 1)[-1]
+    return {
+        'due_date': {'due_date': todo.due_date.isoformat()},
+        'created_at': {'created_at': todo.created_at.isoformat()},
+        'title': {'title': f'todo {number}'},
+        'description': {'description': f'number {number} '},
+        'search': {'search': number},
+        # a term every row matches, the worst case of the ranked search
+        'search_broad': {'search': 'benchmark'},
+    }
+
+
+@suite('filters')
+def filters_suite(options):
+    """
+    the first page of the list api with each filter on its own
+    """
+    client, url = authenticated_client(), reverse('create_list')
+    page_size, repeat = options['page_size'], options['repeat']
+    return [
+        measure(
+            f'filters.{name}',
+            lambda: checked(client.get(url, {**params, 'page_size': page_size})),
+            repeat, page_size=page_size,
+        )
+        for name, params in filter_params().items()
+    ]
@@ -0,0 +1,95 @@
+import asyncio
+import math
+import queue
+import threading
+import time
+
+from django.db import connections
+from django.test import AsyncClient
+from django.urls import reverse
+
+from todo.models import Todo
+from . import auth_headers, authenticated_client, get_user, suite, throughput
+
+
+def run_wsgi(url, params_list, concurrency):
+    """
+    drive the wsgi handler with `concurrency` threads, each with its own client
+    """
+    pending = queue.SimpleQueue()
+    for params in params_list:
+        pending.put(params)
+    latencies = []
+
+    def worker():
+        client = authenticated_client()
+        try:
+            while True:
+                try:
+                    params = pending.get_nowait()
+                except queue.Empty:
+                    return
+                start = time.perf_counter()
+                response = client.get(url, params)
+                assert response.status_code == 200, response.status_code
+                latencies.append(time.perf_counter() - start)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, latencies
+
+
+def run_asgi(url, params_list, concurrency):
+    """
+    drive the asgi handler with `concurrency` concurrent tasks in one event loop
+    """
+    # the AsyncClient of django 5.1 drops the headers given to its constructor
+    headers = auth_headers()
+
+    async def main():
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call(params):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(url, params, headers=headers)
+                assert response.status_code == 200, response.status_code
+                return time.perf_counter() - start
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(call(params) for params in params_list))
+        return time.perf_counter() - start, latencies
+
+    return asyncio.run(main())
+
+
+def request_params(requests, page_size, rows):
+    """
+    walk the first (up to) 10 pages so the requests do not all hit the same
+    rows, only the pages the `rows` todos of the user fill, a page past them is a 404
+    """
+    pages = min(10, max(1, math.ceil(rows / page_size)))
+    return [{'page': index % pages + 1, 'page_size': page_size} for index in range(requests)]
+
+
+@suite('load')
+def load_suite(options):
+    """
+    compare the sync views under wsgi with the async views under asgi at the
+    same concurrency
+    """
+    requests, concurrency, page_size = options['requests'], options['concurrency'], options['page_size']
+    extra = {'requests': requests, 'concurrency': concurrency, 'page_size': page_size}
+    params_list = request_params(requests, page_size, Todo.objects.owned_by(get_user()).count())
+    elapsed, latencies = run_wsgi(reverse('create_list'), params_list, concurrency)
+    results = [throughput('load.wsgi_sync_list', elapsed, latencies, **extra)]
+    elapsed, latencies = run_asgi(reverse('async_create_list'), params_list, concurrency)
+    results.append(throughput('load.asgi_async_list', elapsed, latencies, **extra))
+    return results
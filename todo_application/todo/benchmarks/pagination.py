@@ -0,0 +1,49 @@
+import base64
+from urllib import parse
+
+from django.urls import reverse
+
+from todo.models import Todo
+from todo.paginations import CustomCursorPagination
+from . import suite, measure, checked, authenticated_client, get_user
+
+DEPTHS = (1, 10, 100, 1000, 10000, 100000)
+
+
+def cursor_at(offset):
+    """
+    build the cursor a client walking the list would hold at `offset`,
+    without walking there
+    """
+    row = Todo.objects.owned_by(get_user()).order_by('-created_at', '-id').values('created_at', 'id')[offset]
+    position = '%s%s%s' % (row['created_at'].isoformat(), CustomCursorPagination.position_separator, row['id'])
+    return base64.b64encode(parse.urlencode({'p': position}).encode('ascii')).decode('ascii')
+
+
+@suite('pagination')
+def pagination_suite(options):
+    """
+    the list api at growing depths, page number (OFFSET and COUNT) against
+    cursor (keyset) pagination, only the depths the rows of the user reach
+    """
+    client, url = authenticated_client(), reverse('create_list')
+    page_size, repeat = options['page_size'], options['repeat']
+    rows = Todo.objects.owned_by(get_user()).count()
+    results = []
+    for depth in DEPTHS:
+        if depth * page_size > rows:
+            break
+        extra = {'page': depth, 'page_size': page_size}
+        page_params = {'page': depth, 'page_size': page_size}
+        results.append(measure(
+            f'pagination.page_number.page_{depth}',
+            lambda: checked(client.get(url, page_params)), repeat, **extra,
+        ))
+        cursor_params = {'pagination': 'cursor', 'page_size': page_size}
+        if depth > 1:
+            cursor_params['cursor'] = cursor_at((depth - 1) * page_size - 1)
+        results.append(measure(
+            f'pagination.cursor.page_{depth}',
+            lambda: checked(client.get(url, cursor_params)), repeat, **extra,
+        ))
+    return results
@@ -0,0 +1,44 @@
+from rest_framework.renderers import JSONRenderer
+
+from todo.models import Todo
+from todo.renderers import FastJSONRenderer
+from todo.serializers import ToDoSerializer, ToDoReadSerializer
+from . import suite, measure, get_user
+
+
+@suite('serializers')
+def serializers_suite(options):
+    """
+    compare the model serializer with the read path of the list api on one
+    page, with and without the query
+    """
+    page_size = options['page_size']
+    queryset = Todo.objects.owned_by(get_user()).order_by('-created_at', '-id')
+    todo_s = list(queryset[:page_size])
+    rows = list(ToDoReadSerializer.get_queryset(queryset)[:page_size])
+
+    def model_serializer():
+        return JSONRenderer().render(ToDoSerializer(todo_s, many=True).data)
+
+    def read_serializer():
+        return FastJSONRenderer().render(ToDoReadSerializer(rows, many=True).data)
+
+    def model_serializer_with_query():
+        return JSONRenderer().render(ToDoSerializer(queryset[:page_size], many=True).data)
+
+    def read_serializer_with_query():
+        page = ToDoReadSerializer.get_queryset(queryset)[:page_size]
+        return FastJSONRenderer().render(ToDoReadSerializer(page, many=True).data)
+
+    assert model_serializer() == read_serializer(), 'the read path output differs'
+
+    repeat, extra = options['repeat'], {'page_size': page_size}
+    results = [
+        measure('serializers.model_serializer', model_serializer, repeat, 10, **extra),
+        measure('serializers.read_serializer', read_serializer, repeat, 10, **extra),
+        measure('serializers.model_serializer_with_query', model_serializer_with_query, repeat, 10, **extra),
+        measure('serializers.read_serializer_with_query', read_serializer_with_query, repeat, 10, **extra),
+    ]
+    for result in results:
+        result['rows_per_second'] = round(page_size / result['median_ms'] * 1000, 2)
+    return results
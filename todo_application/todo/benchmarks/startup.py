@@ -0,0 +1,56 @@
+import importlib
+import os
+import subprocess
+import sys
+
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from todo.models import Todo
+from . import suite, measure, checked, authenticated_client, get_user
+
+PROFILES = {
+    'full': 'todo_application.settings',
+    'api': 'todo_application.settings_api',
+}
+
+# what a worker does before it serves its first request
+BOOT = '''
+import django
+django.setup()
+from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
+get_wsgi_application()
+get_resolver().url_patterns
+'''
+
+
+def boot(settings_module):
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings_module}
+    env.setdefault('SECRET_KEY', 'benchmark')
+    subprocess.run([sys.executable, '-c', BOOT], env=env, check=True)
+
+
+@suite('startup')
+def startup_suite(options):
+    """
+    cold start of a worker (interpreter, django.setup, middleware and url
+    loading, in a new process) and the per request overhead of the
+    middleware stack of each settings profile
+    """
+    repeat = options['repeat']
+    results = [
+        measure(f'startup.boot.{name}', lambda: boot(module), repeat, profile=module)
+        for name, module in PROFILES.items()
+    ]
+
+    todo = Todo.objects.owned_by(get_user()).order_by('-created_at', '-id').first()
+    url = reverse('update_delete_retrieve', args=[todo.pk])
+    for name, module in PROFILES.items():
+        profile = importlib.import_module(module)
+        with override_settings(MIDDLEWARE=profile.MIDDLEWARE):
+            client = authenticated_client()
+            results.append(measure(
+                f'startup.request.{name}', lambda: checked(client.get(url)), repeat, 20, profile=module,
+            ))
+    return results
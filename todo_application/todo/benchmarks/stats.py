@@ -0,0 +1,16 @@
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from . import suite, measure, checked, authenticated_client
+
+
+@suite('stats')
+def stats_suite(options):
+    """
+    the stats api read from the daily summary and counted by the grouped query
+    """
+    client, url, repeat = authenticated_client(), reverse('stats'), options['repeat']
+    results = [measure('stats.summary', lambda: checked(client.get(url)), repeat, 10)]
+    with override_settings(TODO_STATS_SUMMARY=False):
+        results.append(measure('stats.grouped_query', lambda: checked(client.get(url)), repeat, 10))
+    return results
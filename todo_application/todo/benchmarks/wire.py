@@ -0,0 +1,45 @@
+import json
+
+from rest_framework.renderers import JSONRenderer
+
+from todo import compression, renderers
+from todo.models import Todo
+from todo.serializers import ToDoReadSerializer
+from . import suite, measure, get_user
+
+
+@suite('wire')
+def wire_suite(options):
+    """
+    cpu per page and bytes on the wire of one list page for each renderer,
+    and of the json page for each content encoding
+    """
+    page_size, repeat = options['page_size'], options['repeat']
+    todo_s = Todo.objects.owned_by(get_user()).order_by('-created_at', '-id')
+    rows = ToDoReadSerializer.get_queryset(todo_s)[:page_size]
+    data = {'count': 0, 'next': None, 'previous': None, 'results': ToDoReadSerializer(rows, many=True).data}
+
+    encoders = {
+        'json_stdlib': JSONRenderer(),
+        'json_fast': renderers.FastJSONRenderer(),
+    }
+    if renderers.msgpack is not None:
+        encoders['msgpack'] = renderers.MessagePackRenderer()
+
+    results = []
+    for name, renderer in encoders.items():
+        content = renderer.render(data)
+        results.append(measure(
+            f'wire.render.{name}', lambda: renderer.render(data), repeat, 20,
+            page_size=page_size, bytes=len(content),
+        ))
+
+    content = renderers.FastJSONRenderer().render(data)
+    assert json.loads(content)['results'] == json.loads(JSONRenderer().render(data))['results']
+    for encoding in compression.CODECS:
+        compressed = compression.compress(content, encoding)
+        results.append(measure(
+            f'wire.compress.{encoding}', lambda: compression.compress(content, encoding), repeat, 20,
+            page_size=page_size, bytes=len(compressed), ratio=round(len(content) / len(compressed), 2),
+        ))
+    return results
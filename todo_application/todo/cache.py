@@ -0,0 +1,175 @@
+import datetime
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags, quote_etag, urlencode
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils import encoders
+
+from . import routers
+
+"""
+    response cache of the todo read apis, every key is scoped to the owner.
+    detail entries are stored under the owner and todo id and deleted when
+    the todo is written, list entries are stored under a digest of the
+    normalized query params plus the list version of the owner, a write
+    bumps the version of its owner so all their cached lists are dropped at
+    once without scanning keys, the lists of the other owners stay cached.
+    invalidate_all bumps a version shared by every owner.
+    use a shared backend (redis, memcached) when you run many workers,
+    the default locmem cache only invalidates inside one process.
+"""
+
+LIST_VERSION_KEY = 'todo:list:version'
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def get_cache():
+    return caches[getattr(settings, 'TODO_CACHE_ALIAS', 'default')]
+
+
+def get_ttl():
+    return getattr(settings, 'TODO_CACHE_TTL', 60)
+
+
+def detail_key(owner_id, pk):
+    return f'todo:detail:{owner_id}:{pk}'
+
+
+def owner_version_key(owner_id):
+    return f'{LIST_VERSION_KEY}:{owner_id}'
+
+
+def list_version(owner_id):
+    """
+    the shared version and the version of the owner, read in one round trip
+    """
+    cache = get_cache()
+    keys = (LIST_VERSION_KEY, owner_version_key(owner_id))
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            versions[key] = cache.get_or_set(key, time.time_ns, None)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def list_key(request):
+    """
+    the pagination links are absolute urls, so the host is part of the key
+    """
+    owner_id = request.user.pk
+    version = list_version(owner_id)
+    query_params = request.query_params
+    normalized = urlencode(sorted(
+        (key, value) for key in query_params for value in query_params.getlist(key)
+    ))
+    digest = hashlib.md5(f'{request.get_host()}?{normalized}'.encode()).hexdigest()
+    return f'todo:list:{owner_id}:{version}:{digest}'
+
+
+def count_key(strategy, queryset, owner_id):
+    """
+    counts are shared by every page of the same filters, so the key is the
+    sql of the filtered queryset, versioned like the lists so a write drops them
+    """
+    sql, params = queryset.query.sql_with_params()
+    digest = hashlib.md5(f'{strategy}:{sql}:{params!r}'.encode()).hexdigest()
+    return f'todo:count:{owner_id}:{list_version(owner_id)}:{digest}'
+
+
+def etag_for_updated_at(updated_at):
+    """
+    the etag of a todo is its updated_at in microseconds, so it can be
+    compared in sql without reading the row first
+    """
+    return quote_etag('%x' % ((updated_at - EPOCH) // datetime.timedelta(microseconds=1)))
+
+
+def updated_at_from_if_match(request):
+    """
+    the updated_at values named by the If-Match header, None when the
+    header is missing or "*" (any version)
+    """
+    etags = parse_etags(request.headers.get('If-Match', ''))
+    if not etags or '*' in etags:
+        return None
+    updated_at = []
+    for etag in etags:
+        try:
+            updated_at.append(EPOCH + datetime.timedelta(microseconds=int(etag.strip('"'), 16)))
+        except (ValueError, OverflowError):
+            continue
+    return updated_at
+
+
+def etag_for_data(data):
+    content = json.dumps(data, cls=encoders.JSONEncoder, separators=(',', ':'))
+    return quote_etag(hashlib.md5(content.encode()).hexdigest())
+
+
+def make_entry(data, etag, last_modified=None):
+    return {
+        'data': data,
+        'etag': etag,
+        'last_modified': last_modified.timestamp() if last_modified else None,
+    }
+
+
+def get_entry(key):
+    # a client pinned to the primary after a write must not be served an
+    # entry that was filled from a replica lagging behind its write
+    if not get_ttl() or routers.pinned_to_primary.get():
+        return None
+    return get_cache().get(key)
+
+
+def set_entry(key, entry):
+    if get_ttl():
+        get_cache().set(key, entry, get_ttl())
+    return entry
+
+
+def bump_version(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def invalidate_todos(owner_id, pks=()):
+    """
+    drop the cached details of the given todos of the owner and every cached list of the owner
+    """
+    if pks:
+        get_cache().delete_many([detail_key(owner_id, pk) for pk in pks])
+    bump_version(owner_version_key(owner_id))
+
+
+def invalidate_all():
+    """
+    drop the cached lists of every owner, the details expire with their ttl
+    """
+    bump_version(LIST_VERSION_KEY)
+
+
+def cached_response(request, entry):
+    """
+    answer 304 when the client copy is still fresh, otherwise the cached data
+    """
+    last_modified = entry['last_modified']
+    not_modified = get_conditional_response(
+        request, etag=entry['etag'], last_modified=int(last_modified) if last_modified else None,
+    )
+    if not_modified is not None:
+        return not_modified
+
+    headers = {'ETag': entry['etag']}
+    if last_modified:
+        headers['Last-Modified'] = http_date(last_modified)
+    return Response(entry['data'], status=status.HTTP_200_OK, headers=headers)
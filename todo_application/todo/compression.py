@@ -0,0 +1,59 @@
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+"""
+    content encodings of the api responses.
+    gzip is always available, br and zstd when the brotli and zstandard
+    packages are installed. CODECS is in order of preference, the first
+    one the client accepts wins.
+"""
+
+CODECS = {}
+if zstandard is not None:
+    # zstd decodes faster than br at a similar ratio
+    CODECS['zstd'] = lambda content: zstandard.ZstdCompressor(level=3).compress(content)
+if brotli is not None:
+    # quality 11 is for build time, 4 is the usual on the fly setting
+    CODECS['br'] = lambda content: brotli.compress(content, quality=4)
+CODECS['gzip'] = lambda content: gzip.compress(content, compresslevel=6, mtime=0)
+
+
+def accepted_encodings(request):
+    """
+    the content codings of the Accept-Encoding header, without q=0 ones
+    """
+    accepted = set()
+    for item in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = item.partition(';')
+        params = params.replace(' ', '')
+        try:
+            quality = float(params[2:]) if params.startswith('q=') else 1.0
+        except ValueError:
+            quality = 0.0
+        if quality > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def choose_encoding(request, available=None):
+    """
+    the preferred encoding the client accepts, None for identity
+    """
+    accepted = accepted_encodings(request)
+    for encoding in available if available is not None else CODECS:
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+def compress(content, encoding):
+    return CODECS[encoding](content)
@@ -0,0 +1,334 @@
+import asyncio
+import collections
+import itertools
+import json
+import logging
+import select
+import threading
+import time
+from functools import lru_cache
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.utils.module_loading import import_string
+
+from . import authentication
+
+"""
+    the change feed of the todos.
+    the write paths publish a `created`, `updated` or `deleted` event per
+    todo once their transaction commits (and the background jobs `due_soon`
+    and `overdue`, see todo/tasks.py), a broker numbers the events and fans
+    them out to the subscribers of this process, the server sent events view
+    (async_views.TodoEventsView) and the optional websocket endpoint below.
+    a subscriber is an asyncio.Queue on the event loop, an idle one costs a
+    few hundred bytes and no thread or database connection. every event
+    carries the owner of its todo and a subscriber only gets the events of
+    the user it authenticated as.
+
+    the broker keeps the last TODO_EVENTS_BUFFER_SIZE events so a client that
+    reconnects with the id of the last event it saw gets what it missed, when
+    that id is no longer in the buffer it gets a `reset` event and should
+    resync through the sync api.
+
+    InMemoryBroker only reaches the subscribers of the process that wrote,
+    PostgresBroker sends the events through LISTEN/NOTIFY so every process
+    sees the writes of the others, pick one with TODO_EVENTS_BROKER.
+"""
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ('created', 'updated', 'deleted', 'due_soon', 'overdue')
+RESET_EVENT = {'type': 'reset', 'todo': None}
+
+
+class Subscription:
+    """
+    the events of one subscriber, the missed ones first, then the live ones
+    """
+
+    def __init__(self, broker, loop, queue, backlog):
+        self.broker = broker
+        self.loop = loop
+        self.queue = queue
+        self.backlog = collections.deque(backlog)
+
+    async def next(self, timeout=None):
+        """
+        return the next event, or None when nothing happened for `timeout` seconds
+        """
+        if self.backlog:
+            return self.backlog.popleft()
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self.loop, self.queue)
+
+
+class InMemoryBroker:
+    """
+    numbers the events and delivers them to the subscribers of this process
+    """
+
+    def __init__(self, buffer_size=None, queue_size=None):
+        self.buffer = collections.deque(maxlen=buffer_size or getattr(settings, 'TODO_EVENTS_BUFFER_SIZE', 1000))
+        self.queue_size = queue_size or getattr(settings, 'TODO_EVENTS_QUEUE_SIZE', 100)
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        # event loop -> its queues, one call_soon_threadsafe per loop and event
+        self.subscribers = {}
+
+    def publish(self, event_type, todos, owner_id):
+        for todo in todos:
+            self.dispatch({'id': next(self.ids), 'type': event_type, 'owner': owner_id, 'todo': todo})
+
+    def dispatch(self, event):
+        with self.lock:
+            self.buffer.append(event)
+            targets = [(loop, tuple(queues)) for loop, queues in self.subscribers.items()]
+        for loop, queues in targets:
+            try:
+                loop.call_soon_threadsafe(self.deliver, queues, event)
+            except RuntimeError:
+                # the loop is closed, its subscribers are gone
+                with self.lock:
+                    self.subscribers.pop(loop, None)
+
+    @staticmethod
+    def deliver(queues, event):
+        for queue in queues:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # a subscriber that does not keep up starts over
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESET_EVENT)
+
+    def subscribe(self, last_event_id=None):
+        """
+        start a subscription on the running event loop, with the events
+        after `last_event_id` when it is given
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        # registering and reading the buffer under the same lock means an
+        # event is either in the backlog or delivered to the queue, never both
+        with self.lock:
+            self.subscribers.setdefault(loop, set()).add(queue)
+            backlog = self.replay(last_event_id)
+        return Subscription(self, loop, queue, backlog)
+
+    def unsubscribe(self, loop, queue):
+        with self.lock:
+            queues = self.subscribers.get(loop)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self.subscribers[loop]
+
+    def replay(self, last_event_id):
+        if last_event_id is None:
+            return []
+        for position, event in enumerate(self.buffer):
+            if event['id'] == last_event_id:
+                return list(itertools.islice(self.buffer, position + 1, None))
+        return [RESET_EVENT]
+
+
+class PostgresBroker(InMemoryBroker):
+    """
+    publishes with NOTIFY and delivers what a LISTEN connection of this
+    process receives, event ids come from the todo_event_id_seq sequence so
+    they are the same in every process
+    """
+    channel = 'todo_events'
+    # NOTIFY payloads are limited to 8000 bytes
+    max_payload = 7900
+
+    def __init__(self, *args, using='default', **kwargs):
+        super().__init__(*args, **kwargs)
+        self.using = using
+        self.listener = None
+
+    def publish(self, event_type, todos, owner_id):
+        payloads = [self.encode(event_type, todo, owner_id) for todo in todos]
+        if not payloads:
+            return
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_notify(%s, nextval('todo_event_id_seq')::text || ':' || payload) "
+                'FROM unnest(%s::text[]) AS payload',
+                [self.channel, payloads],
+            )
+
+    def encode(self, event_type, todo, owner_id):
+        payload = json.dumps({'type': event_type, 'owner': owner_id, 'todo': todo}, cls=DjangoJSONEncoder)
+        if len(payload.encode()) > self.max_payload:
+            # the subscriber fetches the todo itself
+            payload = json.dumps({
+                'type': event_type, 'owner': owner_id, 'todo': {'id': str(todo['id'])}, 'truncated': True,
+            })
+        return payload
+
+    def receive(self, payload):
+        event_id, _, data = payload.partition(':')
+        self.dispatch({'id': int(event_id), **json.loads(data)})
+
+    def subscribe(self, last_event_id=None):
+        with self.lock:
+            if self.listener is None:
+                self.listener = threading.Thread(target=self.listen, name='todo-events-listener', daemon=True)
+                self.listener.start()
+        return super().subscribe(last_event_id)
+
+    def listen(self):
+        while True:
+            connection = connections.create_connection(self.using)
+            try:
+                connection.ensure_connection()
+                raw_connection = connection.connection
+                with raw_connection.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.channel}')
+                while True:
+                    for payload in self.wait(raw_connection):
+                        self.receive(payload)
+            except Exception:
+                logger.exception('the todo events listener lost its connection, reconnecting')
+                time.sleep(1)
+            finally:
+                connection.close()
+
+    @staticmethod
+    def wait(raw_connection, timeout=5):
+        if callable(raw_connection.notifies):
+            # psycopg 3
+            return [notify.payload for notify in raw_connection.notifies(timeout=timeout)]
+        # psycopg2
+        if select.select([raw_connection], [], [], timeout) == ([], [], []):
+            return []
+        raw_connection.poll()
+        payloads = [notify.payload for notify in raw_connection.notifies]
+        raw_connection.notifies.clear()
+        return payloads
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    broker_class = import_string(getattr(settings, 'TODO_EVENTS_BROKER', 'todo.events.InMemoryBroker'))
+    return broker_class()
+
+
+def publish(event_type, todos, owner_id, using=None):
+    """
+    publish one event per todo (serialized todos, or {'id': ...} for
+    deletes) of `owner_id` when the current transaction commits
+    """
+    todos = [dict(todo) for todo in todos]
+    if todos:
+        transaction.on_commit(lambda: get_broker().publish(event_type, todos, owner_id), using=using)
+
+
+apublish = sync_to_async(publish)
+
+
+def parse_last_event_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_filters(params, owner_id):
+    """
+    subscriber filters of the user `owner_id` from query params: `types`
+    and `ids` (comma separated) and `completed` (true or false)
+    """
+    filters = {'owner': owner_id}
+    if params.get('types'):
+        filters['types'] = set(params['types'].split(','))
+    if params.get('ids'):
+        filters['ids'] = set(params['ids'].split(','))
+    if params.get('completed') in ('true', 'false'):
+        filters['completed'] = params['completed'] == 'true'
+    return filters
+
+
+def matches(event, filters):
+    todo = event['todo']
+    if todo is None:
+        # reset is for everyone
+        return True
+    if event.get('owner') != filters['owner']:
+        return False
+    if 'types' in filters and event['type'] not in filters['types']:
+        return False
+    if 'ids' in filters and str(todo['id']) not in filters['ids']:
+        return False
+    # a deleted todo has no completed field, it is sent to everyone who may have it
+    if 'completed' in filters and todo.get('completed', filters['completed']) != filters['completed']:
+        return False
+    return True
+
+
+def format_sse(event):
+    lines = []
+    if 'id' in event:
+        lines.append(f'id: {event["id"]}')
+    lines.append(f'event: {event["type"]}')
+    lines.append(f'data: {json.dumps(event["todo"], cls=DjangoJSONEncoder)}')
+    return ('\n'.join(lines) + '\n\n').encode()
+
+
+async def websocket_application(scope, receive, send):
+    """
+    the change feed over a websocket, ws://.../ws/todo/events/?types=...,
+    every event is a text frame of {"id", "type", "todo"}. the token goes
+    in the Authorization header or ?token=, without one the handshake is
+    refused
+    """
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+    params = {key: values[-1] for key, values in parse_qs(scope.get('query_string', b'').decode()).items()}
+    user = await authentication.aauthenticate_scope(scope, params.get('token'))
+    if user is None:
+        # a close before the accept answers the handshake with a 403
+        await send({'type': 'websocket.close', 'code': 4401})
+        return
+    filters = parse_filters(params, user.pk)
+    await send({'type': 'websocket.accept'})
+
+    subscription = get_broker().subscribe(parse_last_event_id(params.get('last_event_id')))
+    next_message = asyncio.ensure_future(receive())
+    next_event = None
+    try:
+        while True:
+            if next_event is None:
+                next_event = asyncio.ensure_future(subscription.next())
+            done, _ = await asyncio.wait((next_message, next_event), return_when=asyncio.FIRST_COMPLETED)
+            if next_message in done:
+                if next_message.result()['type'] == 'websocket.disconnect':
+                    return
+                # the client has nothing to say, its messages are ignored
+                next_message = asyncio.ensure_future(receive())
+            if next_event in done:
+                event, next_event = next_event.result(), None
+                if matches(event, filters):
+                    await send({'type': 'websocket.send',
+                                'text': json.dumps({'id': event.get('id'), 'type': event['type'],
+                                                    'todo': event['todo']}, cls=DjangoJSONEncoder)})
+                if event['type'] == 'reset':
+                    await send({'type': 'websocket.close', 'code': 1000})
+                    return
+    finally:
+        for future in (next_message, next_event):
+            if future is not None:
+                future.cancel()
+        subscription.close()
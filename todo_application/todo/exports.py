@@ -0,0 +1,114 @@
+import csv
+import io
+
+from django.conf import settings
+
+from .renderers import FastJSONRenderer
+from .serializers import ToDoReadSerializer
+
+"""
+    streaming writers of the export api, they pull rows from a server side
+    cursor chunk by chunk, so memory stays flat and the first chunk leaves
+    as soon as the database returns it.
+    under asgi django would read a sync iterator whole before sending the
+    first byte, the export is then served by astream, which reads the rows
+    with the async orm.
+"""
+
+
+def get_chunk_size():
+    return getattr(settings, 'TODO_EXPORT_CHUNK_SIZE', 2000)
+
+
+def iter_chunks(queryset):
+    chunk_size = get_chunk_size()
+    serializer = ToDoReadSerializer(None, many=True)
+    chunk = []
+    for row in ToDoReadSerializer.get_queryset(queryset).iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield serializer.convert(chunk)
+            chunk = []
+    if chunk:
+        yield serializer.convert(chunk)
+
+
+async def aiter_chunks(queryset):
+    chunk_size = get_chunk_size()
+    serializer = ToDoReadSerializer(None, many=True)
+    chunk = []
+    async for row in ToDoReadSerializer.get_queryset(queryset).aiterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield serializer.convert(chunk)
+            chunk = []
+    if chunk:
+        yield serializer.convert(chunk)
+
+
+class NdjsonFormat:
+    """
+    one json object per line
+    """
+    content_type = 'application/x-ndjson'
+
+    def __init__(self):
+        self.renderer = FastJSONRenderer()
+
+    def header(self):
+        return b''
+
+    def rows(self, chunk):
+        return b''.join(self.renderer.render(row) + b'\n' for row in chunk)
+
+
+class CsvFormat:
+    """
+    a header line, then one csv row per todo
+    """
+    content_type = 'text/csv'
+
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+
+    def flush(self):
+        value = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return value.encode()
+
+    def header(self):
+        self.writer.writerow(ToDoReadSerializer.fields)
+        return self.flush()
+
+    def rows(self, chunk):
+        self.writer.writerows(
+            [('true' if value is True else 'false' if value is False else value) for value in row.values()]
+            for row in chunk
+        )
+        return self.flush()
+
+
+def stream(format_class, queryset):
+    format_ = format_class()
+    header = format_.header()
+    if header:
+        yield header
+    for chunk in iter_chunks(queryset):
+        yield format_.rows(chunk)
+
+
+async def astream(format_class, queryset):
+    format_ = format_class()
+    header = format_.header()
+    if header:
+        yield header
+    async for chunk in aiter_chunks(queryset):
+        yield format_.rows(chunk)
+
+
+FORMATS = {
+    'ndjson': NdjsonFormat,
+    'csv': CsvFormat,
+}
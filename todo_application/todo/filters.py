@@ -0,0 +1,228 @@
+import datetime
+import uuid
+
+from django import forms
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework.exceptions import ValidationError
+
+from . import search, schema
+
+"""
+    the filters of the list, export and async list apis.
+    a FilterSet declares one Filter per query param, the param is named
+    after the attribute and, unless told otherwise, so is the orm lookup.
+    the values are parsed with django form fields, every invalid param is
+    reported at once with a 400. params that are not declared (page,
+    cursor, count ...) are left to the paginators.
+    only lookups an index can serve are declared, see Todo.Meta.indexes.
+"""
+
+
+class BooleanField(forms.TypedChoiceField):
+    """
+    a strict boolean, NullBooleanField would read a typo as "no filter"
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(choices=[(value, value) for value in ('true', 'false', '1', '0')],
+                         coerce=lambda value: value in ('true', '1'), **kwargs)
+
+
+# form field -> python type drf_spectacular documents the param with
+SCHEMA_TYPES = (
+    (forms.DateTimeField, datetime.datetime),
+    (forms.DateField, datetime.date),
+    (forms.UUIDField, uuid.UUID),
+    (BooleanField, bool),
+    (forms.IntegerField, int),
+)
+
+
+class Filter:
+    """
+    one query param: the form field that parses it and the lookup it applies
+    """
+
+    def __init__(self, form_field, lookup=None, description=''):
+        self.form_field = form_field
+        self.lookup = lookup
+        self.description = description
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        if self.lookup is None:
+            self.lookup = name
+
+    def parse(self, value):
+        return self.form_field.clean(value)
+
+    def apply(self, queryset, value):
+        return queryset.filter(**{self.lookup: value})
+
+    def get_schema_type(self):
+        for form_field_class, schema_type in SCHEMA_TYPES:
+            if isinstance(self.form_field, form_field_class):
+                return schema_type
+        return str
+
+    def get_parameter(self):
+        return schema.OpenApiParameter(
+            name=self.name,
+            location=schema.OpenApiParameter.QUERY,
+            type=self.get_schema_type(),
+            description=self.description,
+        )
+
+
+class ListFilter(Filter):
+    """
+    a comma separated list of values, for `in` lookups
+    """
+    max_items = 100
+
+    def parse(self, value):
+        values = [item for item in value.split(',') if item]
+        if not values:
+            raise DjangoValidationError('Enter at least one value.')
+        if len(values) > self.max_items:
+            raise DjangoValidationError(f'Enter at most {self.max_items} values.')
+        return [self.form_field.clean(item) for item in values]
+
+    def get_parameter(self):
+        return schema.OpenApiParameter(
+            name=self.name,
+            location=schema.OpenApiParameter.QUERY,
+            type=self.get_schema_type(),
+            many=True,
+            explode=False,
+            description=self.description,
+        )
+
+
+class SearchFilter(Filter):
+
+    def apply(self, queryset, value):
+        return search.search_todos(queryset, value)
+
+
+class OrderingFilter(Filter):
+    """
+    ?ordering=due_date,-created_at over the whitelisted fields, the id
+    breaks ties so pages are stable
+    """
+
+    def __init__(self, fields, description=''):
+        super().__init__(forms.CharField(), description=description)
+        self.fields = fields
+
+    def parse(self, value):
+        terms = [term.strip() for term in value.split(',') if term.strip()]
+        unknown = [term for term in terms if term.lstrip('-') not in self.fields]
+        if unknown or not terms:
+            raise DjangoValidationError(
+                f'Unknown ordering {", ".join(unknown)}, choose from {", ".join(self.fields)} '
+                f'(prefix with - for descending order).'
+            )
+        # the first direction of a field wins
+        ordering, seen = [], set()
+        for term in terms:
+            if term.lstrip('-') not in seen:
+                seen.add(term.lstrip('-'))
+                ordering.append(term)
+        return ordering
+
+    def apply(self, queryset, terms):
+        tie_breaker = '-id' if terms[-1].startswith('-') else 'id'
+        return queryset.order_by(*terms, tie_breaker)
+
+    def get_parameter(self):
+        return schema.OpenApiParameter(
+            name=self.name,
+            location=schema.OpenApiParameter.QUERY,
+            type=str,
+            description=self.description or 'comma separated, any of {}, prefix with - for descending order'.format(
+                ', '.join(self.fields)),
+        )
+
+
+class FilterSet:
+    """
+    the declared filters of the subclass, applied in declaration order
+    """
+    filters = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.filters = {
+            **cls.filters,
+            **{name: value for name, value in vars(cls).items() if isinstance(value, Filter)},
+        }
+
+    def __init__(self, query_params):
+        self.query_params = query_params
+
+    def get_values(self):
+        """
+        return {filter: parsed value} of the sent params, raise a
+        ValidationError with the errors of every invalid param
+        """
+        values, errors = {}, {}
+        for name, filter_ in self.filters.items():
+            value = self.query_params.get(name, None)
+            if not value:
+                continue
+            try:
+                values[filter_] = filter_.parse(value)
+            except DjangoValidationError as exc:
+                errors[name] = exc.messages
+        if errors:
+            raise ValidationError(errors)
+        return values
+
+    def filter_queryset(self, queryset):
+        for filter_, value in self.get_values().items():
+            queryset = filter_.apply(queryset, value)
+        return queryset
+
+    @classmethod
+    def parameters(cls):
+        """
+        the openapi parameters of the filters, built when a schema is generated
+        """
+        return schema.LazyParameters(lambda: [filter_.get_parameter() for filter_ in cls.filters.values()])
+
+
+class TodoFilterSet(FilterSet):
+    id__in = ListFilter(forms.UUIDField(), description='comma separated ids')
+    completed = Filter(BooleanField())
+    # todo_owner_due_date_idx, the queryset is always scoped to an owner
+    due_date = Filter(forms.DateTimeField())
+    due_date__gt = Filter(forms.DateTimeField())
+    due_date__gte = Filter(forms.DateTimeField())
+    due_date__lt = Filter(forms.DateTimeField())
+    due_date__lte = Filter(forms.DateTimeField())
+    # todo_owner_created_at_idx
+    created_at = Filter(forms.DateTimeField())
+    created_at__gt = Filter(forms.DateTimeField())
+    created_at__gte = Filter(forms.DateTimeField())
+    created_at__lt = Filter(forms.DateTimeField())
+    created_at__lte = Filter(forms.DateTimeField())
+    # todo_owner_updated_at_idx
+    updated_at__gt = Filter(forms.DateTimeField())
+    updated_at__gte = Filter(forms.DateTimeField())
+    updated_at__lt = Filter(forms.DateTimeField())
+    updated_at__lte = Filter(forms.DateTimeField())
+    # trigram indexes on postgres
+    title = Filter(forms.CharField(), lookup='title__icontains', description='part of the title')
+    description = Filter(forms.CharField(), lookup='description__icontains',
+                         description='part of the description')
+    search = SearchFilter(forms.CharField(), description='full text search over title and description')
+    ordering = OrderingFilter(fields=('due_date', 'created_at', 'updated_at'))
+
+
+def filter_todos(queryset, query_params):
+    """
+    apply the query params of the list api to the queryset
+    """
+    return TodoFilterSet(query_params).filter_queryset(queryset)
@@ -0,0 +1,196 @@
+import datetime
+import functools
+import hashlib
+import json
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+"""
+    idempotency keys of the todo writes.
+    a client may send `Idempotency-Key: <any string>` with a create, update
+    or bulk write. the first request with a key runs and its response
+    (status, body, ETag) is kept in ToDO_idempotency_key for
+    TODO_IDEMPOTENCY_TTL_SECONDS, a retry with the same key gets that
+    response back with `Idempotent-Replayed: true` and never touches the
+    todos. keys belong to the user of the token, the same key with another
+    body or endpoint is refused with 422.
+    the unique (owner, key) row is the lock: the first request inserts it,
+    a concurrent duplicate fails the insert and gets 409 with Retry-After
+    while the first one runs. a request that fails (an exception or a 5xx)
+    frees its key. a worker dying mid request leaves the key locked until
+    TODO_IDEMPOTENCY_LOCK_SECONDS, then a retry runs the write again.
+    the write and the stored response are not one transaction: that would
+    delay the cache invalidation and the change feed of the write until the
+    response is stored.
+"""
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+# the headers of a response replayed with it
+KEPT_HEADERS = ('ETag', 'Last-Modified', 'Location')
+MAX_KEY_LENGTH = 255
+
+
+class KeyInUse(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'A request with this Idempotency-Key is still running, retry later.'
+    default_code = 'idempotency_key_in_use'
+    # drf turns it into Retry-After
+    wait = 1
+
+
+class KeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'This Idempotency-Key was already used with another request.'
+    default_code = 'idempotency_key_reused'
+
+
+def get_ttl():
+    return datetime.timedelta(seconds=getattr(settings, 'TODO_IDEMPOTENCY_TTL_SECONDS', 24 * 60 * 60))
+
+
+def get_lock_timeout():
+    return datetime.timedelta(seconds=getattr(settings, 'TODO_IDEMPOTENCY_LOCK_SECONDS', 60))
+
+
+def get_key(request):
+    """
+    the Idempotency-Key of the request, None without one
+    """
+    key = request.headers.get(HEADER)
+    if key is None:
+        return None
+    key = key.strip()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise ValidationError({HEADER: [f'Send between 1 and {MAX_KEY_LENGTH} characters.']})
+    return key
+
+
+def to_json(data):
+    # what the renderers would write, the JSONField encoder knows no uuid or datetime
+    return json.loads(json.dumps(data, cls=JSONEncoder))
+
+
+def fingerprint(request):
+    """
+    a hash of the endpoint and the body, a key is only replayed for the same request
+    """
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    body = json.dumps(to_json(data), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def reserve(owner_id, key, fingerprint_):
+    """
+    lock the key for this request, return None when it may run, or the
+    record of the earlier request to replay
+    """
+    from .models import IdempotencyKey
+
+    now = timezone.now()
+    for _ in range(3):
+        try:
+            with transaction.atomic():
+                IdempotencyKey.objects.create(owner_id=owner_id, key=key, fingerprint=fingerprint_,
+                                              locked_at=now, expires_at=now + get_ttl())
+            return None
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(owner_id=owner_id, key=key).first()
+        if record is None:
+            # freed in between
+            continue
+        if record.expires_at <= now:
+            IdempotencyKey.objects.filter(pk=record.pk, expires_at=record.expires_at).delete()
+            continue
+        if record.fingerprint != fingerprint_:
+            raise KeyReused()
+        if record.response_status is not None:
+            return record
+        if record.locked_at <= now - get_lock_timeout():
+            # its request died, take the key over unless another retry did
+            if IdempotencyKey.objects.filter(pk=record.pk, response_status=None,
+                                             locked_at=record.locked_at).update(locked_at=now):
+                return None
+        raise KeyInUse()
+    raise KeyInUse()
+
+
+def release(owner_id, key):
+    from .models import IdempotencyKey
+
+    IdempotencyKey.objects.filter(owner_id=owner_id, key=key, response_status=None).delete()
+
+
+def complete(owner_id, key, response):
+    """
+    keep the response of the request holding the key, free the key of a failed one
+    """
+    from .models import IdempotencyKey
+
+    if response.status_code >= 500:
+        return release(owner_id, key)
+    IdempotencyKey.objects.filter(owner_id=owner_id, key=key, response_status=None).update(
+        response_status=response.status_code,
+        response_data=to_json(getattr(response, 'data', None)),
+        response_headers={header: response[header] for header in KEPT_HEADERS if response.has_header(header)},
+        locked_at=None,
+    )
+
+
+def mark_replayed(response, record):
+    for header, value in record.response_headers.items():
+        response[header] = value
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def idempotent(handler):
+    """
+    decorate a write handler of a drf view (or an async view of
+    todo/async_views.py) so retries with the same Idempotency-Key get the
+    stored response
+    """
+    if iscoroutinefunction(handler):
+        @functools.wraps(handler)
+        async def wrapper(view, request, *args, **kwargs):
+            key = get_key(request)
+            if key is None:
+                return await handler(view, request, *args, **kwargs)
+            owner_id = request.user.pk
+            record = await sync_to_async(reserve)(owner_id, key, fingerprint(request))
+            if record is not None:
+                return mark_replayed(view.render(record.response_data, status=record.response_status), record)
+            try:
+                response = await handler(view, request, *args, **kwargs)
+            except BaseException:
+                await sync_to_async(release)(owner_id, key)
+                raise
+            await sync_to_async(complete)(owner_id, key, response)
+            return response
+    else:
+        @functools.wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            key = get_key(request)
+            if key is None:
+                return handler(view, request, *args, **kwargs)
+            owner_id = request.user.pk
+            record = reserve(owner_id, key, fingerprint(request))
+            if record is not None:
+                return mark_replayed(Response(record.response_data, status=record.response_status), record)
+            try:
+                response = handler(view, request, *args, **kwargs)
+            except BaseException:
+                release(owner_id, key)
+                raise
+            complete(owner_id, key, response)
+            return response
+    return wrapper
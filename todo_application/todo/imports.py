@@ -0,0 +1,176 @@
+import csv
+import io
+import json
+import uuid
+
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from . import partitions
+from .models import Todo
+from .serializers import ToDoSerializer
+
+"""
+    readers and loaders of the import_todos command.
+    readers turn a file into a stream of dicts without loading it whole,
+    loaders write one validated chunk in one transaction.
+"""
+
+
+def read_ndjson(file):
+    for line in file:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def read_csv(file):
+    for row in csv.DictReader(file):
+        # empty cells mean "use the default", like a missing json key
+        yield {key: value for key, value in row.items() if value != ''}
+
+
+def read_json(file, buffer_size=1 << 16):
+    """
+    stream the objects of a top level json array
+    """
+    decoder = json.JSONDecoder()
+    buffer, started = '', False
+    while True:
+        data = file.read(buffer_size)
+        buffer += data
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position == len(buffer):
+                break
+            if not started:
+                if buffer[position] != '[':
+                    raise ValueError('the json input must be an array of objects')
+                started = True
+                position += 1
+                continue
+            if buffer[position] == ']':
+                return
+            if buffer[position] != '{':
+                raise ValueError('the json input must be an array of objects')
+            try:
+                record, position = decoder.raw_decode(buffer, position)
+            except ValueError:
+                # the object continues in the next read
+                break
+            yield record
+        buffer = buffer[position:]
+        if not data:
+            # a complete array returns on its closing bracket
+            raise ValueError('unexpected end of the json input')
+
+
+READERS = {
+    'json': read_json,
+    'ndjson': read_ndjson,
+    'csv': read_csv,
+}
+
+
+def validate_chunk(records, start, owner_id=None):
+    """
+    validate records with the rules of the api, return the valid attrs
+    (owned by `owner_id`) and a list of (row number, errors) for the others
+    """
+    serializer = ToDoSerializer()
+    valid, invalid = [], []
+    for row_number, record in enumerate(records, start=start):
+        try:
+            attrs = serializer.run_validation(record)
+            # ids are read only in the api, but keeping them makes re-runs idempotent
+            if record.get('id'):
+                attrs['id'] = uuid.UUID(str(record['id']))
+        except ValidationError as exc:
+            invalid.append((row_number, exc.detail))
+        except ValueError:
+            invalid.append((row_number, {'id': ['Must be a valid UUID.']}))
+        else:
+            attrs['owner_id'] = owner_id
+            valid.append(attrs)
+    return valid, invalid
+
+
+def ids_are_unique():
+    """
+    False on the partitioned todo table (postgres), its primary key is
+    (id, due_date) so inserting a known id with another due date succeeds
+    """
+    if not partitions.supports_partitioning(connection):
+        return True
+    with connection.cursor() as cursor:
+        return not partitions.is_partitioned(cursor)
+
+
+def without_known_ids(valid, known):
+    """
+    the rows whose id is not in `known` nor repeated in the chunk
+    """
+    rows = []
+    for attrs in valid:
+        if 'id' in attrs:
+            if attrs['id'] in known:
+                continue
+            known.add(attrs['id'])
+        rows.append(attrs)
+    return rows
+
+
+def bulk_create_todos(valid, batch_size):
+    # rows with an id already in the table are skipped, so a resumed
+    # import can safely replay chunks that were loaded before
+    ids = [attrs['id'] for attrs in valid if 'id' in attrs]
+    with transaction.atomic():
+        if ids and not ids_are_unique():
+            # nothing conflicts on the id alone, leave out the known ids (the
+            # chunks of one import hold different rows, they do not race here)
+            valid = without_known_ids(valid, set(Todo.objects.filter(id__in=ids).values_list('id', flat=True)))
+        todo_s = [Todo(**attrs) for attrs in valid]
+        Todo.objects.bulk_create(todo_s, batch_size=batch_size, ignore_conflicts=bool(ids))
+    return len(todo_s)
+
+
+COPY_COLUMNS = ('id', 'owner_id', 'title', 'description', 'due_date', 'completed', 'created_at', 'updated_at')
+
+
+def copy_todos(valid, batch_size=None):
+    """
+    load the chunk with postgres COPY, the search_vector trigger still runs
+    """
+    now = timezone.now().isoformat()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for attrs in valid:
+        writer.writerow((
+            attrs.get('id') or uuid.uuid4(),
+            # an empty csv field is NULL
+            attrs.get('owner_id') or '',
+            attrs['title'],
+            attrs['description'],
+            attrs['due_date'].isoformat(),
+            't' if attrs.get('completed') else 'f',
+            now,
+            now,
+        ))
+    buffer.seek(0)
+
+    sql = 'COPY "{}" ({}) FROM STDIN WITH (FORMAT csv)'.format(
+        Todo._meta.db_table, ', '.join(f'"{column}"' for column in COPY_COLUMNS),
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        raw_cursor = cursor.cursor
+        if hasattr(raw_cursor, 'copy_expert'):
+            # psycopg2
+            raw_cursor.copy_expert(sql, buffer)
+        else:
+            # psycopg 3
+            with raw_cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+    return len(valid)
@@ -0,0 +1,184 @@
+import dataclasses
+import datetime
+import logging
+import os
+import socket
+import traceback
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+"""
+    background jobs kept in the ToDO_job table.
+    the request paths only INSERT a row with enqueue(), the work runs in
+    `manage.py run_workers` processes. workers claim due jobs with
+    SELECT ... FOR UPDATE SKIP LOCKED, so any number of them, on any number
+    of machines, share the queue without claiming a job twice.
+    a failing job is retried with an exponential backoff up to its
+    max_attempts, a job whose worker died is queued again after
+    TODO_JOB_TIMEOUT_SECONDS. periodic jobs run again `every` seconds with
+    the payload their last run returned, the dedup key keeps one of them
+    queued at a time however many workers start them.
+    the jobs of the todo app are in todo/tasks.py.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class JobSpec:
+    name: str
+    func: object
+    max_attempts: int = 5
+    # seconds between the runs of a periodic job, or a callable returning them
+    every: object = None
+
+    def get_interval(self):
+        return self.every() if callable(self.every) else self.every
+
+
+registry = {}
+
+
+def job(name, max_attempts=5, every=None):
+    """
+    register the decorated function, it takes the payload of the job
+    """
+    def register(func):
+        registry[name] = JobSpec(name, func, max_attempts, every)
+        return func
+    return register
+
+
+def enqueue(name, payload=None, run_at=None, dedup_key=None):
+    """
+    queue a job, a job with the dedup_key of a waiting or running one is dropped
+    """
+    enqueue_many([(name, payload, dedup_key)], run_at=run_at)
+
+
+def enqueue_many(jobs, run_at=None):
+    """
+    queue (name, payload, dedup_key) jobs with one INSERT
+    """
+    unknown = {name for name, _, _ in jobs} - set(registry)
+    if unknown:
+        raise ValueError(f'unknown jobs: {", ".join(sorted(unknown))}')
+    run_at = run_at or timezone.now()
+    Job.objects.bulk_create(
+        [Job(name=name, payload=payload or {}, dedup_key=dedup_key, run_at=run_at)
+         for name, payload, dedup_key in jobs],
+        ignore_conflicts=any(dedup_key for _, _, dedup_key in jobs),
+    )
+
+
+def periodic_key(name):
+    return f'periodic:{name}'
+
+
+def schedule_periodic():
+    """
+    queue the periodic jobs that are not queued yet
+    """
+    enqueue_many([(spec.name, None, periodic_key(spec.name)) for spec in registry.values() if spec.every])
+
+
+def get_backoff(attempts):
+    return datetime.timedelta(seconds=min(2 ** attempts, 3600))
+
+
+class Worker:
+    """
+    claims due jobs in batches and runs them, one worker per thread
+    """
+
+    def __init__(self, name=None, batch_size=None):
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.batch_size = batch_size or getattr(settings, 'TODO_JOB_BATCH_SIZE', 10)
+
+    def claim(self):
+        now = timezone.now()
+        with transaction.atomic():
+            ids = list(
+                Job.objects.due(now).select_for_update(skip_locked=True).order_by('run_at')
+                .values_list('id', flat=True)[:self.batch_size]
+            )
+            if not ids:
+                return []
+            Job.objects.filter(id__in=ids).update(
+                status=Job.RUNNING, locked_by=self.name, locked_at=now, attempts=F('attempts') + 1,
+            )
+        return list(Job.objects.filter(id__in=ids).order_by('run_at'))
+
+    def run_job(self, job_):
+        spec = registry.get(job_.name)
+        try:
+            if spec is None:
+                raise LookupError(f'no job is registered as {job_.name}')
+            result = spec.func(job_.payload)
+        except Exception:
+            logger.exception('job %s failed', job_)
+            self.fail(job_, spec, traceback.format_exc())
+        else:
+            self.finish(job_, spec, result)
+
+    def finish(self, job_, spec, result):
+        Job.objects.filter(id=job_.id).update(status=Job.DONE, finished_at=timezone.now(), last_error='')
+        if spec.every:
+            self.schedule_next(spec, job_.payload if result is None else result)
+
+    def fail(self, job_, spec, error):
+        now = timezone.now()
+        if spec is not None and job_.attempts < spec.max_attempts:
+            Job.objects.filter(id=job_.id).update(
+                status=Job.QUEUED, run_at=now + get_backoff(job_.attempts), last_error=error, locked_at=None,
+            )
+            return
+        Job.objects.filter(id=job_.id).update(status=Job.FAILED, finished_at=now, last_error=error)
+        if spec is not None and spec.every:
+            self.schedule_next(spec, job_.payload)
+
+    def schedule_next(self, spec, payload):
+        run_at = timezone.now() + datetime.timedelta(seconds=spec.get_interval())
+        enqueue(spec.name, payload, run_at=run_at, dedup_key=periodic_key(spec.name))
+
+    def requeue_stale(self):
+        """
+        queue again the jobs of workers that died while running them
+        """
+        timeout = datetime.timedelta(seconds=getattr(settings, 'TODO_JOB_TIMEOUT_SECONDS', 300))
+        now = timezone.now()
+        return Job.objects.filter(status=Job.RUNNING, locked_at__lt=now - timeout).update(
+            status=Job.QUEUED, run_at=now, locked_at=None,
+        )
+
+    def run_once(self):
+        """
+        run one batch, return the number of jobs run
+        """
+        claimed = self.claim()
+        for job_ in claimed:
+            self.run_job(job_)
+        return len(claimed)
+
+    def run(self, stop):
+        """
+        run batches until the `stop` event is set, sleeping while the queue is empty
+        """
+        poll = getattr(settings, 'TODO_JOB_POLL_SECONDS', 1)
+        while not stop.is_set():
+            # drop connections that are broken or past CONN_MAX_AGE between batches,
+            # not in run_once, which may run inside a transaction (tests, --once from code)
+            close_old_connections()
+            try:
+                if not self.run_once():
+                    self.requeue_stale()
+                    stop.wait(poll)
+            except Exception:
+                # the database went away, try again after a pause
+                logger.exception('worker %s failed to claim jobs', self.name)
+                stop.wait(poll)
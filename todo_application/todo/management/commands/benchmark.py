@@ -0,0 +1,130 @@
+import json
+import platform
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from todo import benchmarks
+from todo.models import Todo
+
+
+class Command(BaseCommand):
+    help = 'Run the todo api benchmarks against a throwaway test database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--suite', action='append', dest='suites',
+                            help='suite to run, can be repeated (default: all suites)')
+        parser.add_argument('--rows', type=int, nargs='+', default=[10000],
+                            help='volumes of todos to run the suites at, e.g. --rows 10000 1000000 10000000, '
+                                 'each volume is seeded on top of the previous one')
+        parser.add_argument('--tenants', type=int, default=1,
+                            help='users the seeded todos are spread over, the suites measure the todos of the '
+                                 'first one, so its latency can be compared across numbers of tenants')
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--requests', type=int, default=500,
+                            help='requests per run of the load suites')
+        parser.add_argument('--concurrency', type=int, default=16,
+                            help='concurrent clients of the load suites')
+        parser.add_argument('--cache', action='store_true',
+                            help='keep the response cache on, by default every request hits the database')
+        parser.add_argument('--throttle', action='store_true',
+                            help='keep the rate limits and the concurrency cap on, by default no request is refused')
+        parser.add_argument('--output', help='write a json report to this path')
+        parser.add_argument('--compare', help='json report of a previous run to compare the results with')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='keep the test database (and its rows) between runs')
+
+    def get_overrides(self, options):
+        overrides = {}
+        if not options['cache']:
+            overrides['TODO_CACHE_TTL'] = 0
+        if not options['throttle']:
+            overrides['TODO_MAX_CONCURRENT_REQUESTS'] = 0
+            overrides['REST_FRAMEWORK'] = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}}
+        return overrides
+
+    def handle(self, *args, **options):
+        suites = benchmarks.load_suites()
+        names = options['suites'] or sorted(suites)
+        unknown = set(names) - set(suites)
+        if unknown:
+            raise CommandError(f'unknown suites: {", ".join(sorted(unknown))}')
+        if options['tenants'] < 1:
+            raise CommandError('--tenants must be positive')
+
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as file:
+                    baseline = json.load(file)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'cannot read {options["compare"]}: {exc}')
+
+        connection = connections['default']
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'], serialize=False)
+        try:
+            with override_settings(**self.get_overrides(options)):
+                results = self.run(suites, names, sorted(options['rows']), options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'rows': sorted(options['rows']),
+            'tenants': options['tenants'],
+            'page_size': options['page_size'],
+            'cache': options['cache'],
+            'throttle': options['throttle'],
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'report written to {options["output"]}'))
+        if baseline is not None:
+            self.write_comparison(baseline, report)
+
+    def run(self, suites, names, volumes, options):
+        results = []
+        for rows in volumes:
+            existing = Todo.objects.count()
+            if existing < rows:
+                self.stdout.write(f'seeding {rows - existing} todos ...')
+                benchmarks.seed_todos(rows - existing, start=existing, tenants=options['tenants'])
+            self.stdout.write(f'-- {rows} rows')
+            for name in names:
+                for result in suites[name](options):
+                    result['rows'] = rows
+                    results.append(result)
+                    line = f'{result["name"]:<60} median {result["median_ms"]:>10.3f} ms  min {result["min_ms"]:>10.3f} ms'
+                    if 'requests_per_second' in result:
+                        line += f'  {result["requests_per_second"]:>10.2f} req/s'
+                    if 'rows_per_second' in result:
+                        line += f'  {result["rows_per_second"]:>10.2f} rows/s'
+                    if 'bytes' in result:
+                        line += f'  {result["bytes"]:>10} bytes'
+                    self.stdout.write(line)
+        return results
+
+    def write_comparison(self, baseline, report):
+        comparison = benchmarks.compare_reports(baseline, report)
+        if not comparison:
+            self.stdout.write(self.style.WARNING('no result in common with the previous report'))
+            return
+        self.stdout.write(f'-- compared with the report of {baseline.get("created_at")}')
+        for name, rows, before, after, change in comparison:
+            line = f'{name:<60} {rows:>10} rows  {before:>10.3f} -> {after:>10.3f} ms  {change:>+8.2f}%'
+            if change > 10:
+                line = self.style.ERROR(line)
+            elif change < -10:
+                line = self.style.SUCCESS(line)
+            self.stdout.write(line)
@@ -0,0 +1,45 @@
+import gzip
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from todo.compression import brotli
+from todo.schema import SCHEMA_FORMATS
+
+
+class Command(BaseCommand):
+    help = 'Generate the OpenAPI schema once, with gzip and brotli variants, for the schema api to serve.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', default=None,
+                            help='directory to write the schema files to (default: TODO_SCHEMA_DIR)')
+
+    def handle(self, *args, **options):
+        if 'drf_spectacular' not in settings.INSTALLED_APPS:
+            raise CommandError('drf_spectacular is not installed, build the schema with the default settings')
+
+        from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+        from drf_spectacular.settings import spectacular_settings
+
+        output_dir = options['output_dir'] or settings.TODO_SCHEMA_DIR
+        os.makedirs(output_dir, exist_ok=True)
+
+        generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+        schema = generator.get_schema(request=None, public=True)
+        renderers = {'yaml': OpenApiYamlRenderer(), 'json': OpenApiJsonRenderer()}
+
+        for name, (filename, content_type) in SCHEMA_FORMATS.items():
+            content = renderers[name].render(schema, renderer_context={})
+            variants = {filename: content, f'{filename}.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants[f'{filename}.br'] = brotli.compress(content, quality=11)
+            for variant, data in variants.items():
+                # write then rename, so a running server never reads half a file
+                path = os.path.join(output_dir, variant)
+                with open(f'{path}.tmp', 'wb') as file:
+                    file.write(data)
+                os.replace(f'{path}.tmp', path)
+                self.stdout.write(f'{path} {len(data)} bytes')
+
+        self.stdout.write(self.style.SUCCESS(f'schema written to {output_dir}'))
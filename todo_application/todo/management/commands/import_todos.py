@@ -0,0 +1,170 @@
+import itertools
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from todo import imports
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream todos from a json, ndjson or csv file into the database. '
+        'Rows are validated with the rules of the api and written in chunks, '
+        'each chunk in its own transaction.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='input file, "-" reads stdin')
+        parser.add_argument('--format', choices=sorted(imports.READERS),
+                            help='input format (default: guessed from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='rows validated and written per transaction')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='threads validating and writing chunks in parallel')
+        parser.add_argument('--offset', type=int, default=0,
+                            help='skip this many rows, to resume an interrupted import')
+        parser.add_argument('--copy', action='store_true',
+                            help='load with postgres COPY instead of bulk_create')
+        parser.add_argument('--skip-invalid', action='store_true',
+                            help='report and skip invalid rows instead of stopping')
+        parser.add_argument('--owner', metavar='USERNAME',
+                            help='user owning the imported todos, the apis show todos without one to nobody')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or os.path.splitext(options['path'])[1].lstrip('.').lower()
+        if fmt not in imports.READERS:
+            raise CommandError('can not guess the input format, pass --format')
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('--copy needs a postgresql database')
+        if options['batch_size'] < 1 or options['workers'] < 1 or options['offset'] < 0:
+            raise CommandError('--batch-size and --workers must be positive, --offset not negative')
+
+        self.owner_id = None
+        if options['owner']:
+            user = get_user_model()._default_manager.filter(username=options['owner']).first()
+            if user is None:
+                raise CommandError(f'no user is named {options["owner"]}')
+            self.owner_id = user.pk
+
+        self.load = imports.copy_todos if options['copy'] else imports.bulk_create_todos
+        self.options = options
+        self.loaded = self.skipped = 0
+        self.resume_offset = options['offset']
+        self.completed = {}
+        self.started = time.perf_counter()
+
+        if options['path'] == '-':
+            file = sys.stdin
+        else:
+            file = open(options['path'], newline='' if fmt == 'csv' else None, encoding='utf-8')
+        try:
+            records = itertools.islice(imports.READERS[fmt](file), options['offset'], None)
+            error = self.run(self.iter_chunks(records))
+        finally:
+            if file is not sys.stdin:
+                file.close()
+
+        if error is not None:
+            raise CommandError(f'{error}\nresume with --offset {self.resume_offset}')
+        self.stdout.write(self.style.SUCCESS(
+            f'imported {self.loaded} todos ({self.skipped} skipped) in {time.perf_counter() - self.started:.1f}s'
+        ))
+
+    def iter_chunks(self, records):
+        start = self.options['offset']
+        while True:
+            chunk = list(itertools.islice(records, self.options['batch_size']))
+            if not chunk:
+                return
+            yield start, chunk
+            start += len(chunk)
+
+    def load_chunk(self, start, records):
+        valid, invalid = imports.validate_chunk(records, start, self.owner_id)
+        if invalid and not self.options['skip_invalid']:
+            row_number, errors = invalid[0]
+            raise CommandError(f'row {row_number} is invalid: {json.dumps(errors)}')
+        for row_number, errors in invalid:
+            self.stderr.write(f'skipped row {row_number}: {json.dumps(errors)}')
+        if valid:
+            self.load(valid, self.options['batch_size'])
+        return len(valid), len(invalid)
+
+    def run(self, chunks):
+        """
+        a reader thread feeds a bounded queue, so memory stays flat, the
+        workers load chunks and this thread reports progress
+        """
+        workers = self.options['workers']
+        tasks = queue.Queue(maxsize=workers * 2)
+        results = queue.Queue()
+        stop = threading.Event()
+
+        def read():
+            try:
+                for chunk in chunks:
+                    if stop.is_set():
+                        break
+                    tasks.put(chunk)
+            except Exception as exc:
+                results.put((None, 0, 0, 0, exc))
+            finally:
+                for _ in range(workers):
+                    tasks.put(None)
+
+        def work():
+            try:
+                while (task := tasks.get()) is not None:
+                    start, records = task
+                    if stop.is_set():
+                        continue
+                    try:
+                        loaded, skipped = self.load_chunk(start, records)
+                    except Exception as exc:
+                        results.put((start, len(records), 0, 0, exc))
+                    else:
+                        results.put((start, len(records), loaded, skipped, None))
+            finally:
+                connections.close_all()
+                results.put(None)
+
+        threads = [threading.Thread(target=read, daemon=True)]
+        threads += [threading.Thread(target=work) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+
+        error, running = None, workers
+        while running:
+            result = results.get()
+            if result is None:
+                running -= 1
+                continue
+            start, size, loaded, skipped, exc = result
+            if exc is not None:
+                stop.set()
+                error = error or exc
+                continue
+            self.completed[start] = start + size
+            # only the rows before the first unfinished chunk are safe to skip
+            while self.resume_offset in self.completed:
+                self.resume_offset = self.completed.pop(self.resume_offset)
+            self.loaded += loaded
+            self.skipped += skipped
+            self.report()
+        return error
+
+    def report(self):
+        if self.options['verbosity'] < 1:
+            return
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(
+            f'{self.loaded} rows loaded, {self.skipped} skipped, '
+            f'{self.loaded / elapsed if elapsed else 0:.0f} rows/s, resume offset {self.resume_offset}'
+        )
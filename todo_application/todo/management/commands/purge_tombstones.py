@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from todo.models import TodoTombstone
+from todo.sync import get_retention
+
+
+class Command(BaseCommand):
+    help = 'Delete the tombstones of todos deleted longer than TODO_TOMBSTONE_RETENTION_DAYS ago.'
+
+    def handle(self, *args, **options):
+        deleted, _ = TodoTombstone.objects.filter(deleted_at__lt=timezone.now() - get_retention()).delete()
+        self.stdout.write(self.style.SUCCESS(f'{deleted} tombstones deleted'))
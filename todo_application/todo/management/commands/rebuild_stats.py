@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from todo import stats
+from todo.models import TodoDailyStats
+
+
+class Command(BaseCommand):
+    help = ('Recompute the daily todo stats from the todo table and install the triggers that keep them '
+            'up to date. Writes to the todo table wait until it is done.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drop', action='store_true',
+                            help='remove the triggers and empty the stats, set TODO_STATS_SUMMARY=0 too')
+
+    def handle(self, *args, **options):
+        if not stats.supports_summary(connection):
+            raise CommandError('the daily stats need PostgreSQL or SQLite')
+        if options['drop']:
+            stats.drop(connection)
+            self.stdout.write(self.style.SUCCESS('daily stats dropped'))
+            return
+        stats.rebuild(connection)
+        self.stdout.write(self.style.SUCCESS(f'{TodoDailyStats.objects.count()} daily stats rows rebuilt'))
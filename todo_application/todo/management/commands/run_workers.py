@@ -0,0 +1,76 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from todo import jobs
+
+
+class Command(BaseCommand):
+    help = ('Run the background jobs of todo/tasks.py. Start it on as many machines as needed, '
+            'the workers share the queue through the database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1,
+                            help='worker processes to start, this one included')
+        parser.add_argument('--threads', type=int, default=4,
+                            help='worker threads per process')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='jobs a worker claims at once (default: TODO_JOB_BATCH_SIZE)')
+        parser.add_argument('--once', action='store_true',
+                            help='run the jobs that are due now in this process, then exit')
+
+    def handle(self, *args, **options):
+        jobs.schedule_periodic()
+        if options['once']:
+            worker = jobs.Worker(batch_size=options['batch_size'])
+            total = 0
+            while True:
+                ran = worker.run_once()
+                if not ran:
+                    break
+                total += ran
+            self.stdout.write(self.style.SUCCESS(f'{total} jobs run'))
+            return
+
+        children = [self.spawn(options) for _ in range(options['processes'] - 1)]
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: stop.set())
+
+        threads = [
+            threading.Thread(target=self.work, args=(f'{socket.gethostname()}:{os.getpid()}:{index}', options, stop))
+            for index in range(options['threads'])
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f'{len(threads)} workers running in process {os.getpid()}')
+        while not stop.wait(1):
+            pass
+
+        for child in children:
+            child.terminate()
+        for thread in threads:
+            thread.join()
+        for child in children:
+            child.wait()
+
+    def spawn(self, options):
+        command = [sys.executable, sys.argv[0], 'run_workers', '--processes', '1', '--threads', str(options['threads'])]
+        if options['batch_size']:
+            command += ['--batch-size', str(options['batch_size'])]
+        if options.get('settings'):
+            command += ['--settings', options['settings']]
+        return subprocess.Popen(command)
+
+    @staticmethod
+    def work(name, options, stop):
+        try:
+            jobs.Worker(name=name, batch_size=options['batch_size']).run(stop)
+        finally:
+            connection.close()
@@ -0,0 +1,56 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from todo import cache, partitions
+
+
+def month(value):
+    return datetime.datetime.strptime(value, '%Y-%m').date()
+
+
+class Command(BaseCommand):
+    help = ('Create the partitions of the coming months of the todo table, and drop or archive the old ones. '
+            'Run it daily, e.g. from cron.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=None,
+                            help='months to create partitions for after the current one '
+                                 '(default: TODO_PARTITION_MONTHS_AHEAD)')
+        parser.add_argument('--drop-before', type=month, metavar='YYYY-MM',
+                            help='drop the partitions of the months before this one')
+        parser.add_argument('--archive-before', type=month, metavar='YYYY-MM',
+                            help='detach the partitions of the months before this one and keep them '
+                                 'as ToDO_list_archive_YYYY_MM tables')
+        parser.add_argument('--convert', action='store_true',
+                            help='partition a plain todo table first (locks the table while it is copied)')
+
+    def handle(self, *args, **options):
+        if options['drop_before'] and options['archive_before']:
+            raise CommandError('use either --drop-before or --archive-before')
+        if not partitions.supports_partitioning(connection):
+            raise CommandError('partitioning the todo table needs PostgreSQL 13 or later')
+
+        with connection.cursor() as cursor:
+            if not partitions.is_partitioned(cursor):
+                if not options['convert']:
+                    raise CommandError('the todo table is not partitioned, run with --convert to partition it')
+                self.stdout.write('partitioning the todo table ...')
+                partitions.rebuild_table(cursor, partitioned=True)
+
+            created = partitions.ensure_partitions(cursor, partitions.upcoming_months(options['months_ahead']))
+            for name in created:
+                self.stdout.write(f'created {name}')
+
+            before = options['drop_before'] or options['archive_before']
+            if before:
+                removed = partitions.remove_partitions(cursor, before, archive=bool(options['archive_before']))
+                for name in removed:
+                    self.stdout.write(f'{"archived" if options["archive_before"] else "dropped"} {name}')
+                if removed:
+                    cache.invalidate_all()
+
+            for name, _, rows in partitions.list_partitions(cursor):
+                self.stdout.write(f'{name:<30} ~{rows} rows')
+        self.stdout.write(self.style.SUCCESS(f'{len(created)} partitions created'))
@@ -0,0 +1,192 @@
+import bisect
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+
+"""
+    request metrics of the todo api in the prometheus text format.
+    the MetricsMiddleware opens a RequestMetrics for every request, the
+    query recorder (installed on every database connection) and the
+    serializers add their time to it, and at the end of the request it is
+    folded into the histograms below and sent back in a Server-Timing header.
+    the registry lives in the process, scrape every worker (or run one
+    worker per pod) when you deploy more than one.
+"""
+
+logger = logging.getLogger('todo.slow_queries')
+
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    def __init__(self, name, documentation, labels, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[label] for label in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            sample = self.samples.get(key)
+            if sample is None:
+                sample = self.samples[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                sample[0][index] += 1
+            sample[1] += value
+            sample[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            samples = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self.samples.items())
+        for key, (counts, total, count) in samples:
+            labels = format_labels(zip(self.labels, key))
+            cumulative = 0
+            for bucket, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bucket}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total}')
+            lines.append(f'{self.name}_count{{{labels}}} {count}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, documentation, labels):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[label] for label in self.labels)
+        with self.lock:
+            self.samples[key] = self.samples.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self.lock:
+            samples = sorted(self.samples.items())
+        for key, value in samples:
+            lines.append(f'{self.name}{{{format_labels(zip(self.labels, key))}}} {value}')
+        return lines
+
+
+def format_labels(pairs):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{name}="{escape(value)}"' for name, value in pairs)
+
+
+REQUESTS = Counter('todo_requests_total', 'Requests by view, method and status.', ('view', 'method', 'status'))
+REQUEST_DURATION = Histogram('todo_request_duration_seconds', 'Request latency.', ('view', 'method'))
+REQUEST_QUERIES = Histogram('todo_request_queries', 'SQL queries per request.', ('view', 'method'),
+                            buckets=QUERY_COUNT_BUCKETS)
+REQUEST_DB_DURATION = Histogram('todo_request_db_seconds', 'Time spent in SQL per request.', ('view', 'method'))
+REQUEST_SERIALIZER_DURATION = Histogram('todo_request_serializer_seconds', 'Time spent serializing per request.',
+                                        ('view', 'method'))
+SLOW_QUERIES = Counter('todo_slow_queries_total', 'Queries slower than TODO_SLOW_QUERY_MS.', ('view',))
+THROTTLED = Counter('todo_throttled_total', 'Requests refused by a rate limit or the concurrency cap.', ('scope',))
+
+REGISTRY = (REQUESTS, REQUEST_DURATION, REQUEST_QUERIES, REQUEST_DB_DURATION, REQUEST_SERIALIZER_DURATION,
+            SLOW_QUERIES, THROTTLED)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.slow_queries = 0
+        self.lock = threading.Lock()
+
+    def add_query(self, duration, slow=False):
+        with self.lock:
+            self.queries += 1
+            self.db_time += duration
+            self.slow_queries += slow
+
+
+current = contextvars.ContextVar('todo_request_metrics', default=None)
+
+
+def get_slow_query_threshold():
+    return getattr(settings, 'TODO_SLOW_QUERY_MS', 200) / 1000
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    database execute wrapper, installed on every connection by the todo app
+    """
+    metrics = current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        slow = duration >= get_slow_query_threshold()
+        metrics.add_query(duration, slow)
+        if slow:
+            logger.warning('slow query (%.1f ms): %s', duration * 1000, sql,
+                           extra={'duration': duration, 'sql': sql, 'params': params})
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextlib.contextmanager
+def serializer_timer():
+    metrics = current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_time += time.perf_counter() - start
+
+
+def observe_request(request, response, metrics):
+    match = getattr(request, 'resolver_match', None)
+    view = match.view_name if match else 'unresolved'
+    method = request.method
+    total = time.perf_counter() - metrics.started
+
+    REQUESTS.inc(view=view, method=method, status=response.status_code)
+    REQUEST_DURATION.observe(total, view=view, method=method)
+    REQUEST_QUERIES.observe(metrics.queries, view=view, method=method)
+    REQUEST_DB_DURATION.observe(metrics.db_time, view=view, method=method)
+    REQUEST_SERIALIZER_DURATION.observe(metrics.serializer_time, view=view, method=method)
+    if metrics.slow_queries:
+        SLOW_QUERIES.inc(metrics.slow_queries, view=view)
+
+    response['Server-Timing'] = (
+        f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.queries} queries", '
+        f'serialize;dur={metrics.serializer_time * 1000:.2f}, '
+        f'total;dur={total * 1000:.2f}'
+    )
+
+
+def metrics_view(request):
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,181 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+from . import metrics, routers, compression, throttling
+
+
+class MetricsMiddleware:
+    """
+    this middleware measure every request, see todo/metrics.py
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.current.set(request_metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.current.reset(token)
+        metrics.observe_request(request, response, request_metrics)
+        return response
+
+    async def __acall__(self, request):
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.current.set(request_metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.current.reset(token)
+        metrics.observe_request(request, response, request_metrics)
+        return response
+
+
+class AdmissionMiddleware:
+    """
+    this middleware let TODO_MAX_CONCURRENT_REQUESTS requests of this
+    process run at a time (0 lets all in) and answer 503 with Retry-After
+    to the others right away, so a burst waits in the clients and not on
+    database connections. a streamed body (export, change feed) no longer
+    counts once its response is returned
+    """
+    sync_capable = True
+    async_capable = True
+    # scrapes must get through while the workers are busy
+    exempt_paths = ('/metrics',)
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.path in self.exempt_paths:
+            return self.get_response(request)
+        if not throttling.in_flight.enter(getattr(settings, 'TODO_MAX_CONCURRENT_REQUESTS', 0)):
+            return self.busy_response()
+        try:
+            return self.get_response(request)
+        finally:
+            throttling.in_flight.leave()
+
+    async def __acall__(self, request):
+        if request.path in self.exempt_paths:
+            return await self.get_response(request)
+        if not throttling.in_flight.enter(getattr(settings, 'TODO_MAX_CONCURRENT_REQUESTS', 0)):
+            return self.busy_response()
+        try:
+            return await self.get_response(request)
+        finally:
+            throttling.in_flight.leave()
+
+    def busy_response(self):
+        metrics.THROTTLED.inc(scope='concurrency')
+        response = JsonResponse({'detail': 'The server is busy, retry later.'}, status=503)
+        response.headers['Retry-After'] = str(getattr(settings, 'TODO_ADMISSION_RETRY_AFTER', 1))
+        return response
+
+
+class ReplicaPinningMiddleware:
+    """
+    this middleware pin a client to the primary database for
+    TODO_REPLICA_PIN_SECONDS after each write, with a cookie, so its next
+    reads do not hit a replica that has not caught up yet
+    """
+    sync_capable = True
+    async_capable = True
+    cookie_name = 'todo_pin_primary'
+    safe_methods = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = routers.pinned_to_primary.set(self.cookie_name in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.pinned_to_primary.reset(token)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        token = routers.pinned_to_primary.set(self.cookie_name in request.COOKIES)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.pinned_to_primary.reset(token)
+        return self.pin(request, response)
+
+    def pin(self, request, response):
+        if (request.method not in self.safe_methods and response.status_code < 400
+                and routers.get_replicas()):
+            response.set_cookie(
+                self.cookie_name, '1',
+                max_age=getattr(settings, 'TODO_REPLICA_PIN_SECONDS', 5),
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    this middleware compress responses of TODO_COMPRESS_MIN_SIZE bytes or
+    more with the encoding the client prefers among the available ones
+    (zstd, br, gzip, see todo/compression.py). streaming responses, like
+    the export api, are gzipped chunk by chunk by GZipMiddleware.
+    only the api payloads are compressed: html pages (the admin, the
+    browsable api) carry a csrf token, compressed next to text an attacker
+    can reflect into the page they are open to BREACH
+    """
+    compressed_paths = ('/api/',)
+    compressed_types = (
+        'application/json', 'application/x-ndjson', 'application/msgpack', 'text/csv',
+        'application/vnd.oai.openapi', 'application/vnd.oai.openapi+json',
+    )
+
+    def process_response(self, request, response):
+        content_type = response.get('Content-Type', '').partition(';')[0].strip().lower()
+        if not request.path.startswith(self.compressed_paths) or content_type not in self.compressed_types:
+            # server sent events are left out too, compressing would hold the events back in the compressor
+            return response
+        if response.streaming:
+            return super().process_response(request, response)
+        if (len(response.content) < getattr(settings, 'TODO_COMPRESS_MIN_SIZE', 1024)
+                or response.has_header('Content-Encoding')):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = compression.choose_encoding(request)
+        if encoding is None:
+            return response
+        compressed = compression.compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+
+        # the body changed, so a strong etag has to become weak, weak etags
+        # still match If-None-Match
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
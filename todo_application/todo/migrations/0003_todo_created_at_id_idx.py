@@ -0,0 +1,17 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0002_alter_todo_created_at_alter_todo_due_date_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['created_at', 'id'], name='todo_created_at_id_idx'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:50
+
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+# trigram indexes match the UPPER(col::text) LIKE expression django emits
+# for icontains, the trigger keeps search_vector in sync on every write.
+# all of it is postgres only, other backends fall back to icontains.
+POSTGRES_FORWARDS = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX todo_title_trgm_idx ON "ToDO_list" '
+    'USING gin (UPPER("title"::text) gin_trgm_ops)',
+    'CREATE INDEX todo_description_trgm_idx ON "ToDO_list" '
+    'USING gin (UPPER("description"::text) gin_trgm_ops)',
+    'CREATE INDEX todo_search_vector_idx ON "ToDO_list" USING gin ("search_vector")',
+    '''
+    CREATE OR REPLACE FUNCTION todo_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    'CREATE TRIGGER todo_search_vector_trigger '
+    'BEFORE INSERT OR UPDATE OF title, description, search_vector ON "ToDO_list" '
+    'FOR EACH ROW EXECUTE FUNCTION todo_search_vector_update()',
+    # backfill, the trigger recomputes the vector
+    'UPDATE "ToDO_list" SET search_vector = NULL',
+]
+
+POSTGRES_BACKWARDS = [
+    'DROP TRIGGER IF EXISTS todo_search_vector_trigger ON "ToDO_list"',
+    'DROP FUNCTION IF EXISTS todo_search_vector_update()',
+    'DROP INDEX IF EXISTS todo_search_vector_idx',
+    'DROP INDEX IF EXISTS todo_description_trgm_idx',
+    'DROP INDEX IF EXISTS todo_title_trgm_idx',
+]
+
+
+def postgres_only(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0003_todo_created_at_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todo',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['due_date'], name='todo_due_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['completed', 'due_date'], name='todo_completed_due_date_idx'),
+        ),
+        migrations.RunPython(
+            postgres_only(POSTGRES_FORWARDS),
+            postgres_only(POSTGRES_BACKWARDS),
+        ),
+    ]
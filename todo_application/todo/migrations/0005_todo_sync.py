@@ -0,0 +1,32 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:13
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0004_todo_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TodoTombstone',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'ToDO_tombstone',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['updated_at', 'id'], name='todo_updated_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todotombstone',
+            index=models.Index(fields=['deleted_at', 'id'], name='todo_tombstone_deleted_at_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.5 on 2026-10-18 15:02
+
+from django.db import migrations
+
+
+# ids of the change feed events published through postgres NOTIFY (see todo/events.py)
+POSTGRES_FORWARDS = [
+    'CREATE SEQUENCE IF NOT EXISTS todo_event_id_seq',
+]
+
+POSTGRES_BACKWARDS = [
+    'DROP SEQUENCE IF EXISTS todo_event_id_seq',
+]
+
+
+def postgres_only(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0005_todo_sync'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            postgres_only(POSTGRES_FORWARDS),
+            postgres_only(POSTGRES_BACKWARDS),
+        ),
+    ]
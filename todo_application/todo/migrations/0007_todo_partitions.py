@@ -0,0 +1,41 @@
+# Generated by Django 5.1.5 on 2026-10-18 15:40
+
+from django.conf import settings
+from django.db import migrations
+
+
+# ToDO_list becomes a table partitioned by month of due_date, see todo/partitions.py.
+# postgres 13+ only, set TODO_PARTITION_TODOS=0 to keep a plain table (and convert
+# later with `manage.py todo_partitions --convert`).
+
+def partition_todos(apps, schema_editor):
+    from todo import partitions
+
+    if not getattr(settings, 'TODO_PARTITION_TODOS', True):
+        return
+    if not partitions.supports_partitioning(schema_editor.connection):
+        return
+    with schema_editor.connection.cursor() as cursor:
+        if not partitions.is_partitioned(cursor):
+            partitions.rebuild_table(cursor, partitioned=True)
+
+
+def unpartition_todos(apps, schema_editor):
+    from todo import partitions
+
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        if partitions.is_partitioned(cursor):
+            partitions.rebuild_table(cursor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0006_todo_event_id_seq'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_todos, unpartition_todos),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0008_job'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='todo',
+            name='todo_created_at_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='todo',
+            name='todo_due_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='todo',
+            name='todo_updated_at_id_idx',
+        ),
+        migrations.AddField(
+            model_name='todo',
+            name='owner',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='todos', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='todotombstone',
+            name='owner',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['owner', 'created_at', 'id'], name='todo_owner_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['owner', 'due_date'], name='todo_owner_due_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['owner', 'updated_at', 'id'], name='todo_owner_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todotombstone',
+            index=models.Index(fields=['owner', 'deleted_at', 'id'], name='todo_tombstone_owner_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# ToDO_daily_stats is filled and kept up to date by triggers on ToDO_list, see todo/stats.py.
+# set TODO_STATS_SUMMARY=0 before migrating to leave it out (and install it later with
+# `manage.py rebuild_stats`).
+
+def install_summary(apps, schema_editor):
+    from todo import stats
+
+    if stats.summary_enabled() and stats.supports_summary(schema_editor.connection):
+        stats.rebuild(schema_editor.connection)
+
+
+def drop_summary(apps, schema_editor):
+    from todo import stats
+
+    if stats.supports_summary(schema_editor.connection):
+        stats.drop(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0009_todo_owner'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TodoDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('open_count', models.IntegerField(default=0)),
+                ('completed_count', models.IntegerField(default=0)),
+                ('owner', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'ToDO_daily_stats',
+                'constraints': [models.UniqueConstraint(fields=('owner', 'day'), name='todo_daily_stats_owner_day_uniq')],
+            },
+        ),
+        migrations.RunPython(install_summary, drop_summary),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0010_todo_daily_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255)),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('response_status', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('response_data', models.JSONField(blank=True, null=True)),
+                ('response_headers', models.JSONField(default=dict)),
+                ('expires_at', models.DateTimeField()),
+                ('owner', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'ToDO_idempotency_key',
+                'indexes': [models.Index(fields=['expires_at'], name='todo_idempotency_expires_idx')],
+                'constraints': [models.UniqueConstraint(fields=('owner', 'key'), name='todo_idempotency_owner_key_uniq')],
+            },
+        ),
+    ]
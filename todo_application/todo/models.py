@@ -1,20 +1,275 @@
-from django.db import models
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, models, transaction
+from django.db.models import sql
+from django.utils import timezone
 import uuid
 
+
+class TodoQuerySet(models.QuerySet):
+    """
+    writes that return the touched rows in the same statement
+    (UPDATE/DELETE ... RETURNING) on databases that support it.
+    they do not send model signals, callers take care of side effects.
+    deletes record their tombstones in the same transaction, so the sync
+    api never misses one.
+    """
+    returning_fields = ('id', 'owner', 'title', 'description', 'due_date', 'completed', 'created_at', 'updated_at')
+
+    def owned_by(self, user):
+        """
+        the todos of `user`, every api query starts here
+        """
+        return self.filter(owner=user)
+
+    def can_return_rows(self):
+        connection = connections[self.db]
+        return connection.vendor in ('postgresql', 'sqlite') and connection.features.can_return_columns_from_insert
+
+    def returning_sql(self, query):
+        connection = connections[self.db]
+        compiler = query.get_compiler(self.db)
+        statement, params = compiler.as_sql()
+        columns = ', '.join(
+            connection.ops.quote_name(self.model._meta.get_field(name).column) for name in self.returning_fields
+        )
+        return f'{statement} RETURNING {columns}', params
+
+    def update_returning(self, **values):
+        """
+        write only the given fields of the matching todos, return them updated
+        """
+        values.setdefault('updated_at', timezone.now())
+        if not self.can_return_rows():
+            with transaction.atomic(using=self.db):
+                pks = list(self.values_list('pk', flat=True))
+                self.model._base_manager.using(self.db).filter(pk__in=pks).update(**values)
+                return list(self.model._base_manager.using(self.db).filter(pk__in=pks))
+
+        query = self.query.chain(sql.UpdateQuery)
+        query.add_update_values(values)
+        query.annotations = {}
+        try:
+            return list(self.raw(*self.returning_sql(query)))
+        except EmptyResultSet:
+            return []
+
+    def delete_returning(self):
+        """
+        delete the matching todos in one statement and return them
+        """
+        if connections[self.db].vendor == 'postgresql':
+            return self._delete_returning_with_tombstones()
+        with transaction.atomic(using=self.db):
+            todo_s = self._delete_returning()
+            TodoTombstone.objects.record(todo_s, using=self.db)
+        return todo_s
+
+    def _delete_returning(self):
+        if not self.can_return_rows():
+            todo_s = list(self)
+            self.model._base_manager.using(self.db).filter(pk__in=[todo.pk for todo in todo_s])._raw_delete(self.db)
+            return todo_s
+
+        query = self.query.chain(sql.DeleteQuery)
+        try:
+            return list(self.raw(*self.returning_sql(query)))
+        except EmptyResultSet:
+            return []
+
+    def _delete_returning_with_tombstones(self):
+        # postgres runs both writes of a data modifying WITH in one statement
+        quote_name = connections[self.db].ops.quote_name
+        query = self.query.chain(sql.DeleteQuery)
+        try:
+            statement, params = self.returning_sql(query)
+        except EmptyResultSet:
+            return []
+        tombstones = quote_name(TodoTombstone._meta.db_table)
+        return list(self.raw(
+            f'WITH "deleted" AS ({statement}), "tombstones" AS ('
+            f'INSERT INTO {tombstones} ("id", "owner_id", "deleted_at") SELECT "id", "owner_id", %s FROM "deleted" '
+            f'ON CONFLICT ("id") DO UPDATE SET "deleted_at" = EXCLUDED."deleted_at", "owner_id" = EXCLUDED."owner_id"'
+            f') SELECT * FROM "deleted"',
+            (*params, timezone.now()),
+        ))
+
+    async def aupdate_returning(self, **values):
+        return await sync_to_async(self.update_returning)(**values)
+
+    async def adelete_returning(self):
+        return await sync_to_async(self.delete_returning)()
+
+
 class Todo(models.Model):
     """
     this model use for stored _todo_ information in database
     """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # null for the todos written before there were owners, the apis show them to nobody.
+    # the composite indexes below lead with it, so it needs no index of its own
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True,
+                              related_name='todos', db_index=False)
     title = models.CharField(max_length=100)
     description = models.TextField()
     due_date = models.DateTimeField()
     completed = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # filled by a database trigger on postgres, see todo/search.py
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = TodoQuerySet.as_manager()
 
     def __str__(self):
         return self.title
 
     class Meta:
         db_table = 'ToDO_list'
+        indexes = [
+            # keyset for the cursor pagination of the list api, per owner
+            models.Index(fields=['owner', 'created_at', 'id'], name='todo_owner_created_at_idx'),
+            models.Index(fields=['owner', 'due_date'], name='todo_owner_due_date_idx'),
+            # the due date scan of todo/tasks.py, across owners
+            models.Index(fields=['completed', 'due_date'], name='todo_completed_due_date_idx'),
+            # keyset of the sync api, per owner
+            models.Index(fields=['owner', 'updated_at', 'id'], name='todo_owner_updated_at_idx'),
+        ]
+
+
+class TodoTombstoneQuerySet(models.QuerySet):
+
+    def record(self, todos, using=None):
+        """
+        remember the given todos as deleted now, a todo deleted again
+        (after it was imported back with its id) moves its tombstone forward
+        """
+        if not todos:
+            return
+        deleted_at = timezone.now()
+        self.using(using or self.db).bulk_create(
+            [TodoTombstone(id=todo.pk, owner_id=todo.owner_id, deleted_at=deleted_at) for todo in todos],
+            update_conflicts=True, update_fields=['owner', 'deleted_at'], unique_fields=['id'],
+        )
+
+
+class TodoTombstone(models.Model):
+    """
+    this model remember the ids of deleted todos, so the sync api can tell
+    clients about deletes, old ones are dropped by `manage.py purge_tombstones`
+    """
+    id = models.UUIDField(primary_key=True, editable=False)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True,
+                              related_name='+', db_index=False)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    objects = TodoTombstoneQuerySet.as_manager()
+
+    def __str__(self):
+        return str(self.id)
+
+    class Meta:
+        db_table = 'ToDO_tombstone'
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'], name='todo_tombstone_deleted_at_idx'),
+            # keyset of the sync api, per owner
+            models.Index(fields=['owner', 'deleted_at', 'id'], name='todo_tombstone_owner_idx'),
+        ]
+
+
+class TodoDailyStats(models.Model):
+    """
+    this model count the open and completed todos of an owner per due day
+    (utc), database triggers keep it up to date, see todo/stats.py
+    """
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+', db_index=False)
+    day = models.DateField()
+    open_count = models.IntegerField(default=0)
+    completed_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.owner_id} {self.day}'
+
+    class Meta:
+        db_table = 'ToDO_daily_stats'
+        constraints = [
+            # the upsert target of the triggers, and the index of the stats api
+            models.UniqueConstraint(fields=['owner', 'day'], name='todo_daily_stats_owner_day_uniq'),
+        ]
+
+
+class IdempotencyKey(models.Model):
+    """
+    this model keep the response of a write sent with an Idempotency-Key
+    header, a retry with the same key gets it back without writing again,
+    see todo/idempotency.py. the response is empty while the first request runs
+    """
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+', db_index=False)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_data = models.JSONField(null=True, blank=True)
+    response_headers = models.JSONField(default=dict)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.owner_id} {self.key}'
+
+    class Meta:
+        db_table = 'ToDO_idempotency_key'
+        constraints = [
+            # the lock of a key, and the index of the lookups
+            models.UniqueConstraint(fields=['owner', 'key'], name='todo_idempotency_owner_key_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='todo_idempotency_expires_idx'),
+        ]
+
+
+class JobQuerySet(models.QuerySet):
+
+    def due(self, now=None):
+        return self.filter(status=Job.QUEUED, run_at__lte=now or timezone.now())
+
+
+class Job(models.Model):
+    """
+    this model is the queue of the background jobs, see todo/jobs.py.
+    a job with a dedup_key is not queued twice while one with the same key
+    is waiting or running
+    """
+    QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+    STATUSES = [(QUEUED, 'queued'), (RUNNING, 'running'), (DONE, 'done'), (FAILED, 'failed')]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    dedup_key = models.CharField(max_length=200, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    objects = JobQuerySet.as_manager()
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
+
+    class Meta:
+        db_table = 'ToDO_job'
+        indexes = [
+            # what the workers claim, the finished jobs are not in it
+            models.Index(fields=['run_at'], condition=models.Q(status='queued'), name='todo_job_queued_run_at_idx'),
+            models.Index(fields=['locked_at'], condition=models.Q(status='running'), name='todo_job_running_idx'),
+            models.Index(fields=['finished_at'], name='todo_job_finished_at_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['dedup_key'], condition=models.Q(status__in=['queued', 'running']),
+                                    name='todo_job_pending_dedup_key'),
+        ]
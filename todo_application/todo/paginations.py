@@ -1,10 +1,336 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from django.core.paginator import InvalidPage, EmptyPage, PageNotAnInteger, Page, Paginator
+from rest_framework.pagination import PageNumberPagination, CursorPagination, Cursor
+from . import cache
+
+
+class CountedPage(Page):
+    """
+    page of a paginator whose count may be capped, estimated or missing,
+    has_next then comes from the extra row fetched with the page and the
+    neighbour page numbers are not checked against the count
+    """
+    more = None
+
+    def has_next(self):
+        if self.more is None:
+            return super().has_next()
+        return self.more
+
+    def next_page_number(self):
+        if self.more is None:
+            return super().next_page_number()
+        return self.number + 1
+
+    def previous_page_number(self):
+        # Page checks the number against num_pages, which a capped or missing count can not give
+        if self.more is None:
+            return super().previous_page_number()
+        return self.number - 1
+
+
+class CountedPaginator(Paginator):
+    """
+    when `exact` is false the count is only for display, pages are sliced
+    without checking the number against it and one extra row is fetched
+    """
+    exact = True
+
+    def page(self, number):
+        if self.exact:
+            return super().page(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_('That page number is not an integer'))
+        if number < 1:
+            raise EmptyPage(_('That page number is less than 1'))
+        bottom = (number - 1) * self.per_page
+        return self._get_page(self.object_list[bottom:bottom + self.per_page + 1], number, self)
+
+    def _get_page(self, *args, **kwargs):
+        return CountedPage(*args, **kwargs)
 
 
 class CustomPagination(PageNumberPagination):
     """
-    this class include the paginator config
+    this class include the paginator config.
+    the total count is made by one of the COUNT_STRATEGIES, picked by the
+    client with ?count= or by the TODO_COUNT_STRATEGY setting:
+    exact runs COUNT(*), capped counts up to TODO_COUNT_CAP rows and reports
+    "<cap>+" past it, estimate asks the postgres planner and only counts
+    exactly when the estimate is under the cap, none skips the count.
+    counts are cached for TODO_COUNT_CACHE_TTL seconds per filtered query.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    django_paginator_class = CountedPaginator
+    count_query_param = 'count'
+    count_strategies = ('exact', 'capped', 'estimate', 'none')
+
+    def get_count_strategy(self, request):
+        strategy = request.query_params.get(self.count_query_param)
+        if strategy in self.count_strategies:
+            return strategy
+        return getattr(settings, 'TODO_COUNT_STRATEGY', 'exact')
+
+    def get_count(self, queryset, strategy):
+        """
+        return (count, exact, label), label is what the response shows
+        """
+        if strategy == 'none':
+            return None, False, None
+
+        ttl = getattr(settings, 'TODO_COUNT_CACHE_TTL', 30)
+        if ttl:
+            key = cache.count_key(strategy, queryset, self.request.user.pk)
+            counted = cache.get_cache().get(key)
+            if counted is None:
+                counted = self.count(queryset, strategy)
+                cache.get_cache().set(key, counted, ttl)
+            return tuple(counted)
+        return self.count(queryset, strategy)
+
+    def count(self, queryset, strategy):
+        cap = getattr(settings, 'TODO_COUNT_CAP', 10000)
+        if strategy == 'estimate':
+            estimate = estimate_count(queryset)
+            if estimate is not None and estimate > cap:
+                return estimate, False, estimate
+            # small results are cheap to count and planner estimates of
+            # selective filters are the least reliable, count them exactly
+            strategy = 'capped'
+        if strategy == 'capped':
+            count = queryset.order_by()[:cap + 1].count()
+            if count > cap:
+                return cap, False, f'{cap}+'
+            return count, True, count
+        count = queryset.count()
+        return count, True, count
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.get_paginator(queryset, page_size, request)
+        paginator.count, paginator.exact, self.count_label = self.get_count(queryset, self.count_strategy)
+        self.set_page(paginator, request)
+        return self.set_page_rows(list(self.page.object_list))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        same as paginate_queryset but count and fetch with the async orm
+        """
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.get_paginator(queryset, page_size, request)
+        # Paginator.count is a cached_property, fill it so nothing runs sync
+        paginator.count, paginator.exact, self.count_label = await sync_to_async(self.get_count)(
+            queryset, self.count_strategy,
+        )
+        self.set_page(paginator, request)
+        return self.set_page_rows([item async for item in self.page.object_list])
+
+    def get_paginator(self, queryset, page_size, request):
+        self.request = request
+        self.count_strategy = self.get_count_strategy(request)
+        return self.django_paginator_class(queryset, page_size)
+
+    def set_page(self, paginator, request):
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(page_number=page_number, message=str(exc))
+            raise NotFound(msg)
+
+    def set_page_rows(self, rows):
+        paginator = self.page.paginator
+        if not paginator.exact:
+            if not rows and self.page.number > 1:
+                msg = self.invalid_page_message.format(page_number=self.page.number, message=_('That page contains no results'))
+                raise NotFound(msg)
+            self.page.more = len(rows) > paginator.per_page
+            rows = rows[:paginator.per_page]
+        self.page.object_list = rows
+        if paginator.exact and paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return rows
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data['count'] = self.count_label
+        return response
+
+
+def estimate_count(queryset):
+    """
+    row estimate of the postgres planner, reltuples of the table when the
+    queryset is not filtered, EXPLAIN otherwise. None on other databases
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    queryset = queryset.order_by()
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [connection.ops.quote_name(queryset.model._meta.db_table)],
+            )
+            row = cursor.fetchone()
+            # -1 until the table is vacuumed or analyzed the first time
+            if row and row[0] >= 0:
+                return row[0]
+        sql, params = queryset.query.sql_with_params()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']['Plan Rows']
+
+
+class CustomCursorPagination(CursorPagination):
+    """
+    this class paginate with a keyset on (created_at, id) instead of
+    OFFSET, so it never counts the table and every page costs the same
+    no matter how deep the client walks.
+    the position stored in the cursor is "<created_at>|<id>" which is
+    unique, so we never need the offset part of drf cursors.
     """
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 100
+    ordering = ('-created_at', '-id')
+    position_separator = '|'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        same as paginate_queryset but fetch with the async orm
+        """
+        queryset = self.get_page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.set_page([item async for item in queryset])
+
+    def get_page_queryset(self, queryset, request):
+        """
+        return the lazy queryset of the page plus one row to know if more follow
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            self.reverse, self.position = False, None
+        else:
+            self.reverse, self.position = self.cursor.reverse, self.cursor.position
+
+        if self.reverse:
+            queryset = queryset.order_by('created_at', 'id')
+        else:
+            queryset = queryset.order_by('-created_at', '-id')
+
+        if self.position is not None:
+            created_at, pk = self.parse_position(self.position)
+            # written as "created_at <= x and (...)" so postgres can use a
+            # range scan on the (created_at, id) index instead of an OR
+            if self.reverse:
+                queryset = queryset.filter(
+                    Q(created_at__gte=created_at),
+                    Q(created_at__gt=created_at) | Q(id__gt=pk),
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__lte=created_at),
+                    Q(created_at__lt=created_at) | Q(id__lt=pk),
+                )
+
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if self.reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+
+        if self.page:
+            self.next_position = self._get_position_from_instance(self.page[-1], self.ordering)
+            self.previous_position = self._get_position_from_instance(self.page[0], self.ordering)
+        else:
+            self.next_position = self.previous_position = self.position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or self.next_position is None:
+            return None
+        cursor = Cursor(offset=0, reverse=False, position=self.next_position)
+        return self.encode_cursor(cursor)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.previous_position is None:
+            return None
+        cursor = Cursor(offset=0, reverse=True, position=self.previous_position)
+        return self.encode_cursor(cursor)
+
+    def parse_position(self, position):
+        created_at, _, pk = position.partition(self.position_separator)
+        try:
+            created_at = parse_datetime(created_at)
+            pk = uuid.UUID(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
+
+    def _get_position_from_instance(self, instance, ordering):
+        if isinstance(instance, dict):
+            created_at, pk = instance['created_at'], instance['id']
+        else:
+            created_at, pk = instance.created_at, instance.id
+        return '%s%s%s' % (created_at.isoformat(), self.position_separator, pk)
+
+
+def select_paginator(request, pagination_class=CustomPagination, cursor_pagination_class=CustomCursorPagination):
+    """
+    clients opt in the cursor mode with ?pagination=cursor (or by
+    sending back a cursor), otherwise the page number mode is used
+    """
+    if (request.query_params.get('pagination') == 'cursor'
+            or cursor_pagination_class.cursor_query_param in request.query_params):
+        return cursor_pagination_class()
+    return pagination_class()
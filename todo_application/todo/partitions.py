@@ -0,0 +1,240 @@
+import datetime
+import re
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import stats
+
+"""
+    monthly range partitions of the todo table on due_date, postgres only.
+    migration 0007 (or `manage.py todo_partitions --convert`) rebuilds
+    ToDO_list as a table partitioned by range of due_date with one partition
+    per month, named ToDO_list_pYYYY_MM, and a default partition for the
+    dates no partition covers. the primary key becomes (id, due_date) as
+    postgres requires, so the database no longer keeps ids unique: new ids
+    are random uuids, and the importer leaves out the ids already in the
+    table itself (todo/imports.py) as a conflict on id does not happen.
+
+    queries filtered on due_date only scan the matching months (partition
+    pruning), and old months leave the table by detaching their partition,
+    which is instant and leaves no dead rows behind, unlike a bulk DELETE.
+    `manage.py todo_partitions` creates the partitions of the coming months
+    and drops or archives the old ones, run it from cron.
+
+    everything here works on a cursor and the table name, not the model, so
+    the migration keeps working whatever the model becomes.
+"""
+
+TABLE = 'ToDO_list'
+PARTITION_KEY = 'due_date'
+DEFAULT_PARTITION = f'{TABLE}_default'
+TOMBSTONE_TABLE = 'ToDO_tombstone'
+PARTITION_NAME = re.compile(rf'^{TABLE}_p(\d{{4}})_(\d{{2}})$')
+# before row triggers (the search_vector one) on partitioned tables need postgres 13
+MIN_POSTGRES_VERSION = 130000
+
+
+def quote(name):
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def month_start(value):
+    return datetime.date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month:%Y_%m}'
+
+
+def partition_month(name):
+    """
+    the month of a partition from its name, None for the default partition
+    """
+    match = PARTITION_NAME.match(name)
+    if match is None:
+        return None
+    return datetime.date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def month_bound(month):
+    return f"'{month:%Y-%m-%d} 00:00:00+00'"
+
+
+def get_months_ahead():
+    return getattr(settings, 'TODO_PARTITION_MONTHS_AHEAD', 3)
+
+
+def upcoming_months(months_ahead=None, today=None):
+    """
+    the current month and the `months_ahead` next ones
+    """
+    if months_ahead is None:
+        months_ahead = get_months_ahead()
+    current = month_start(today or timezone.now())
+    return [add_months(current, count) for count in range(months_ahead + 1)]
+
+
+def supports_partitioning(connection):
+    return connection.vendor == 'postgresql' and connection.pg_version >= MIN_POSTGRES_VERSION
+
+
+def is_partitioned(cursor, table=TABLE):
+    cursor.execute(
+        'SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))',
+        [quote(table)],
+    )
+    return cursor.fetchone()[0]
+
+
+def list_partitions(cursor):
+    """
+    return [(name, month, estimated rows)] of the partitions, the default
+    partition last with a None month
+    """
+    cursor.execute(
+        'SELECT child.relname, child.reltuples FROM pg_inherits '
+        'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+        'WHERE pg_inherits.inhparent = to_regclass(%s) ORDER BY child.relname',
+        [quote(TABLE)],
+    )
+    partitions = [(name, partition_month(name), max(int(rows), 0)) for name, rows in cursor.fetchall()]
+    return sorted(partitions, key=lambda partition: (partition[1] is None, partition[1] or datetime.date.min))
+
+
+def create_partition(cursor, month):
+    """
+    create the partition of `month` unless it exists, rows of that month
+    that went to the default partition meanwhile are moved into it.
+    return True when it was created
+    """
+    name = partition_name(month)
+    cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [quote(name)])
+    if cursor.fetchone()[0]:
+        return False
+
+    start, end = month_bound(month), month_bound(add_months(month, 1))
+    in_range = f'{quote(PARTITION_KEY)} >= {start} AND {quote(PARTITION_KEY)} < {end}'
+    with transaction.atomic():
+        cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {quote(DEFAULT_PARTITION)} WHERE {in_range})')
+        if not cursor.fetchone()[0]:
+            cursor.execute(
+                f'CREATE TABLE {quote(name)} PARTITION OF {quote(TABLE)} FOR VALUES FROM ({start}) TO ({end})'
+            )
+            return True
+        # attaching would fail while the default partition holds rows of the month
+        cursor.execute(f'CREATE TABLE {quote(name)} (LIKE {quote(TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM {quote(DEFAULT_PARTITION)} WHERE {in_range} RETURNING *) '
+            f'INSERT INTO {quote(name)} SELECT * FROM moved'
+        )
+        cursor.execute(
+            f'ALTER TABLE {quote(TABLE)} ATTACH PARTITION {quote(name)} FOR VALUES FROM ({start}) TO ({end})'
+        )
+    return True
+
+
+def ensure_partitions(cursor, months):
+    """
+    create the missing partitions of the given months, return their names
+    """
+    return [partition_name(month) for month in months if create_partition(cursor, month)]
+
+
+def remove_partitions(cursor, before, archive=False):
+    """
+    detach the partitions of the months before `before`, then drop them,
+    or keep them as ToDO_list_archive_YYYY_MM tables when archiving.
+    their todos get tombstones so sync clients see them go.
+    return the names of the removed partitions
+    """
+    removed = []
+    for name, month, _ in list_partitions(cursor):
+        if month is None or month >= month_start(before):
+            continue
+        with transaction.atomic():
+            # detaching fires no delete trigger, take the rows out of the daily stats here
+            stats.subtract_table(cursor, name)
+            cursor.execute(
+                f'INSERT INTO {quote(TOMBSTONE_TABLE)} ("id", "owner_id", "deleted_at") '
+                f'SELECT "id", "owner_id", %s FROM {quote(name)} '
+                f'ON CONFLICT ("id") DO UPDATE '
+                f'SET "deleted_at" = EXCLUDED."deleted_at", "owner_id" = EXCLUDED."owner_id"',
+                [timezone.now()],
+            )
+            cursor.execute(f'ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(name)}')
+            if archive:
+                cursor.execute(f'ALTER TABLE {quote(name)} RENAME TO {quote(f"{TABLE}_archive_{month:%Y_%m}")}')
+            else:
+                cursor.execute(f'DROP TABLE {quote(name)}')
+        removed.append(name)
+    return removed
+
+
+def get_table_definition(cursor, table):
+    """
+    the index (except the primary key), foreign key and trigger definitions
+    of a table, LIKE only copies the columns, defaults and checks
+    """
+    cursor.execute(
+        'SELECT pg_get_indexdef(indexrelid) FROM pg_index '
+        'WHERE indrelid = to_regclass(%s) AND NOT indisprimary ORDER BY indexrelid',
+        [quote(table)],
+    )
+    indexes = [row[0] for row in cursor.fetchall()]
+    cursor.execute(
+        'SELECT pg_get_triggerdef(oid) FROM pg_trigger WHERE tgrelid = to_regclass(%s) AND NOT tgisinternal',
+        [quote(table)],
+    )
+    triggers = [row[0] for row in cursor.fetchall()]
+    cursor.execute(
+        'SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint '
+        "WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+        [quote(table)],
+    )
+    foreign_keys = [
+        f'ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}'
+        for name, definition in cursor.fetchall()
+    ]
+    return indexes, foreign_keys, triggers
+
+
+def rebuild_table(cursor, partitioned):
+    """
+    rewrite the todo table as a partitioned one, or back to a plain one,
+    keeping its rows, indexes, foreign keys and triggers. it holds an
+    exclusive lock for the whole copy, run it in a maintenance window on a
+    big table
+    """
+    old = f'{TABLE}_old'
+    cursor.execute(f'ALTER TABLE {quote(TABLE)} RENAME TO {quote(old)}')
+    indexes, foreign_keys, triggers = get_table_definition(cursor, old)
+
+    partition_by = f' PARTITION BY RANGE ({quote(PARTITION_KEY)})' if partitioned else ''
+    cursor.execute(
+        f'CREATE TABLE {quote(TABLE)} (LIKE {quote(old)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS){partition_by}'
+    )
+    if partitioned:
+        cursor.execute(f'CREATE TABLE {quote(DEFAULT_PARTITION)} PARTITION OF {quote(TABLE)} DEFAULT')
+        cursor.execute(
+            f"SELECT DISTINCT date_trunc('month', {quote(PARTITION_KEY)} AT TIME ZONE 'UTC')::date FROM {quote(old)}"
+        )
+        months = {row[0] for row in cursor.fetchall()} | set(upcoming_months())
+        for month in sorted(months):
+            create_partition(cursor, month)
+
+    cursor.execute(f'INSERT INTO {quote(TABLE)} SELECT * FROM {quote(old)}')
+    cursor.execute(f'DROP TABLE {quote(old)} CASCADE')
+
+    # postgres wants the partition key in the primary key
+    primary_key = '"id", ' + quote(PARTITION_KEY) if partitioned else '"id"'
+    cursor.execute(f'ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(f"{TABLE}_pkey")} PRIMARY KEY ({primary_key})')
+    for definition in indexes + foreign_keys + triggers:
+        cursor.execute(definition.replace(' ON ONLY ', ' ON ').replace(quote(old), quote(TABLE)))
+    cursor.execute(f'ANALYZE {quote(TABLE)}')
@@ -0,0 +1,65 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    this renderer produce the same bytes as drf JSONRenderer but encode with
+    orjson when it is installed. anything orjson can not encode the same way
+    (indent, ascii output, odd types) goes through the stdlib renderer.
+    """
+    encoder = JSONRenderer.encoder_class()
+
+    def default(self, obj):
+        return self.encoder.default(obj)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            # datetimes go through the drf encoder so they keep its format
+            ret = orjson.dumps(
+                data, default=self.default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # same strict javascript subset escaping as JSONRenderer
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    this renderer produce MessagePack for internal clients that send
+    `Accept: application/msgpack`, values msgpack has no type for (dates,
+    uuids, decimals) are written as the strings of the json renderer.
+    it is only enabled when the msgpack package is installed
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+    encoder = JSONRenderer.encoder_class()
+
+    def default(self, obj):
+        return self.encoder.default(obj)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=self.default, use_bin_type=True)
@@ -0,0 +1,72 @@
+import contextvars
+import functools
+import random
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+"""
+    primary / replica routing.
+    writes, and every read that is not explicitly marked, go to the primary.
+    the read apis wrap their get in @replica_reads so their queries go to
+    one of the TODO_READ_REPLICAS aliases, unless the request is pinned to
+    the primary because the client wrote something a moment ago (see
+    ReplicaPinningMiddleware), that way a client always reads its own writes
+    even when the replicas lag behind.
+"""
+
+# set by @replica_reads for the duration of a read api
+replica_reads_enabled = contextvars.ContextVar('todo_replica_reads', default=False)
+# set by ReplicaPinningMiddleware when the client wrote recently
+pinned_to_primary = contextvars.ContextVar('todo_pinned_to_primary', default=False)
+
+
+def get_replicas():
+    return getattr(settings, 'TODO_READ_REPLICAS', ())
+
+
+def replica_reads(view_method):
+    """
+    send the reads of the decorated view method to a replica
+    """
+    if iscoroutinefunction(view_method):
+        @functools.wraps(view_method)
+        async def wrapper(*args, **kwargs):
+            token = replica_reads_enabled.set(True)
+            try:
+                return await view_method(*args, **kwargs)
+            finally:
+                replica_reads_enabled.reset(token)
+    else:
+        @functools.wraps(view_method)
+        def wrapper(*args, **kwargs):
+            token = replica_reads_enabled.set(True)
+            try:
+                return view_method(*args, **kwargs)
+            finally:
+                replica_reads_enabled.reset(token)
+    return wrapper
+
+
+class PrimaryReplicaRouter:
+    """
+    route reads marked with @replica_reads to a random replica and
+    everything else to the primary (the default alias)
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        if replicas and replica_reads_enabled.get() and not pinned_to_primary.get():
+            return random.choice(replicas)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in get_replicas()
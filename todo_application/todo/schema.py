@@ -0,0 +1,171 @@
+import datetime
+import functools
+import hashlib
+import os
+import uuid
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.functional import cached_property
+from django.views import View
+from rest_framework import serializers
+
+from .compression import accepted_encodings
+
+"""
+    openapi helpers of the views.
+    the api only profile (todo_application/settings_api.py) does not install
+    drf_spectacular, there extend_schema is a no-op and drf_spectacular is
+    never imported. when it is installed the parameters made from the
+    serializer fields are only built when a schema is generated, not when
+    the views are imported.
+    the schema itself is generated once by `manage.py build_schema` and
+    served from memory by PrecomputedSchemaView.
+"""
+
+if 'drf_spectacular' in settings.INSTALLED_APPS:
+    from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse
+else:
+    def extend_schema(*args, **kwargs):
+        return lambda view_method: view_method
+
+    class OpenApiParameter:
+        """
+        stands in for drf_spectacular's class, the arguments are dropped
+        """
+        QUERY, PATH, HEADER, COOKIE = 'query', 'path', 'header', 'cookie'
+
+        def __init__(self, *args, **kwargs):
+            pass
+
+    OpenApiResponse = OpenApiParameter
+
+
+class LazyParameters:
+    """
+    a list of parameters built on first use, drf_spectacular appends it to
+    its own list while it generates the schema
+    """
+
+    def __init__(self, build):
+        self.build = build
+
+    @cached_property
+    def parameters(self):
+        return list(self.build())
+
+    def __iter__(self):
+        return iter(self.parameters)
+
+    def __len__(self):
+        return len(self.parameters)
+
+    def __bool__(self):
+        # answered without building the list
+        return True
+
+    def __add__(self, other):
+        return LazyParameters(lambda: [*self, *other])
+
+    def __radd__(self, other):
+        return [*other, *self]
+
+
+# serializer field -> python type drf_spectacular documents the param with
+FIELD_TYPES = (
+    (serializers.DateTimeField, datetime.datetime),
+    (serializers.DateField, datetime.date),
+    (serializers.UUIDField, uuid.UUID),
+    (serializers.BooleanField, bool),
+    (serializers.IntegerField, int),
+)
+
+
+def get_field_type(field):
+    for field_class, field_type in FIELD_TYPES:
+        if isinstance(field, field_class):
+            return field_type
+    return str
+
+
+def field_parameters(serializer_class):
+    """
+    one query parameter per field of the serializer
+    """
+    return LazyParameters(lambda: [
+        OpenApiParameter(
+            name=name,
+            location=OpenApiParameter.QUERY,
+            type=get_field_type(field),
+        ) for name, field in serializer_class().fields.items()
+    ])
+
+
+# format: (file name, content type)
+SCHEMA_FORMATS = {
+    'yaml': ('schema.yaml', 'application/vnd.oai.openapi'),
+    'json': ('schema.json', 'application/vnd.oai.openapi+json'),
+}
+
+# content encodings in order of preference: (file suffix, content encoding)
+SCHEMA_ENCODINGS = (('.br', 'br'), ('.gz', 'gzip'), ('', None))
+
+
+@functools.lru_cache
+def load_schema(directory, filename):
+    """
+    read the built schema and its compressed variants once per process,
+    return ({encoding: content}, etag) or None when it was not built
+    """
+    variants = {}
+    for suffix, encoding in SCHEMA_ENCODINGS:
+        try:
+            with open(os.path.join(directory, filename + suffix), 'rb') as file:
+                variants[encoding] = file.read()
+        except FileNotFoundError:
+            continue
+    if None not in variants:
+        return None
+    return variants, hashlib.md5(variants[None]).hexdigest()
+
+
+class PrecomputedSchemaView(View):
+    """
+    this view serve the schema written by `manage.py build_schema` with an
+    ETag and its precompressed variants, or call `fallback` (the
+    drf_spectacular view) when the schema was not built
+    """
+    fallback = None
+
+    def get(self, request, *args, **kwargs):
+        schema_format = self.get_format(request)
+        filename, content_type = SCHEMA_FORMATS[schema_format]
+        loaded = load_schema(str(settings.TODO_SCHEMA_DIR), filename)
+        if loaded is None:
+            if self.fallback is None:
+                return HttpResponse(status=404)
+            return self.fallback(request, *args, **kwargs)
+
+        variants, digest = loaded
+        accepted = accepted_encodings(request)
+        encoding = next(encoding for encoding in variants if encoding is None or encoding in accepted)
+        etag = f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(variants[encoding], content_type=content_type)
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = 'public, max-age=300'
+        patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+        return response
+
+    def get_format(self, request):
+        schema_format = request.GET.get('format')
+        if schema_format in SCHEMA_FORMATS:
+            return schema_format
+        if 'json' in request.headers.get('Accept', ''):
+            return 'json'
+        return 'yaml'
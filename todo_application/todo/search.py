@@ -0,0 +1,26 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, Q
+
+"""
+    full text search over title and description.
+    on postgres the search_vector column is kept up to date by the
+    todo_search_vector_trigger (see migration 0004) and backed by a gin
+    index, so ranked search never scans the table. other databases fall
+    back to icontains on both columns.
+"""
+
+SEARCH_CONFIG = 'english'
+
+
+def search_todos(queryset, term):
+    """
+    filter the queryset by the search term, best matches first
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset.filter(Q(title__icontains=term) | Q(description__icontains=term))
+
+    query = SearchQuery(term, search_type='websearch', config=SEARCH_CONFIG)
+    return queryset.filter(search_vector=query).annotate(
+        rank=SearchRank(F('search_vector'), query),
+    ).order_by('-rank', '-created_at')
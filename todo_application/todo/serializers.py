@@ -1,8 +1,145 @@
-from rest_framework import serializers
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from . import metrics
 from .models import Todo
 
 
+class ToDoListSerializer(serializers.ListSerializer):
+    """
+    this serializer write a whole list of todos with bulk queries,
+    the instance for updates is the dict returned by `Todo.objects.in_bulk`
+    """
+
+    @staticmethod
+    def get_batch_size():
+        return getattr(settings, 'TODO_BULK_BATCH_SIZE', 500)
+
+    @staticmethod
+    def get_max_items():
+        return getattr(settings, 'TODO_BULK_MAX_ITEMS', 10000)
+
+    def run_child_validation(self, data):
+        if isinstance(self.instance, dict):
+            try:
+                pk = uuid.UUID(str(data.get('id')))
+            except (AttributeError, ValueError):
+                raise serializers.ValidationError({'id': ['Must be a valid UUID.']})
+            if pk not in self.instance:
+                raise serializers.ValidationError({'id': ['Todo not found.']})
+            self.child.instance = self.instance[pk]
+            self.child.initial_data = data
+        return super().run_child_validation(data)
+
+    @property
+    def data(self):
+        with metrics.serializer_timer():
+            return super().data
+
+    def create(self, validated_data):
+        todo_s = [Todo(**attrs) for attrs in validated_data]
+        with transaction.atomic():
+            return Todo.objects.bulk_create(todo_s, batch_size=self.get_batch_size())
+
+    def update(self, instance, validated_data):
+        now = timezone.now()
+        todo_s, fields = {}, {'updated_at'}
+        for data, attrs in zip(self.initial_data, validated_data):
+            todo = instance[uuid.UUID(str(data['id']))]
+            for attr, value in attrs.items():
+                setattr(todo, attr, value)
+            # bulk_update does not run auto_now
+            todo.updated_at = now
+            todo_s[todo.pk] = todo
+            fields.update(attrs)
+
+        with transaction.atomic():
+            Todo.objects.bulk_update(todo_s.values(), fields=sorted(fields), batch_size=self.get_batch_size())
+        return [instance[uuid.UUID(str(data['id']))] for data in self.initial_data]
+
+
 class ToDoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Todo
-        fields = '__all__'
\ No newline at end of file
+        # the owner is the authenticated user, never sent or shown
+        exclude = ('search_vector', 'owner')
+        list_serializer_class = ToDoListSerializer
+
+    @property
+    def data(self):
+        with metrics.serializer_timer():
+            return super().data
+
+
+class ToDoReadSerializer:
+    """
+    this is the fast read path of the list api.
+    it reads plain rows with `.values()` and converts them in one pass,
+    without building drf fields for every row, the output is the same as
+    `ToDoSerializer(many=True).data`
+    """
+    fields = ('id', 'title', 'description', 'due_date', 'completed', 'created_at', 'updated_at')
+    datetime_fields = ('due_date', 'created_at', 'updated_at')
+
+    def __init__(self, instance, many=False):
+        self.instance = instance
+        self.many = many
+
+    @classmethod
+    def get_queryset(cls, queryset):
+        return queryset.values(*cls.fields)
+
+    @staticmethod
+    def get_datetime_converter():
+        field = serializers.DateTimeField()
+        field_timezone = field.default_timezone()
+        if field_timezone is None or api_settings.DATETIME_FORMAT.lower() != ISO_8601:
+            return field.to_representation
+
+        def convert(value):
+            if value is None or value.tzinfo is None:
+                return field.to_representation(value)
+            value = value.astimezone(field_timezone).isoformat()
+            if value.endswith('+00:00'):
+                value = value[:-6] + 'Z'
+            return value
+        return convert
+
+    def get_converters(self):
+        converters = dict.fromkeys(self.fields)
+        converters['id'] = str
+        datetime_converter = self.get_datetime_converter()
+        for name in self.datetime_fields:
+            converters[name] = datetime_converter
+        return tuple(converters.items())
+
+    def convert(self, rows):
+        converters = self.get_converters()
+        return [
+            {
+                name: row[name] if convert is None or row[name] is None else convert(row[name])
+                for name, convert in converters
+            }
+            for row in rows
+        ]
+
+    @property
+    def data(self):
+        with metrics.serializer_timer():
+            if self.many:
+                return self.convert(self.instance)
+            return self.convert([self.instance])[0]
+
+
+class BulkDeleteSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.UUIDField(), allow_empty=False)
+
+    def validate_ids(self, value):
+        max_items = ToDoListSerializer.get_max_items()
+        if len(value) > max_items:
+            raise serializers.ValidationError(f'Ensure this field has no more than {max_items} elements.')
+        return value
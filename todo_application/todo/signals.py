@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import authentication, cache, events, tasks
+from .models import Todo, TodoTombstone
+from .serializers import ToDoSerializer
+
+
+@receiver(post_save, sender=Todo)
+@receiver(post_delete, sender=Todo)
+def invalidate_todo_cache(sender, instance, **kwargs):
+    cache.invalidate_todos(instance.owner_id, [instance.pk])
+
+
+@receiver(post_delete, sender=Todo)
+def record_todo_tombstone(sender, instance, using, **kwargs):
+    # the api deletes with delete_returning, which records its own
+    # tombstones, this covers deletes through the orm (admin, shell)
+    TodoTombstone.objects.record([instance], using=using)
+
+
+@receiver(post_save, sender=Todo)
+def publish_todo_saved(sender, instance, created, using, **kwargs):
+    data = ToDoSerializer(instance).data
+    events.publish('created' if created else 'updated', [data], instance.owner_id, using=using)
+    tasks.enqueue_due_checks([data])
+
+
+@receiver(post_delete, sender=Todo)
+def publish_todo_deleted(sender, instance, using, **kwargs):
+    events.publish('deleted', [{'id': instance.pk}], instance.owner_id, using=using)
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    authentication.forget_tokens([instance.key])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def forget_user_tokens(sender, instance, **kwargs):
+    # a deactivated user must not stay authenticated through the token cache
+    authentication.forget_tokens(Token.objects.filter(user=instance).values_list('key', flat=True))
@@ -0,0 +1,207 @@
+import datetime
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+"""
+    dashboard aggregates of the todos of an owner: open, completed and
+    overdue todos, and the open and completed todos due per day (utc days).
+    without the summary they come from one grouped query over the todos of
+    the owner. with TODO_STATS_SUMMARY the ToDO_daily_stats table keeps the
+    open and completed counts per owner and due day, maintained by row
+    triggers on ToDO_list (postgres and sqlite) on every insert, update and
+    delete, whatever path writes: the RETURNING writes of the apis, bulk
+    writes, COPY imports, the admin. a dashboard refresh then reads one row
+    per day instead of every todo, and only the todos due today before now
+    to finish the overdue count.
+    migration 0010 installs the triggers, `manage.py rebuild_stats` installs
+    them later (after turning TODO_STATS_SUMMARY on) and recomputes the
+    table, `--drop` removes them. like todo/partitions.py this works on
+    cursors and table names so the migration keeps working.
+"""
+
+TABLE = 'ToDO_daily_stats'
+TODO_TABLE = 'ToDO_list'
+
+POSTGRES_INSTALL = [
+    f'''
+    CREATE OR REPLACE FUNCTION todo_daily_stats_update() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.owner_id IS NOT NULL THEN
+            UPDATE "{TABLE}" SET
+                open_count = open_count - (NOT OLD.completed)::int,
+                completed_count = completed_count - OLD.completed::int
+            WHERE owner_id = OLD.owner_id AND day = (OLD.due_date AT TIME ZONE 'UTC')::date;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.owner_id IS NOT NULL THEN
+            INSERT INTO "{TABLE}" (owner_id, day, open_count, completed_count)
+            VALUES (NEW.owner_id, (NEW.due_date AT TIME ZONE 'UTC')::date,
+                    (NOT NEW.completed)::int, NEW.completed::int)
+            ON CONFLICT (owner_id, day) DO UPDATE SET
+                open_count = "{TABLE}".open_count + EXCLUDED.open_count,
+                completed_count = "{TABLE}".completed_count + EXCLUDED.completed_count;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    f'CREATE TRIGGER todo_daily_stats_trigger '
+    f'AFTER INSERT OR DELETE OR UPDATE OF owner_id, due_date, completed ON "{TODO_TABLE}" '
+    f'FOR EACH ROW EXECUTE FUNCTION todo_daily_stats_update()',
+]
+
+POSTGRES_DROP = [
+    f'DROP TRIGGER IF EXISTS todo_daily_stats_trigger ON "{TODO_TABLE}"',
+    'DROP FUNCTION IF EXISTS todo_daily_stats_update()',
+]
+
+# sqlite stores datetimes as utc text, date() is their utc day
+SQLITE_ADD = f'''
+    INSERT INTO "{TABLE}" (owner_id, day, open_count, completed_count)
+    SELECT NEW.owner_id, date(NEW.due_date), NOT NEW.completed, NEW.completed WHERE NEW.owner_id IS NOT NULL
+    ON CONFLICT (owner_id, day) DO UPDATE SET
+        open_count = open_count + excluded.open_count,
+        completed_count = completed_count + excluded.completed_count;
+'''
+
+SQLITE_SUBTRACT = f'''
+    UPDATE "{TABLE}" SET
+        open_count = open_count - (NOT OLD.completed),
+        completed_count = completed_count - OLD.completed
+    WHERE owner_id = OLD.owner_id AND day = date(OLD.due_date);
+'''
+
+SQLITE_INSTALL = [
+    f'CREATE TRIGGER todo_daily_stats_insert AFTER INSERT ON "{TODO_TABLE}" BEGIN {SQLITE_ADD} END',
+    f'CREATE TRIGGER todo_daily_stats_delete AFTER DELETE ON "{TODO_TABLE}" BEGIN {SQLITE_SUBTRACT} END',
+    f'CREATE TRIGGER todo_daily_stats_update AFTER UPDATE OF owner_id, due_date, completed ON "{TODO_TABLE}" '
+    f'BEGIN {SQLITE_SUBTRACT} {SQLITE_ADD} END',
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS todo_daily_stats_insert',
+    'DROP TRIGGER IF EXISTS todo_daily_stats_delete',
+    'DROP TRIGGER IF EXISTS todo_daily_stats_update',
+]
+
+
+def summary_enabled():
+    return getattr(settings, 'TODO_STATS_SUMMARY', True)
+
+
+def supports_summary(connection):
+    return connection.vendor in ('postgresql', 'sqlite')
+
+
+def day_sql(connection, column):
+    if connection.vendor == 'postgresql':
+        return f"({column} AT TIME ZONE 'UTC')::date"
+    return f'date({column})'
+
+
+def drop_triggers(cursor):
+    for statement in POSTGRES_DROP if cursor.db.vendor == 'postgresql' else SQLITE_DROP:
+        cursor.execute(statement)
+
+
+def rebuild(connection):
+    """
+    recompute the summary from the todo table and (re)install its triggers,
+    writes to the todo table wait until it is done
+    """
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # no write may slip in between the count and the trigger
+            cursor.execute(f'LOCK TABLE "{TODO_TABLE}" IN SHARE MODE')
+        drop_triggers(cursor)
+        cursor.execute(f'DELETE FROM "{TABLE}"')
+        day = day_sql(connection, 'due_date')
+        cursor.execute(
+            f'INSERT INTO "{TABLE}" (owner_id, day, open_count, completed_count) '
+            f'SELECT owner_id, {day}, SUM(CASE WHEN completed THEN 0 ELSE 1 END), '
+            f'SUM(CASE WHEN completed THEN 1 ELSE 0 END) '
+            f'FROM "{TODO_TABLE}" WHERE owner_id IS NOT NULL GROUP BY owner_id, {day}'
+        )
+        for statement in POSTGRES_INSTALL if connection.vendor == 'postgresql' else SQLITE_INSTALL:
+            cursor.execute(statement)
+
+
+def drop(connection):
+    """
+    remove the triggers and empty the summary, the stats api counts the todos again
+    """
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        drop_triggers(cursor)
+        cursor.execute(f'DELETE FROM "{TABLE}"')
+
+
+def subtract_table(cursor, table):
+    """
+    take the todos of `table` out of the summary, for a partition that is
+    detached or dropped, which fires no delete trigger
+    """
+    day = day_sql(cursor.db, 'due_date')
+    cursor.execute(
+        f'UPDATE "{TABLE}" SET open_count = "{TABLE}".open_count - removed.open_count, '
+        f'completed_count = "{TABLE}".completed_count - removed.completed_count '
+        f'FROM (SELECT owner_id, {day} AS day, '
+        f'SUM(CASE WHEN completed THEN 0 ELSE 1 END) AS open_count, '
+        f'SUM(CASE WHEN completed THEN 1 ELSE 0 END) AS completed_count '
+        f'FROM "{table}" WHERE owner_id IS NOT NULL GROUP BY owner_id, {day}) AS removed '
+        f'WHERE "{TABLE}".owner_id = removed.owner_id AND "{TABLE}".day = removed.day'
+    )
+
+
+def day_start(day):
+    return datetime.datetime.combine(day, datetime.time(), tzinfo=datetime.timezone.utc)
+
+
+def count_by_day(todo_s, now):
+    """
+    (day, open, completed, overdue) of the todos, in one grouped query
+    """
+    return todo_s.annotate(day=TruncDate('due_date', tzinfo=datetime.timezone.utc)).values('day').annotate(
+        open=Count('id', filter=Q(completed=False)),
+        done=Count('id', filter=Q(completed=True)),
+        overdue=Count('id', filter=Q(completed=False, due_date__lt=now)),
+    ).order_by().values_list('day', 'open', 'done', 'overdue')
+
+
+def read_summary(owner_id, todo_s, now):
+    """
+    (day, open, completed, overdue) from the summary: the open todos of the
+    days before today are overdue, today's are counted from the todos
+    """
+    from .models import TodoDailyStats
+
+    today = now.astimezone(datetime.timezone.utc).date()
+    overdue_today = todo_s.filter(completed=False, due_date__gte=day_start(today), due_date__lt=now).count()
+    rows = TodoDailyStats.objects.filter(owner_id=owner_id).exclude(open_count=0, completed_count=0)
+    return [
+        (day, open_, done, open_ if day < today else overdue_today if day == today else 0)
+        for day, open_, done in rows.values_list('day', 'open_count', 'completed_count')
+    ]
+
+
+def get_stats(owner_id, todo_s, start, end, use_summary=None):
+    """
+    the totals of the todos of the owner and their counts per due day
+    from `start` to `end` (dates, included)
+    """
+    now = timezone.now()
+    if use_summary is None:
+        use_summary = summary_enabled() and supports_summary(connections[todo_s.db])
+    rows = read_summary(owner_id, todo_s, now) if use_summary else count_by_day(todo_s, now)
+
+    stats = {'total': 0, 'open': 0, 'completed': 0, 'overdue': 0, 'due_per_day': []}
+    for day, open_, done, overdue in sorted(rows):
+        stats['open'] += open_
+        stats['completed'] += done
+        stats['overdue'] += overdue
+        if start <= day <= end:
+            stats['due_per_day'].append({'day': day, 'open': open_, 'completed': done})
+    stats['total'] = stats['open'] + stats['completed']
+    return stats
@@ -0,0 +1,110 @@
+import base64
+import binascii
+import datetime
+import uuid
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from .models import Todo, TodoTombstone
+from .serializers import ToDoReadSerializer
+
+"""
+    incremental sync of the todo list of an owner.
+    every change is a (changed_at, id) pair: updated_at for todos that were
+    created or written, deleted_at for tombstones. the sync api returns the
+    changes after the client's watermark in that order and a new watermark
+    to send next time, both keysets are backed by an index so a poll costs
+    as much as the rows that changed.
+    tombstones are kept TODO_TOMBSTONE_RETENTION_DAYS, older watermarks get
+    a 410 and the client syncs again from the start.
+    changes younger than TODO_SYNC_LAG_SECONDS are held back: a write that
+    commits late can carry an updated_at older than rows already returned,
+    the lag gives it time to commit before the watermark passes it.
+"""
+
+SEPARATOR = '|'
+
+
+class WatermarkExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = 'The watermark is older than the kept tombstones, sync again without one.'
+    default_code = 'watermark_expired'
+
+
+def get_retention():
+    return datetime.timedelta(days=getattr(settings, 'TODO_TOMBSTONE_RETENTION_DAYS', 30))
+
+
+def encode_watermark(changed_at, pk):
+    position = f'{changed_at.isoformat()}{SEPARATOR}{pk}'
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_watermark(watermark):
+    try:
+        position = base64.urlsafe_b64decode(watermark.encode()).decode()
+        changed_at, _, pk = position.partition(SEPARATOR)
+        changed_at, pk = parse_datetime(changed_at), uuid.UUID(pk)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValidationError({'since': ['Invalid watermark.']})
+    if changed_at is None:
+        raise ValidationError({'since': ['Invalid watermark.']})
+    return changed_at, pk
+
+
+def after(queryset, field, position):
+    if position is None:
+        return queryset
+    changed_at, pk = position
+    # same shape as the cursor pagination, a range scan on (field, id)
+    return queryset.filter(
+        Q(**{f'{field}__gte': changed_at}),
+        Q(**{f'{field}__gt': changed_at}) | Q(id__gt=pk),
+    )
+
+
+def get_changes(since, limit, owner_id):
+    """
+    return (changes, watermark, has_more) for the changes of the todos of
+    `owner_id` after the `since` watermark (None for a first sync)
+    """
+    now = timezone.now()
+    position = decode_watermark(since) if since else None
+    if position is not None and position[0] < now - get_retention():
+        # deletes before the oldest tombstone we keep would be missed
+        raise WatermarkExpired()
+    until = now - datetime.timedelta(seconds=getattr(settings, 'TODO_SYNC_LAG_SECONDS', 2))
+
+    todo_s = after(Todo.objects.filter(owner_id=owner_id, updated_at__lte=until), 'updated_at', position)
+    todo_s = ToDoReadSerializer.get_queryset(todo_s.order_by('updated_at', 'id'))[:limit + 1]
+    tombstones = TodoTombstone.objects.filter(owner_id=owner_id, deleted_at__lte=until)
+    tombstones = after(tombstones, 'deleted_at', position)
+    tombstones = tombstones.order_by('deleted_at', 'id').values('id', 'deleted_at')[:limit + 1]
+
+    merged = sorted(
+        [(row['updated_at'], row['id'], row) for row in todo_s]
+        + [(row['deleted_at'], row['id'], None) for row in tombstones],
+        key=lambda change: change[:2],
+    )
+    has_more = len(merged) > limit
+    merged = merged[:limit]
+
+    converter = ToDoReadSerializer.get_datetime_converter()
+    upserts = iter(ToDoReadSerializer([row for _, _, row in merged if row is not None], many=True).data)
+    changes = []
+    for changed_at, pk, row in merged:
+        if row is None:
+            changes.append({'id': str(pk), 'deleted': True, 'deleted_at': converter(changed_at)})
+        else:
+            changes.append({**next(upserts), 'deleted': False})
+
+    if merged:
+        watermark = encode_watermark(*merged[-1][:2])
+    else:
+        watermark = since or None
+    return changes, watermark, has_more
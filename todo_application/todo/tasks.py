@@ -0,0 +1,134 @@
+import datetime
+import uuid
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import events, jobs, partitions, sync
+from .models import IdempotencyKey, Job, Todo, TodoTombstone
+from .serializers import ToDoSerializer
+
+"""
+    the background jobs of the todo app, run by `manage.py run_workers`.
+    todo.scan_due walks the not completed todos by due date with a keyset
+    over the (completed, due_date) index, a batch at a time, and queues a
+    todo.notify_due job for every todo entering the due soon window
+    (TODO_DUE_SOON_SECONDS) and every todo getting overdue. each run starts
+    where the previous one stopped, so no todo is read twice.
+    the write apis queue todo.notify_due themselves for a todo written into
+    a window the scan already passed. notify_due publishes a `due_soon` or
+    `overdue` event on the change feed, at least once per due date.
+"""
+
+
+# sorts after every id, (t, LAST_ID) is a position past every todo due at t
+LAST_ID = uuid.UUID(int=(1 << 128) - 1)
+
+
+def get_due_soon():
+    return datetime.timedelta(seconds=getattr(settings, 'TODO_DUE_SOON_SECONDS', 3600))
+
+
+def get_scan_interval():
+    return getattr(settings, 'TODO_DUE_SCAN_SECONDS', 60)
+
+
+def encode_position(due_date, pk):
+    return [due_date.isoformat(), str(pk)]
+
+
+def decode_position(position):
+    return parse_datetime(position[0]), uuid.UUID(position[1])
+
+
+def notify_key(pk, due_date):
+    return f'notify_due:{pk}:{due_date.isoformat()}'
+
+
+def scan(position, until, batch_size):
+    """
+    queue notify_due for the todos due after `position` and until `until`,
+    return where the next scan starts
+    """
+    while True:
+        todo_s = Todo.objects.filter(completed=False, due_date__lte=until)
+        todo_s = sync.after(todo_s, 'due_date', decode_position(position))
+        rows = list(todo_s.order_by('due_date', 'id').values_list('id', 'due_date')[:batch_size])
+        if rows:
+            jobs.enqueue_many([
+                ('todo.notify_due', {'id': str(pk)}, notify_key(pk, due_date)) for pk, due_date in rows
+            ])
+        if len(rows) < batch_size:
+            # every todo due until `until` is queued
+            return encode_position(until, LAST_ID)
+        position = encode_position(rows[-1][1], rows[-1][0])
+
+
+@jobs.job('todo.scan_due', every=get_scan_interval)
+def scan_due(payload):
+    now = timezone.now()
+    # a first scan starts now, what was overdue before is not notified
+    start = encode_position(now, LAST_ID)
+    batch_size = getattr(settings, 'TODO_DUE_SCAN_BATCH_SIZE', 1000)
+    return {
+        'due_soon': scan(payload.get('due_soon') or start, now + get_due_soon(), batch_size),
+        'overdue': scan(payload.get('overdue') or start, now, batch_size),
+    }
+
+
+@jobs.job('todo.notify_due')
+def notify_due(payload):
+    todo = Todo.objects.filter(id=payload['id'], completed=False).first()
+    if todo is None:
+        return
+    now = timezone.now()
+    if todo.due_date <= now:
+        events.publish('overdue', [ToDoSerializer(todo).data], todo.owner_id)
+    elif todo.due_date <= now + get_due_soon():
+        events.publish('due_soon', [ToDoSerializer(todo).data], todo.owner_id)
+
+
+def enqueue_due_checks(todo_s):
+    """
+    queue notify_due for the written todos that are already due soon or
+    overdue, the others are left to the scan
+    """
+    until = timezone.now() + get_due_soon()
+    checks = []
+    for todo in todo_s:
+        completed, due_date = todo['completed'], todo['due_date']
+        if isinstance(due_date, str):
+            due_date = parse_datetime(due_date)
+        if due_date is not None and timezone.is_naive(due_date):
+            due_date = timezone.make_aware(due_date)
+        if not completed and due_date is not None and due_date <= until:
+            checks.append(('todo.notify_due', {'id': str(todo['id'])}, notify_key(todo['id'], due_date)))
+    if checks:
+        jobs.enqueue_many(checks)
+
+
+@jobs.job('todo.purge_jobs', every=24 * 60 * 60)
+def purge_jobs(payload):
+    retention = datetime.timedelta(days=getattr(settings, 'TODO_JOB_RETENTION_DAYS', 7))
+    Job.objects.filter(status__in=[Job.DONE, Job.FAILED], finished_at__lt=timezone.now() - retention).delete()
+
+
+@jobs.job('todo.purge_tombstones', every=24 * 60 * 60)
+def purge_tombstones(payload):
+    TodoTombstone.objects.filter(deleted_at__lt=timezone.now() - sync.get_retention()).delete()
+
+
+@jobs.job('todo.purge_idempotency_keys', every=24 * 60 * 60)
+def purge_idempotency_keys(payload):
+    IdempotencyKey.objects.filter(expires_at__lt=timezone.now()).delete()
+
+
+@jobs.job('todo.ensure_partitions', every=24 * 60 * 60)
+def ensure_partitions(payload):
+    if not partitions.supports_partitioning(connection):
+        return
+    with connection.cursor() as cursor:
+        if partitions.is_partitioned(cursor):
+            partitions.ensure_partitions(cursor, partitions.upcoming_months())
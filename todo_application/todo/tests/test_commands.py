@@ -0,0 +1,265 @@
+import datetime
+import io
+import json
+import os
+import tempfile
+import uuid
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import User
+from django.core.management import call_command, CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.utils import timezone
+from todo import imports, partitions
+from todo.benchmarks import compare_reports, seed_todos
+from todo.benchmarks.load import request_params
+from todo.imports import read_json
+from todo.models import Todo, TodoDailyStats, TodoTombstone
+
+
+class ReadJsonTest(TestCase):
+
+    def test_read_json_streams_objects(self):
+        """
+        Test the json reader yields every object even when they span several reads.
+        """
+        records = [{'title': f'Todo {index}', 'description': 'x' * 50} for index in range(20)]
+        file = io.StringIO(json.dumps(records, indent=2))
+
+        self.assertEqual(list(read_json(file, buffer_size=16)), records)
+
+    def test_read_json_rejects_truncated_input(self):
+        """
+        Test a json array without its closing bracket is an error.
+        """
+        with self.assertRaises(ValueError):
+            list(read_json(io.StringIO('[{"title": "a"}')))
+
+
+class ImportTodosCommandTest(TransactionTestCase):
+
+    def write(self, suffix, content):
+        file = tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False)
+        file.write(content)
+        file.close()
+        self.addCleanup(os.unlink, file.name)
+        return file.name
+
+    def test_import_ndjson_in_parallel(self):
+        """
+        Test an ndjson file is loaded in chunks by several workers.
+        """
+        lines = [
+            json.dumps({'title': f'Todo {index}', 'description': 'Imported.', 'due_date': '2025-02-15T00:00:00Z'})
+            for index in range(25)
+        ]
+        path = self.write('.ndjson', '\n'.join(lines))
+
+        call_command('import_todos', path, batch_size=10, workers=2, stdout=io.StringIO())
+
+        self.assertEqual(Todo.objects.count(), 25)
+
+    def test_import_csv_with_offset_and_ids(self):
+        """
+        Test resuming from an offset skips rows and replaying known ids is harmless.
+        """
+        ids = [uuid.uuid4() for _ in range(3)]
+        rows = ['id,title,description,due_date,completed']
+        rows += [f'{pk},Todo {index},Imported.,2025-02-15T00:00:00Z,true' for index, pk in enumerate(ids)]
+        path = self.write('.csv', '\n'.join(rows) + '\n')
+
+        call_command('import_todos', path, offset=1, stdout=io.StringIO())
+        self.assertEqual(set(Todo.objects.values_list('id', flat=True)), set(ids[1:]))
+
+        call_command('import_todos', path, stdout=io.StringIO())
+        self.assertEqual(Todo.objects.filter(completed=True).count(), 3)
+
+    def test_replay_on_the_partitioned_table(self):
+        """
+        Test replaying known ids with another due date adds no row when the database only keeps (id, due_date)
+        unique, as on the partitioned table (emulated on other databases).
+        """
+        ids = [uuid.uuid4() for _ in range(3)]
+        rows = ['id,title,description,due_date']
+        rows += [f'{pk},Todo {index},Imported.,2025-02-15T00:00:00Z' for index, pk in enumerate(ids)]
+        path = self.write('.csv', '\n'.join(rows) + '\n')
+        call_command('import_todos', path, stdout=io.StringIO())
+
+        replayed = [row.replace('2025-02-15', '2025-03-15') for row in rows] + [f'{ids[0]},Again,Twice.,2025-04-15']
+        path = self.write('.csv', '\n'.join(replayed) + '\n')
+        with mock.patch('todo.imports.ids_are_unique', return_value=False):
+            call_command('import_todos', path, stdout=io.StringIO())
+
+        self.assertEqual(Todo.objects.count(), 3)
+        self.assertEqual(Todo.objects.filter(due_date__month=2).count(), 3)
+        # sqlite and plain tables refuse the known ids anyway, check the filter itself
+        fresh = {'id': uuid.uuid4()}
+        self.assertEqual(imports.without_known_ids([{'id': ids[0]}, fresh, fresh, {}], {ids[0]}), [fresh, {}])
+
+    def test_import_stops_on_invalid_row(self):
+        """
+        Test an invalid row stops the import unless --skip-invalid is given.
+        """
+        path = self.write('.json', json.dumps([
+            {'title': 'Valid', 'description': 'Imported.', 'due_date': '2025-02-15T00:00:00Z'},
+            {'description': 'No title.', 'due_date': '2025-02-15T00:00:00Z'},
+        ]))
+
+        with self.assertRaisesMessage(CommandError, 'row 1 is invalid'):
+            call_command('import_todos', path, stdout=io.StringIO())
+        self.assertEqual(Todo.objects.count(), 0)
+
+        call_command('import_todos', path, skip_invalid=True, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(Todo.objects.count(), 1)
+
+    def test_import_for_an_owner(self):
+        """
+        Test --owner gives the imported todos to the user and rejects an unknown one.
+        """
+        user = User.objects.create_user('importer')
+        path = self.write('.ndjson', json.dumps(
+            {'title': 'Owned', 'description': 'Imported.', 'due_date': '2025-02-15T00:00:00Z'}
+        ))
+
+        call_command('import_todos', path, owner='importer', stdout=io.StringIO())
+        self.assertEqual(Todo.objects.get().owner, user)
+
+        with self.assertRaises(CommandError):
+            call_command('import_todos', path, owner='nobody', stdout=io.StringIO())
+
+
+class BenchmarkHelpersTest(TestCase):
+
+    def test_seed_todos_continues_numbering(self):
+        """
+        Test seeding a bigger volume on top of a smaller one keeps the titles unique.
+        """
+        seed_todos(3)
+        seed_todos(2, start=3)
+
+        titles = set(Todo.objects.values_list('title', flat=True))
+        self.assertEqual(titles, {f'Benchmark todo {number}' for number in range(5)})
+
+    def test_seed_todos_spreads_tenants(self):
+        """
+        Test the seeded todos are given round robin to the benchmark users.
+        """
+        seed_todos(5, tenants=2)
+
+        counts = sorted(Todo.objects.values_list('owner__username', flat=True))
+        self.assertEqual(counts, ['benchmark-0'] * 3 + ['benchmark-1'] * 2)
+
+    def test_load_pages_stay_within_the_rows(self):
+        """
+        Test the load suite only asks for the pages the todos of the user fill, at the page size asked for.
+        """
+        self.assertEqual({params['page'] for params in request_params(40, 100, 300)}, {1, 2, 3})
+        self.assertEqual({params['page'] for params in request_params(40, 50, 5000)}, set(range(1, 11)))
+        self.assertEqual(request_params(2, 100, 0), [{'page': 1, 'page_size': 100}] * 2)
+
+    def test_compare_reports_matches_name_and_rows(self):
+        """
+        Test results are compared by name and volume, unmatched results are left out.
+        """
+        old = {'rows': 100, 'results': [
+            {'name': 'detail.get', 'median_ms': 2.0},
+            {'name': 'detail.put', 'median_ms': 4.0, 'rows': 1000},
+        ]}
+        new = {'rows': [100, 1000], 'results': [
+            {'name': 'detail.get', 'median_ms': 3.0, 'rows': 100},
+            {'name': 'detail.put', 'median_ms': 3.0, 'rows': 1000},
+            {'name': 'detail.delete', 'median_ms': 1.0, 'rows': 1000},
+        ]}
+
+        self.assertEqual(compare_reports(old, new), [
+            ('detail.get', 100, 2.0, 3.0, 50.0),
+            ('detail.put', 1000, 4.0, 3.0, -25.0),
+        ])
+
+
+class RebuildStatsCommandTest(TestCase):
+
+    def test_drop_and_rebuild(self):
+        """
+        Test --drop stops the triggers and rebuilding counts the todos written meanwhile.
+        """
+        user = User.objects.create_user('owner')
+        due_date = timezone.now().replace(hour=12)
+        Todo.objects.create(owner=user, title='Counted', description='Counted.', due_date=due_date)
+
+        call_command('rebuild_stats', drop=True, stdout=io.StringIO())
+        Todo.objects.create(owner=user, title='Missed', description='Counted.', due_date=due_date, completed=True)
+        self.assertFalse(TodoDailyStats.objects.exists())
+
+        call_command('rebuild_stats', stdout=io.StringIO())
+        stats = TodoDailyStats.objects.get()
+        self.assertEqual((stats.owner, stats.open_count, stats.completed_count), (user, 1, 1))
+
+        Todo.objects.filter(title='Missed').delete()
+        stats.refresh_from_db()
+        self.assertEqual((stats.open_count, stats.completed_count), (1, 0))
+
+
+class PurgeTombstonesCommandTest(TestCase):
+
+    def test_purge_old_tombstones(self):
+        """
+        Test only tombstones older than the retention are deleted.
+        """
+        old, recent = uuid.uuid4(), uuid.uuid4()
+        TodoTombstone.objects.create(id=old, deleted_at=timezone.now() - datetime.timedelta(days=31))
+        TodoTombstone.objects.create(id=recent)
+
+        call_command('purge_tombstones', stdout=io.StringIO())
+
+        self.assertEqual(list(TodoTombstone.objects.values_list('id', flat=True)), [recent])
+
+
+class PartitionHelpersTest(SimpleTestCase):
+
+    def test_months(self):
+        """
+        Test the month arithmetic and the partition names.
+        """
+        self.assertEqual(partitions.add_months(datetime.date(2025, 11, 1), 3), datetime.date(2026, 2, 1))
+        self.assertEqual(partitions.add_months(datetime.date(2025, 1, 1), -1), datetime.date(2024, 12, 1))
+        self.assertEqual(partitions.upcoming_months(2, today=datetime.date(2025, 12, 31)),
+                         [datetime.date(2025, 12, 1), datetime.date(2026, 1, 1), datetime.date(2026, 2, 1)])
+        self.assertEqual(partitions.partition_name(datetime.date(2025, 3, 1)), 'ToDO_list_p2025_03')
+        self.assertEqual(partitions.partition_month('ToDO_list_p2025_03'), datetime.date(2025, 3, 1))
+        self.assertIsNone(partitions.partition_month('ToDO_list_default'))
+
+
+class TodoPartitionsCommandTest(TestCase):
+
+    @skipUnless(connection.vendor != 'postgresql', 'partitioning is supported on postgres')
+    def test_needs_postgres(self):
+        """
+        Test the command refuses to run on other databases.
+        """
+        with self.assertRaises(CommandError):
+            call_command('todo_partitions', stdout=io.StringIO())
+
+    @skipUnless(partitions.supports_partitioning(connection), 'partitioning needs postgres 13 or later')
+    def test_create_and_drop_partitions(self):
+        """
+        Test a new partition takes the rows of its month from the default partition,
+        and dropping it deletes them with tombstones.
+        """
+        todo = Todo.objects.create(title='Old', description='Partitioned.', due_date='2001-01-15T00:00:00Z')
+        with connection.cursor() as cursor:
+            self.assertTrue(partitions.is_partitioned(cursor))
+            self.assertTrue(partitions.create_partition(cursor, datetime.date(2001, 1, 1)))
+            self.assertFalse(partitions.create_partition(cursor, datetime.date(2001, 1, 1)))
+            cursor.execute('SELECT count(*) FROM "ToDO_list_p2001_01"')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+        call_command('todo_partitions', drop_before=datetime.date(2001, 2, 1), stdout=io.StringIO())
+
+        self.assertFalse(Todo.objects.filter(id=todo.pk).exists())
+        self.assertTrue(TodoTombstone.objects.filter(id=todo.pk).exists())
+        with connection.cursor() as cursor:
+            names = [name for name, _, _ in partitions.list_partitions(cursor)]
+        self.assertNotIn('ToDO_list_p2001_01', names)
+        self.assertIn(partitions.partition_name(partitions.upcoming_months(0)[0]), names)
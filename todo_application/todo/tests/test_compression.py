@@ -0,0 +1,114 @@
+import gzip
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from todo import compression, renderers
+from todo.models import Todo
+
+
+class CompressionMiddlewareTest(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+        for index in range(20):
+            Todo.objects.create(owner=self.user, title=f'Todo {index}', description='Compressed ' * 10,
+                                due_date='2025-01-30')
+        self.url = reverse('create_list')
+
+    def test_gzip(self):
+        """
+        Test a large page is gzipped for a client that accepts only gzip.
+        """
+        plain = self.client.get(self.url, {'page_size': 20})
+        response = self.client.get(self.url, {'page_size': 20}, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertLess(len(response.content), len(plain.content))
+
+    def test_preferred_encoding(self):
+        """
+        Test the first available encoding of the preference order wins.
+        """
+        response = self.client.get(self.url, {'page_size': 20}, HTTP_ACCEPT_ENCODING='gzip, br, zstd')
+
+        self.assertEqual(response['Content-Encoding'], next(iter(compression.CODECS)))
+
+    def test_refused_encoding(self):
+        """
+        Test an encoding with q=0 is not used.
+        """
+        response = self.client.get(self.url, {'page_size': 20}, HTTP_ACCEPT_ENCODING='gzip;q=0')
+
+        self.assertNotIn('Content-Encoding', response)
+
+    @override_settings(TODO_COMPRESS_MIN_SIZE=1 << 20)
+    def test_small_responses_are_not_compressed(self):
+        """
+        Test responses under the size threshold are sent as they are.
+        """
+        response = self.client.get(self.url, {'page_size': 20}, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_html_pages_are_not_compressed(self):
+        """
+        Test the admin and the browsable api, html with a csrf token, are never compressed.
+        """
+        response = self.client.get(reverse('admin:login'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertIn(b'csrfmiddlewaretoken', response.content)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+        response = self.client.get(self.url, {'page_size': 20}, HTTP_ACCEPT='text/html', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_compressed_etag_still_matches(self):
+        """
+        Test the weakened etag of a compressed page still answers 304.
+        """
+        response = self.client.get(self.url, {'page_size': 20}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertTrue(response['ETag'].startswith('W/"'))
+
+        response = self.client.get(self.url, {'page_size': 20}, HTTP_ACCEPT_ENCODING='gzip',
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+
+@skipUnless(renderers.msgpack, 'msgpack is not installed')
+class MessagePackRendererTest(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+        self.todo = Todo.objects.create(owner=self.user, title='Packed', description='Binary.',
+                                        due_date='2025-01-30T10:20:30Z')
+
+    def test_detail_as_msgpack(self):
+        """
+        Test a client asking for msgpack gets the same data as the json api.
+        """
+        url = reverse('update_delete_retrieve', args=[self.todo.pk])
+        expected = self.client.get(url).json()
+
+        response = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(renderers.msgpack.unpackb(response.content), expected)
+
+    def test_async_list_as_msgpack(self):
+        """
+        Test the async views negotiate msgpack too.
+        """
+        url = reverse('async_create_list')
+        expected = self.client.get(url).json()
+
+        response = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+
+        self.assertEqual(renderers.msgpack.unpackb(response.content), expected)
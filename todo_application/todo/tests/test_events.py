@@ -0,0 +1,252 @@
+import asyncio
+import json
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from todo import events
+from todo.models import Todo
+
+
+class InMemoryBrokerTest(SimpleTestCase):
+
+    def setUp(self):
+        self.broker = events.InMemoryBroker(buffer_size=3, queue_size=2)
+
+    async def test_live_events(self):
+        """
+        Test a subscriber gets the events published after it subscribed.
+        """
+        self.broker.publish('created', [{'id': 'a'}], 1)
+        subscription = self.broker.subscribe()
+        self.broker.publish('updated', [{'id': 'b'}], 1)
+
+        event = await subscription.next(1)
+        subscription.close()
+
+        self.assertEqual(event, {'id': 2, 'type': 'updated', 'owner': 1, 'todo': {'id': 'b'}})
+        self.assertEqual(self.broker.subscribers, {})
+
+    async def test_idle_subscriber_times_out(self):
+        """
+        Test next returns None when nothing happens, so the stream can send a heartbeat.
+        """
+        subscription = self.broker.subscribe()
+
+        self.assertIsNone(await subscription.next(0.01))
+        subscription.close()
+
+    async def test_resume_from_last_event_id(self):
+        """
+        Test a subscriber resuming from an event id gets the events after it first.
+        """
+        self.broker.publish('created', [{'id': 'a'}, {'id': 'b'}, {'id': 'c'}], 1)
+        subscription = self.broker.subscribe(last_event_id=1)
+        self.broker.publish('deleted', [{'id': 'a'}], 1)
+
+        received = [(await subscription.next(1))['id'] for _ in range(3)]
+        subscription.close()
+
+        self.assertEqual(received, [2, 3, 4])
+
+    async def test_resume_from_a_dropped_event_id(self):
+        """
+        Test resuming from an event that left the buffer sends a reset.
+        """
+        self.broker.publish('created', [{'id': 'a'}, {'id': 'b'}, {'id': 'c'}, {'id': 'd'}], 1)
+        subscription = self.broker.subscribe(last_event_id=1)
+
+        event = await subscription.next(1)
+        subscription.close()
+
+        self.assertEqual(event['type'], 'reset')
+
+    async def test_slow_subscriber_is_reset(self):
+        """
+        Test a subscriber whose queue overflows gets a reset instead of the events.
+        """
+        subscription = self.broker.subscribe()
+        self.broker.publish('created', [{'id': 'a'}, {'id': 'b'}, {'id': 'c'}], 1)
+        await asyncio.sleep(0)
+
+        event = await subscription.next(1)
+        subscription.close()
+
+        self.assertEqual(event['type'], 'reset')
+
+
+class EventFilterTest(SimpleTestCase):
+
+    def test_filters(self):
+        """
+        Test the owner, type, id and completed filters of a subscriber.
+        """
+        event = {'id': 1, 'type': 'updated', 'owner': 1, 'todo': {'id': 'a', 'completed': True}}
+        deleted = {'id': 2, 'type': 'deleted', 'owner': 1, 'todo': {'id': 'a'}}
+
+        self.assertTrue(events.matches(event, events.parse_filters({}, 1)))
+        self.assertFalse(events.matches(event, events.parse_filters({}, 2)))
+        self.assertTrue(events.matches(event, events.parse_filters({'types': 'created,updated'}, 1)))
+        self.assertFalse(events.matches(event, events.parse_filters({'types': 'created'}, 1)))
+        self.assertTrue(events.matches(event, events.parse_filters({'ids': 'b,a'}, 1)))
+        self.assertFalse(events.matches(event, events.parse_filters({'ids': 'b'}, 1)))
+        self.assertFalse(events.matches(event, events.parse_filters({'completed': 'false'}, 1)))
+        self.assertTrue(events.matches(deleted, events.parse_filters({'completed': 'false'}, 1)))
+        self.assertTrue(events.matches(events.RESET_EVENT, events.parse_filters({'types': 'created'}, 2)))
+
+
+class TodoEventsPublishTest(APITestCase):
+
+    def setUp(self):
+        events.get_broker.cache_clear()
+        self.broker = events.get_broker()
+        self.user = User.objects.create_user('owner')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+        self.todo = Todo.objects.create(owner=self.user, title='title', description='description',
+                                        due_date='2030-01-01')
+        self.broker.buffer.clear()
+
+    def tearDown(self):
+        events.get_broker.cache_clear()
+
+    def published(self):
+        return [(event['type'], str(event['todo']['id'])) for event in self.broker.buffer]
+
+    def test_create_update_delete(self):
+        """
+        Test the list post, detail put and detail delete publish their events once committed.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('create_list'), {
+                'title': 'new', 'description': 'description', 'due_date': '2030-01-01',
+            }, format='json')
+        created = response.data['id']
+        detail = reverse('update_delete_retrieve', args=[self.todo.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(detail, {
+                'title': 'changed', 'description': 'description', 'due_date': '2030-01-01',
+            }, format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(detail)
+
+        self.assertEqual(self.published(), [
+            ('created', str(created)),
+            ('updated', str(self.todo.pk)),
+            ('deleted', str(self.todo.pk)),
+        ])
+        self.assertEqual(self.broker.buffer[1]['todo']['title'], 'changed')
+        self.assertEqual({event['owner'] for event in self.broker.buffer}, {self.user.pk})
+
+    def test_rolled_back_write_publishes_nothing(self):
+        """
+        Test nothing is published before the transaction commits.
+        """
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.client.delete(reverse('update_delete_retrieve', args=[self.todo.pk]))
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(self.published(), [])
+
+    def test_bulk_delete(self):
+        """
+        Test the bulk delete publishes an event per deleted todo.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('bulk'), {'ids': [str(self.todo.pk)]}, format='json')
+
+        self.assertEqual(self.published(), [('deleted', str(self.todo.pk))])
+
+
+class TodoEventsStreamTest(TestCase):
+
+    def setUp(self):
+        events.get_broker.cache_clear()
+        self.broker = events.get_broker()
+        self.user = User.objects.create_user('owner')
+        self.token = Token.objects.create(user=self.user).key
+        self.headers = {'Authorization': f'Token {self.token}'}
+
+    def tearDown(self):
+        events.get_broker.cache_clear()
+
+    async def test_server_sent_events(self):
+        """
+        Test the events view streams the matching events as server sent events.
+        """
+        response = await self.async_client.get(reverse('events'), {'types': 'updated'}, headers=self.headers)
+        stream = aiter(response.streaming_content)
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+
+        self.broker.publish('created', [{'id': 'a'}], self.user.pk)
+        self.broker.publish('updated', [{'id': 'c', 'completed': False}], self.user.pk + 1)
+        self.broker.publish('updated', [{'id': 'b', 'completed': False}], self.user.pk)
+        chunk = await asyncio.wait_for(anext(stream), 1)
+        await stream.aclose()
+
+        self.assertEqual(chunk, b'id: 3\nevent: updated\ndata: {"id": "b", "completed": false}\n\n')
+
+    async def test_server_sent_events_need_a_token(self):
+        """
+        Test the events view answers 401 without a valid token and takes it as ?token=.
+        """
+        response = await self.async_client.get(reverse('events'))
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+
+        response = await self.async_client.get(reverse('events'), {'token': 'unknown'})
+        self.assertEqual(response.status_code, 401)
+
+        response = await self.async_client.get(reverse('events'), {'token': self.token})
+        self.assertEqual(response.status_code, 200)
+        await aiter(response.streaming_content).aclose()
+
+    async def test_resume_with_last_event_id(self):
+        """
+        Test the events view replays the events after the Last-Event-ID header.
+        """
+        self.broker.publish('created', [{'id': 'a'}, {'id': 'b'}], self.user.pk)
+
+        response = await self.async_client.get(reverse('events'), headers={**self.headers, 'Last-Event-ID': '1'})
+        stream = aiter(response.streaming_content)
+        await anext(stream)
+        chunk = await asyncio.wait_for(anext(stream), 1)
+        await stream.aclose()
+
+        self.assertTrue(chunk.startswith(b'id: 2\nevent: created\n'))
+
+    async def test_websocket(self):
+        """
+        Test the websocket endpoint sends the matching events as json text frames.
+        """
+        incoming, outgoing = asyncio.Queue(), asyncio.Queue()
+        await incoming.put({'type': 'websocket.connect'})
+        scope = {'type': 'websocket', 'path': '/ws/todo/events/', 'query_string': f'ids=b&token={self.token}'.encode()}
+        task = asyncio.ensure_future(events.websocket_application(scope, incoming.get, outgoing.put))
+
+        self.assertEqual(await asyncio.wait_for(outgoing.get(), 1), {'type': 'websocket.accept'})
+        await asyncio.sleep(0)
+        self.broker.publish('created', [{'id': 'b'}], self.user.pk + 1)
+        self.broker.publish('created', [{'id': 'a'}, {'id': 'b'}], self.user.pk)
+        message = await asyncio.wait_for(outgoing.get(), 1)
+        await incoming.put({'type': 'websocket.disconnect', 'code': 1000})
+        await asyncio.wait_for(task, 1)
+
+        self.assertEqual(json.loads(message['text']), {'id': 3, 'type': 'created', 'todo': {'id': 'b'}})
+        self.assertEqual(self.broker.subscribers, {})
+
+    async def test_websocket_needs_a_token(self):
+        """
+        Test the websocket handshake is refused without a valid token.
+        """
+        incoming, outgoing = asyncio.Queue(), asyncio.Queue()
+        await incoming.put({'type': 'websocket.connect'})
+        scope = {'type': 'websocket', 'path': '/ws/todo/events/', 'query_string': b'token=unknown'}
+
+        await asyncio.wait_for(events.websocket_application(scope, incoming.get, outgoing.put), 1)
+
+        self.assertEqual((await outgoing.get())['type'], 'websocket.close')
+        self.assertEqual(self.broker.subscribers, {})
@@ -0,0 +1,182 @@
+import datetime
+import io
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from todo import events, jobs, tasks
+from todo.models import Job, Todo
+
+
+class JobQueueTest(TestCase):
+
+    def setUp(self):
+        self.calls = []
+        patcher = mock.patch.dict(jobs.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        jobs.job('test.record')(self.calls.append)
+        jobs.job('test.fail', max_attempts=2)(lambda payload: 1 / 0)
+        jobs.job('test.periodic', every=60)(lambda payload: {'runs': payload.get('runs', 0) + 1})
+        self.worker = jobs.Worker(name='test')
+
+    def test_run_job(self):
+        """
+        Test a worker claims a due job, runs it with its payload and marks it done.
+        """
+        jobs.enqueue('test.record', {'value': 1})
+        jobs.enqueue('test.record', {'value': 2}, run_at=timezone.now() + datetime.timedelta(hours=1))
+
+        self.assertEqual(self.worker.run_once(), 1)
+
+        self.assertEqual(self.calls, [{'value': 1}])
+        done = Job.objects.get(status=Job.DONE)
+        self.assertEqual((done.attempts, done.locked_by), (1, 'test'))
+        self.assertEqual(Job.objects.filter(status=Job.QUEUED).count(), 1)
+
+    def test_dedup_key(self):
+        """
+        Test a job is not queued twice while one with the same dedup key is pending.
+        """
+        jobs.enqueue('test.record', dedup_key='once')
+        jobs.enqueue('test.record', dedup_key='once')
+        self.assertEqual(Job.objects.count(), 1)
+
+        self.worker.run_once()
+        jobs.enqueue('test.record', dedup_key='once')
+        self.assertEqual(Job.objects.filter(status=Job.QUEUED).count(), 1)
+
+    def test_unknown_job(self):
+        """
+        Test enqueuing a job that is not registered fails right away.
+        """
+        with self.assertRaises(ValueError):
+            jobs.enqueue('test.missing')
+
+    def test_retry_then_fail(self):
+        """
+        Test a failing job is retried with a backoff, then marked failed after max_attempts.
+        """
+        jobs.enqueue('test.fail')
+
+        self.worker.run_once()
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('ZeroDivisionError', job.last_error)
+
+        Job.objects.update(run_at=timezone.now())
+        self.worker.run_once()
+        self.assertEqual(Job.objects.get().status, Job.FAILED)
+
+    def test_periodic_job(self):
+        """
+        Test a periodic job is queued again with the payload its run returned.
+        """
+        jobs.schedule_periodic()
+        jobs.schedule_periodic()
+        self.assertEqual(Job.objects.filter(name='test.periodic').count(), 1)
+        self.worker.run_once()
+
+        queued = Job.objects.get(name='test.periodic', status=Job.QUEUED)
+        self.assertEqual(queued.payload, {'runs': 1})
+        self.assertGreater(queued.run_at, timezone.now() + datetime.timedelta(seconds=50))
+
+    @override_settings(TODO_JOB_TIMEOUT_SECONDS=60)
+    def test_requeue_stale(self):
+        """
+        Test a job whose worker died is queued again after the timeout.
+        """
+        Job.objects.create(name='test.record', status=Job.RUNNING,
+                           locked_at=timezone.now() - datetime.timedelta(minutes=5))
+
+        self.assertEqual(self.worker.requeue_stale(), 1)
+        self.assertEqual(self.worker.run_once(), 1)
+
+    def test_run_workers_once(self):
+        """
+        Test run_workers --once drains the due jobs.
+        """
+        for value in range(3):
+            jobs.enqueue('test.record', {'value': value})
+
+        call_command('run_workers', once=True, batch_size=2, stdout=io.StringIO())
+
+        self.assertEqual(len(self.calls), 3)
+        self.assertFalse(Job.objects.filter(name='test.record', status=Job.QUEUED).exists())
+
+
+@override_settings(TODO_DUE_SOON_SECONDS=3600, TODO_DUE_SCAN_BATCH_SIZE=2)
+class DueDateTasksTest(APITestCase):
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.user = User.objects.create_user('owner')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+        events.get_broker.cache_clear()
+
+    def tearDown(self):
+        events.get_broker.cache_clear()
+
+    def create(self, title, due_in, completed=False):
+        todo = Todo.objects.create(title=title, description='Due.', due_date=self.now + due_in,
+                                   completed=completed, owner=self.user)
+        Job.objects.all().delete()
+        return todo
+
+    def queued(self):
+        return sorted(job.payload['id'] for job in Job.objects.filter(name='todo.notify_due', status=Job.QUEUED))
+
+    def test_scan_due(self):
+        """
+        Test the scan queues the todos entering the due soon window or getting overdue, once.
+        """
+        soon = [self.create(f'Soon {index}', datetime.timedelta(minutes=10 + index)) for index in range(3)]
+        self.create('Later', datetime.timedelta(days=2))
+        self.create('Done', datetime.timedelta(minutes=5), completed=True)
+
+        position = tasks.scan_due({})
+        self.assertEqual(self.queued(), sorted(str(todo.pk) for todo in soon))
+
+        Job.objects.all().delete()
+        # overdue before the first scan, never notified
+        self.create('Forgotten', datetime.timedelta(minutes=-1))
+        with mock.patch('django.utils.timezone.now', return_value=self.now + datetime.timedelta(minutes=11)):
+            position = tasks.scan_due(position)
+        self.assertEqual(self.queued(), sorted([str(soon[0].pk), str(soon[1].pk)]))
+
+        Job.objects.all().delete()
+        moved = self.create('Moved', datetime.timedelta(minutes=30))
+        with mock.patch('django.utils.timezone.now', return_value=self.now + datetime.timedelta(minutes=35)):
+            tasks.scan_due(position)
+        self.assertEqual(self.queued(), sorted([str(soon[2].pk), str(moved.pk)]))
+
+    def test_notify_due_publishes_event(self):
+        """
+        Test notify_due publishes a due_soon or overdue event of the todo.
+        """
+        todo = self.create('Soon', datetime.timedelta(minutes=10))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tasks.notify_due({'id': str(todo.pk)})
+
+        event = events.get_broker().buffer[-1]
+        self.assertEqual((event['type'], event['todo']['title']), ('due_soon', 'Soon'))
+
+    def test_write_queues_due_check(self):
+        """
+        Test a put moving a todo into the due soon window queues its notification.
+        """
+        todo = self.create('Later', datetime.timedelta(days=2))
+
+        due_date = self.now + datetime.timedelta(minutes=5)
+        self.client.put(reverse('update_delete_retrieve', args=[todo.pk]), {
+            'title': 'Sooner', 'description': 'Due.', 'due_date': due_date.isoformat(),
+        }, format='json')
+
+        self.assertEqual(self.queued(), [str(todo.pk)])
@@ -0,0 +1,56 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from todo.models import Todo
+
+
+class MetricsMiddlewareTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+        cache.clear()
+        Todo.objects.create(
+            owner=self.user,
+            title='Sample Todo',
+            description='This is a sample todo item.',
+            due_date='2025-01-30',
+        )
+        self.url = reverse('create_list')
+
+    def test_server_timing_header(self):
+        """
+        Test every response reports its database and serializer time.
+        """
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('queries"', response['Server-Timing'])
+        self.assertIn('serialize;dur=', response['Server-Timing'])
+
+    def test_metrics_endpoint(self):
+        """
+        Test the prometheus endpoint exposes the latency and query histograms per view.
+        """
+        self.client.get(self.url)
+        response = self.client.get(reverse('metrics'))
+        content = response.content.decode()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('todo_requests_total{view="create_list",method="GET",status="200"}', content)
+        self.assertIn('todo_request_duration_seconds_bucket{view="create_list",method="GET",le="+Inf"}', content)
+        self.assertIn('todo_request_queries_count{view="create_list",method="GET"}', content)
+
+    @override_settings(TODO_SLOW_QUERY_MS=0)
+    def test_slow_query_log(self):
+        """
+        Test queries above the threshold are logged.
+        """
+        with self.assertLogs('todo.slow_queries', level='WARNING') as logs:
+            self.client.get(self.url)
+        self.assertTrue(any('ToDO_list' in line for line in logs.output))
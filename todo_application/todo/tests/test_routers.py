@@ -0,0 +1,126 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from todo import routers
+from todo.middleware import ReplicaPinningMiddleware
+from todo.models import Todo
+
+
+@override_settings(TODO_READ_REPLICAS=['replica_0'])
+class PrimaryReplicaRouterTest(SimpleTestCase):
+
+    def setUp(self):
+        self.router = routers.PrimaryReplicaRouter()
+
+    def test_reads_go_to_the_primary_by_default(self):
+        """
+        Test reads outside a read api are sent to the primary.
+        """
+        self.assertEqual(self.router.db_for_read(Todo), 'default')
+
+    def test_replica_reads(self):
+        """
+        Test reads of a view method marked with replica_reads are sent to a replica.
+        """
+        read = routers.replica_reads(lambda: self.router.db_for_read(Todo))
+
+        self.assertEqual(read(), 'replica_0')
+
+    def test_pinned_reads_go_to_the_primary(self):
+        """
+        Test a client pinned after a write reads from the primary.
+        """
+        read = routers.replica_reads(lambda: self.router.db_for_read(Todo))
+        token = routers.pinned_to_primary.set(True)
+        try:
+            self.assertEqual(read(), 'default')
+        finally:
+            routers.pinned_to_primary.reset(token)
+
+    def test_writes_and_migrations_go_to_the_primary(self):
+        """
+        Test writes are sent to the primary and replicas are never migrated.
+        """
+        write = routers.replica_reads(lambda: self.router.db_for_write(Todo))
+
+        self.assertEqual(write(), 'default')
+        self.assertTrue(self.router.allow_migrate('default', 'todo'))
+        self.assertFalse(self.router.allow_migrate('replica_0', 'todo'))
+
+
+class ReplicaPinningMiddlewareTest(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+
+    @override_settings(TODO_READ_REPLICAS=['replica_0'])
+    def test_write_pins_the_client(self):
+        """
+        Test a successful write sets the pin cookie.
+        """
+        response = self.client.post(reverse('create_list'), {
+            'title': 'Pinned', 'description': 'Written to the primary.', 'due_date': '2025-01-30T00:00:00Z',
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn(ReplicaPinningMiddleware.cookie_name, response.cookies)
+
+    @override_settings(TODO_READ_REPLICAS=['replica_0'])
+    def test_failed_write_does_not_pin(self):
+        """
+        Test a rejected write leaves the client unpinned.
+        """
+        response = self.client.post(reverse('create_list'), {'title': ''}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn(ReplicaPinningMiddleware.cookie_name, response.cookies)
+
+    @override_settings(TODO_READ_REPLICAS=[])
+    def test_no_pin_without_replicas(self):
+        """
+        Test nothing is pinned when no replica is configured.
+        """
+        response = self.client.post(reverse('create_list'), {
+            'title': 'Unpinned', 'description': 'No replicas.', 'due_date': '2025-01-30T00:00:00Z',
+        }, format='json')
+
+        self.assertNotIn(ReplicaPinningMiddleware.cookie_name, response.cookies)
+
+
+@skipUnless(getattr(settings, 'TODO_READ_REPLICAS', None), 'no read replica configured')
+class ReplicaRoutingTest(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Token {Token.objects.create(user=self.user).key}'
+        self.todo = Todo.objects.create(owner=self.user, title='Routed', description='Read me.',
+                                        due_date='2025-01-30T00:00:00Z')
+        self.replica = connections[settings.TODO_READ_REPLICAS[0]]
+
+    @override_settings(TODO_CACHE_TTL=0, TODO_READ_REPLICAS=None)
+    def test_reads_hit_the_replica_until_a_write(self):
+        """
+        Test the list and detail reads query the replica and pinned clients read the primary.
+        """
+        with self.settings(TODO_READ_REPLICAS=[self.replica.alias]):
+            with CaptureQueriesContext(self.replica) as queries:
+                self.client.get(reverse('create_list'))
+                self.client.get(reverse('update_delete_retrieve', args=[self.todo.pk]))
+            self.assertTrue(queries.captured_queries)
+
+            self.client.patch(reverse('update_delete_retrieve', args=[self.todo.pk]),
+                              {'completed': True}, content_type='application/json')
+            with CaptureQueriesContext(self.replica) as queries:
+                response = self.client.get(reverse('update_delete_retrieve', args=[self.todo.pk]))
+            self.assertFalse(queries.captured_queries)
+            self.assertTrue(response.json()['completed'])
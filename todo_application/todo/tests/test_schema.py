@@ -0,0 +1,106 @@
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import skipUnless
+
+from django.apps import apps
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from todo import schema
+from todo.serializers import ToDoSerializer
+
+
+class LazyParametersTest(SimpleTestCase):
+
+    def test_parameters_are_built_on_first_use(self):
+        """
+        Test the field parameters are not built when the views are decorated.
+        """
+        calls = []
+        parameters = schema.LazyParameters(lambda: calls.append(1) or ['title']) + ['search']
+
+        self.assertTrue(parameters)
+        self.assertEqual(calls, [])
+        self.assertEqual(['page'] + parameters, ['page', 'title', 'search'])
+        self.assertEqual(calls, [1])
+
+    @skipUnless(apps.is_installed('drf_spectacular'), 'drf_spectacular is not installed')
+    def test_schema_documents_parameter_types(self):
+        """
+        Test the list filters and the serializer field parameters are documented with their types.
+        """
+        from drf_spectacular.generators import SchemaGenerator
+
+        document = SchemaGenerator().get_schema(request=None, public=True)
+        list_parameters = {
+            parameter['name']: parameter['schema']
+            for parameter in document['paths']['/api/todo/create_list/']['get']['parameters']
+        }
+        detail_parameters = {
+            parameter['name']: parameter['schema']
+            for parameter in document['paths']['/api/todo/update_delete_retrieve/{id}']['get']['parameters']
+        }
+
+        self.assertEqual(list_parameters['due_date__gte'], {'type': 'string', 'format': 'date-time'})
+        self.assertEqual(list_parameters['completed'], {'type': 'boolean'})
+        self.assertEqual(list_parameters['id__in'], {'type': 'array', 'items': {'type': 'string', 'format': 'uuid'}})
+        self.assertEqual(list_parameters['ordering'], {'type': 'string'})
+        self.assertEqual(detail_parameters['due_date'], {'type': 'string', 'format': 'date-time'})
+        self.assertTrue(set(ToDoSerializer().fields) <= set(detail_parameters))
+
+
+@skipUnless(apps.is_installed('drf_spectacular'), 'drf_spectacular is not installed')
+class PrecomputedSchemaViewTest(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings_override = override_settings(TODO_SCHEMA_DIR=self.directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.url = reverse('schema')
+
+    def test_build_schema_writes_compressed_variants(self):
+        """
+        Test the command writes the yaml and json schema with their gzip variants.
+        """
+        call_command('build_schema', stdout=io.StringIO())
+
+        with open(os.path.join(self.directory, 'schema.json'), 'rb') as file:
+            content = file.read()
+        with open(os.path.join(self.directory, 'schema.json.gz'), 'rb') as file:
+            self.assertEqual(gzip.decompress(file.read()), content)
+        self.assertIn('/api/todo/create_list/', json.loads(content)['paths'])
+        self.assertTrue(os.path.exists(os.path.join(self.directory, 'schema.yaml')))
+
+    def test_serves_built_schema_with_etag(self):
+        """
+        Test the schema is served from the build with an ETag and a gzip variant.
+        """
+        call_command('build_schema', stdout=io.StringIO())
+
+        response = self.client.get(self.url, {'format': 'json'}, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('/api/todo/create_list/', json.loads(gzip.decompress(response.content))['paths'])
+
+        response = self.client.get(self.url, {'format': 'json'}, HTTP_ACCEPT_ENCODING='gzip',
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(self.url, {'format': 'json'}, HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertIn('/api/todo/create_list/', json.loads(response.content)['paths'])
+
+    def test_generates_schema_until_built(self):
+        """
+        Test the schema is still served by drf_spectacular when it was not built.
+        """
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'/api/todo/create_list/', response.content)
@@ -0,0 +1,41 @@
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+from todo.models import Todo
+from todo.renderers import FastJSONRenderer
+from todo.serializers import ToDoSerializer, ToDoReadSerializer
+
+
+class ToDoReadSerializerTest(TestCase):
+
+    def setUp(self):
+        """
+        Create a few Todo instances, one with characters json has to escape.
+        """
+        Todo.objects.create(title='First', description='plain text', due_date='2025-01-30T10:20:30.123456Z')
+        Todo.objects.create(title='Sécond "quoted"', description='line\u2028separator', due_date='2025-02-15')
+        self.queryset = Todo.objects.order_by('created_at')
+
+    def test_fields_match_model_serializer(self):
+        """
+        Test the read serializer emits the fields of the model serializer in the same order.
+        """
+        self.assertEqual(ToDoReadSerializer.fields, tuple(ToDoSerializer().fields))
+
+    def test_output_is_identical(self):
+        """
+        Test the read path renders the same bytes as the model serializer and JSONRenderer.
+        """
+        expected = JSONRenderer().render(ToDoSerializer(self.queryset, many=True).data)
+        rows = ToDoReadSerializer.get_queryset(self.queryset)
+        actual = FastJSONRenderer().render(ToDoReadSerializer(rows, many=True).data)
+
+        self.assertEqual(actual, expected)
+
+    def test_single_row(self):
+        """
+        Test the read serializer also converts a single row.
+        """
+        todo = self.queryset.first()
+        row = ToDoReadSerializer.get_queryset(self.queryset).first()
+
+        self.assertEqual(ToDoReadSerializer(row).data, dict(ToDoSerializer(todo).data))
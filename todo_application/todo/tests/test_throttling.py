@@ -0,0 +1,150 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+from todo import paginations, throttling
+from todo.models import Todo
+
+
+def rates(**scopes):
+    return override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': scopes})
+
+
+class TokenBucketTest(SimpleTestCase):
+
+    def test_spend(self):
+        """
+        Test a bucket lets its size through at once, then one request per refill interval.
+        """
+        tat = None
+        for _ in range(3):
+            tat, wait = throttling.spend(tat, 100.0, 1, 3, 60)
+            self.assertEqual(wait, 0)
+
+        self.assertEqual(throttling.spend(tat, 100.0, 1, 3, 60), (tat, 20.0))
+        self.assertEqual(throttling.spend(tat, 120.0, 1, 3, 60)[1], 0)
+
+    def test_read_cost(self):
+        """
+        Test text filters and deep page numbers cost more tokens, cursor pages do not.
+        """
+        def cost(params):
+            return throttling.read_cost(Request(APIRequestFactory().get('/', params)), paginations.CustomPagination)
+
+        self.assertEqual(cost({}), 1)
+        self.assertEqual(cost({'search': 'milk'}), 5)
+        self.assertEqual(cost({'page': 21, 'page_size': 100}), 3)
+        self.assertEqual(cost({'page': 21, 'page_size': 1000}), 3)
+        self.assertEqual(cost({'page': 21, 'page_size': 100, 'pagination': 'cursor'}), 1)
+
+    def test_write_cost(self):
+        """
+        Test a bulk write costs one more token per TODO_THROTTLE_BULK_ITEMS todos.
+        """
+        self.assertEqual(throttling.write_cost(1), 1)
+        self.assertEqual(throttling.write_cost(250), 3)
+
+
+class ThrottleAPITestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('owner')
+        self.headers = {'Authorization': f'Token {Token.objects.create(user=self.user).key}'}
+        self.client.credentials(HTTP_AUTHORIZATION=self.headers['Authorization'])
+        self.todo = Todo.objects.create(owner=self.user, title='Milk', description='Buy.', due_date='2025-01-30')
+        self.url = reverse('create_list')
+
+    @rates(todo_list='3/min')
+    def test_endpoint_rate(self):
+        """
+        Test a client past its endpoint rate gets 429 with Retry-After, other endpoints and clients do not.
+        """
+        for _ in range(3):
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '20')
+
+        detail_url = reverse('update_delete_retrieve', args=[self.todo.pk])
+        self.assertEqual(self.client.get(detail_url).status_code, status.HTTP_200_OK)
+        other = User.objects.create_user('other')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=other).key}')
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+
+    @rates(client='2/min')
+    def test_client_rate(self):
+        """
+        Test the client rate counts the requests of every endpoint.
+        """
+        self.client.get(self.url)
+        self.client.get(reverse('update_delete_retrieve', args=[self.todo.pk]))
+
+        response = self.client.get(reverse('sync'))
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @rates(todo_list='6/min')
+    def test_expensive_reads_cost_more(self):
+        """
+        Test a text search spends the tokens of several plain reads.
+        """
+        self.assertEqual(self.client.get(self.url, {'search': 'milk'}).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @rates(todo_list='1/min')
+    def test_buckets_in_the_process_when_the_cache_fails(self):
+        """
+        Test the limits still hold while the throttle cache is unreachable.
+        """
+        broken = mock.Mock(**{'get.side_effect': ConnectionError})
+        with mock.patch('todo.throttling.get_cache', return_value=broken), \
+                mock.patch('todo.throttling.local_buckets', throttling.LocalBuckets()), \
+                self.assertLogs('todo.throttling', 'WARNING'):
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @rates(todo_list='1/min')
+    async def test_async_views_are_throttled(self):
+        """
+        Test the async views share the buckets of the sync ones.
+        """
+        await self.async_client.get(self.url, headers=self.headers)
+
+        response = await self.async_client.get(reverse('async_create_list'), headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '60')
+
+
+@override_settings(TODO_MAX_CONCURRENT_REQUESTS=1, TODO_ADMISSION_RETRY_AFTER=2)
+class AdmissionMiddlewareTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+
+    def test_busy_response(self):
+        """
+        Test requests past the concurrency cap get 503 with Retry-After at once, scrapes still pass.
+        """
+        self.assertTrue(throttling.in_flight.enter(1))
+        try:
+            response = self.client.get(reverse('create_list'))
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            self.assertEqual(response['Retry-After'], '2')
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_200_OK)
+        finally:
+            throttling.in_flight.leave()
+
+        self.assertEqual(self.client.get(reverse('create_list')).status_code, status.HTTP_200_OK)
+        self.assertEqual(throttling.in_flight.active, 0)
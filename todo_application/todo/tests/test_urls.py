@@ -1,6 +1,11 @@
+from django.conf import settings
 from django.test import SimpleTestCase
-from django.urls import reverse, resolve
-from todo.views import TodoListCreateApiView, TodoDetailsApiView
+from django.urls import reverse, resolve, Resolver404
+from todo.views import TodoListCreateApiView, TodoDetailsApiView, TodoBulkApiView
+import os
+import subprocess
+import sys
+import uuid
 
 class TodoUrlsTestCase(SimpleTestCase):
 
@@ -15,5 +20,30 @@ class TodoUrlsTestCase(SimpleTestCase):
         """
         Test the 'update_delete_retrieve/<pk>' URL routes to the TodoDetailsApiView.
         """
-        url = reverse('update_delete_retrieve', kwargs={'pk': 'test'})
-        self.assertEqual(resolve(url).func.view_class, TodoDetailsApiView)
\ No newline at end of file
+        url = reverse('update_delete_retrieve', kwargs={'pk': uuid.uuid4()})
+        self.assertEqual(resolve(url).func.view_class, TodoDetailsApiView)
+
+    def test_update_delete_retrieve_url_rejects_invalid_uuid(self):
+        """
+        Test a pk that is not a UUID never reaches the view.
+        """
+        with self.assertRaises(Resolver404):
+            resolve('/api/todo/update_delete_retrieve/test')
+
+    def test_bulk_url_resolves(self):
+        """
+        Test the 'bulk/' URL routes to the TodoBulkApiView.
+        """
+        url = reverse('bulk')
+        self.assertEqual(resolve(url).func.view_class, TodoBulkApiView)
+
+    def test_api_only_profile_imports(self):
+        """
+        Test the urls of the api only profile import with its settings (no schema class, no drf_spectacular).
+        """
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'todo_application.settings_api'}
+        result = subprocess.run(
+            [sys.executable, '-c', 'import django; django.setup(); import todo_application.urls_api'],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
@@ -1,15 +1,30 @@
 from rest_framework import status
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APITestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from todo.models import Todo
+from django.utils import timezone
+from todo import tasks
+from todo.models import IdempotencyKey, Todo, TodoTombstone
+import csv
+import datetime
+import io
+import json
 import uuid
 
 
 class TodoListCreateAPITestCase(APITestCase):
 
     def setUp(self):
+        self.user = User.objects.create_user('owner')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
         # Optionally create a Todo instance for testing
         self.todo = Todo.objects.create(
+            owner=self.user,
             title='Sample Todo',
             description='This is a sample todo item.',
             due_date='2025-01-30',
@@ -27,6 +42,23 @@ class TodoListCreateAPITestCase(APITestCase):
         self.assertEqual(len(response.data['results']), 1)
         self.assertEqual(response.data['results'][0]['title'], 'Sample Todo')
 
+    def test_search_todo_list(self):
+        """
+        Test the search parameter matches title or description.
+        """
+        Todo.objects.create(
+            owner=self.user,
+            title='Buy milk',
+            description='From the corner shop.',
+            due_date='2025-02-01',
+        )
+        response = self.client.get(self.url, {'search': 'milk'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['title'], 'Buy milk')
+        self.assertNotIn('search_vector', response.data['results'][0])
+
     def test_get_empty_todo_list(self):
         """
         Test retrieving the list of todos returns 404 when no todos exist.
@@ -66,12 +98,238 @@ class TodoListCreateAPITestCase(APITestCase):
         self.assertIn('title', response.data)
 
 
+class TodoListFilterAPITestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+        self.headers = {'Authorization': f'Token {Token.objects.create(user=self.user).key}'}
+        self.client.credentials(HTTP_AUTHORIZATION=self.headers['Authorization'])
+        todo_s = self.user.todos
+        self.todo_s = [
+            todo_s.create(title='Monday', description='Filtered.', due_date='2025-01-27T09:00:00Z'),
+            todo_s.create(title='Wednesday', description='Filtered.', due_date='2025-01-29T09:00:00Z', completed=True),
+            todo_s.create(title='Friday', description='Filtered.', due_date='2025-01-31T09:00:00Z'),
+            todo_s.create(title='Next week', description='Filtered.', due_date='2025-02-04T09:00:00Z'),
+        ]
+        self.url = reverse('create_list')
+
+    def titles(self, response):
+        return [todo['title'] for todo in response.data['results']]
+
+    def test_range_and_completed(self):
+        """
+        Test the due this week and not completed todos.
+        """
+        response = self.client.get(self.url, {
+            'due_date__gte': '2025-01-27', 'due_date__lt': '2025-02-03', 'completed': 'false', 'ordering': 'due_date',
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.titles(response), ['Monday', 'Friday'])
+        self.assertEqual(response.data['count'], 2)
+
+    def test_in_list(self):
+        """
+        Test the id__in filter takes a comma separated list.
+        """
+        ids = f'{self.todo_s[0].pk},{self.todo_s[3].pk}'
+        response = self.client.get(self.url, {'id__in': ids, 'ordering': '-due_date'})
+
+        self.assertEqual(self.titles(response), ['Next week', 'Monday'])
+
+    def test_multi_field_ordering(self):
+        """
+        Test the ordering param sorts on several whitelisted fields.
+        """
+        response = self.client.get(self.url, {'ordering': 'completed,-due_date'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(self.url, {'ordering': '-created_at,due_date'})
+        self.assertEqual(self.titles(response), ['Next week', 'Friday', 'Wednesday', 'Monday'])
+
+    def test_invalid_filters(self):
+        """
+        Test invalid filter values are all reported with a 400.
+        """
+        response = self.client.get(self.url, {
+            'due_date__gte': 'next week', 'completed': 'maybe', 'id__in': 'a,b', 'ordering': 'title',
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data), {'due_date__gte', 'completed', 'id__in', 'ordering'})
+
+    async def test_async_list_invalid_filter(self):
+        """
+        Test the async list answers invalid filters with a 400 too.
+        """
+        response = await self.async_client.get(
+            reverse('async_create_list'), {'completed': 'maybe'}, headers=self.headers,
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('completed', response.json())
+
+
+class TodoCursorPaginationAPITestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+        for index in range(5):
+            Todo.objects.create(
+                owner=self.user,
+                title=f'Todo {index}',
+                description='This is a sample todo item.',
+                due_date='2025-01-30',
+            )
+        self.url = reverse('create_list')
+
+    def test_cursor_pagination_walks_all_pages(self):
+        """
+        Test walking the list with cursors returns every todo once, newest first, without a count.
+        """
+        response = self.client.get(self.url, {'pagination': 'cursor', 'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['previous'])
+
+        titles = [item['title'] for item in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            titles += [item['title'] for item in response.data['results']]
+
+        self.assertEqual(titles, [f'Todo {index}' for index in reversed(range(5))])
+
+    def test_cursor_pagination_previous_page(self):
+        """
+        Test the previous cursor returns the page before the current one.
+        """
+        first = self.client.get(self.url, {'pagination': 'cursor', 'page_size': 2})
+        second = self.client.get(first.data['next'])
+        response = self.client.get(second.data['previous'])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], first.data['results'])
+
+    def test_invalid_cursor(self):
+        """
+        Test a tampered cursor returns 404.
+        """
+        response = self.client.get(self.url, {'cursor': 'bad-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(TODO_COUNT_CAP=3)
+class TodoCountStrategyAPITestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+        for index in range(5):
+            Todo.objects.create(owner=self.user, title=f'Todo {index}', description='Counted.', due_date='2025-01-30')
+        self.url = reverse('create_list')
+
+    def test_exact_count_by_default(self):
+        """
+        Test the list reports the exact count without a count parameter.
+        """
+        response = self.client.get(self.url, {'page_size': 2})
+
+        self.assertEqual(response.data['count'], 5)
+
+    def test_capped_count(self):
+        """
+        Test a capped count reports "<cap>+" and pages past the cap are still served.
+        """
+        response = self.client.get(self.url, {'page_size': 2, 'count': 'capped'})
+        self.assertEqual(response.data['count'], '3+')
+        self.assertIsNotNone(response.data['next'])
+
+        response = self.client.get(self.url, {'page_size': 2, 'page': 3, 'count': 'capped'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get(self.url, {'page_size': 2, 'page': 4, 'count': 'capped'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_capped_count_under_the_cap_is_exact(self):
+        """
+        Test a capped count of fewer rows than the cap is exact.
+        """
+        response = self.client.get(self.url, {'title': 'Todo 1', 'count': 'capped'})
+
+        self.assertEqual(response.data['count'], 1)
+
+    def test_estimate_falls_back_to_counting(self):
+        """
+        Test the estimate strategy counts when the database has no planner estimate.
+        """
+        response = self.client.get(self.url, {'count': 'estimate'})
+
+        self.assertEqual(response.data['count'], '3+')
+
+    def test_no_count(self):
+        """
+        Test count=none skips the count and still links the next page.
+        """
+        # caches the user of the token
+        self.client.get(self.url, {'count': 'none'})
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'page_size': 2, 'count': 'none'})
+
+        self.assertIsNone(response.data['count'])
+        self.assertIsNotNone(response.data['next'])
+
+    def test_deep_pages_without_an_exact_count(self):
+        """
+        Test pages past the cap, or any page without a count, link their previous page.
+        """
+        response = self.client.get(self.url, {'page_size': 2, 'page': 2, 'count': 'none'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data['count'])
+        self.assertIsNotNone(response.data['previous'])
+        self.assertIsNotNone(response.data['next'])
+
+        for index in range(5, 9):
+            Todo.objects.create(owner=self.user, title=f'Todo {index}', description='Counted.', due_date='2025-01-30')
+        for count in ('capped', 'estimate'):
+            response = self.client.get(self.url, {'page_size': 2, 'page': 4, 'count': count})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['count'], '3+')
+            self.assertIn('page=3', response.data['previous'])
+            self.assertIsNotNone(response.data['next'])
+
+    def test_count_is_cached_per_filter(self):
+        """
+        Test pages of the same filters share one count until a todo is written.
+        """
+        self.client.get(self.url, {'page_size': 2, 'count': 'capped'})
+        with self.assertNumQueries(1):
+            self.client.get(self.url, {'page_size': 2, 'page': 2, 'count': 'capped'})
+
+        Todo.objects.create(owner=self.user, title='Todo 5', description='Counted.', due_date='2025-01-30')
+        with self.assertNumQueries(2):
+            self.client.get(self.url, {'page_size': 2, 'page': 2, 'count': 'capped'})
+
+    def test_async_list_capped_count(self):
+        """
+        Test the async list view applies the count strategy too.
+        """
+        response = self.client.get(reverse('async_create_list'), {'page_size': 2, 'count': 'capped'})
+
+        self.assertEqual(response.json()['count'], '3+')
+
+
 class TodoDetailsAPITestCase(APITestCase):
 
     def setUp(self):
+        self.user = User.objects.create_user('owner')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
         # Create a sample Todo instance for testing
         self.todo_id = uuid.uuid4()
         self.todo = Todo.objects.create(
+            owner=self.user,
             id=self.todo_id,
             title='Sample Todo',
             description='This is a sample todo item.',
@@ -138,6 +396,47 @@ class TodoDetailsAPITestCase(APITestCase):
         # Check that the todo is indeed deleted
         self.assertFalse(Todo.objects.filter(id=self.todo_id).exists())
 
+    def test_patch_todo_partial_update(self):
+        """
+        Test patching a todo writes only the sent fields in a single query.
+        """
+        # caches the user of the token
+        self.client.get(self.url)
+        with self.assertNumQueries(1):
+            response = self.client.patch(self.url, {'completed': True})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['title'], 'Sample Todo')
+        self.todo.refresh_from_db()
+        self.assertTrue(self.todo.completed)
+
+    def test_patch_with_if_match(self):
+        """
+        Test a write with the current etag succeeds and a stale etag returns 412.
+        """
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.patch(self.url, {'title': 'First'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.patch(self.url, {'title': 'Second'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.todo.refresh_from_db()
+        self.assertEqual(self.todo.title, 'First')
+
+    def test_delete_todo_single_query(self):
+        """
+        Test deleting a todo runs one delete, which also records the tombstone on postgres.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        statements = [query['sql'] for query in queries.captured_queries if 'SAVEPOINT' not in query['sql']]
+        self.assertEqual(sum('DELETE' in statement for statement in statements), 1)
+        if connection.vendor == 'postgresql':
+            self.assertEqual(len(statements), 1)
+        self.assertTrue(TodoTombstone.objects.filter(id=self.todo.pk).exists())
+
     def test_delete_non_existent_todo(self):
         """
         Test deleting a todo that does not exist.
@@ -146,3 +445,728 @@ class TodoDetailsAPITestCase(APITestCase):
         response = self.client.delete(non_existent_url)
 
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TodoBulkAPITestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+        self.todo_s = [
+            Todo.objects.create(
+                owner=self.user,
+                title=f'Todo {index}',
+                description='This is a sample todo item.',
+                due_date='2025-01-30',
+            ) for index in range(3)
+        ]
+        self.url = reverse('bulk')
+
+    def test_bulk_create(self):
+        """
+        Test creating many todos in one request.
+        """
+        data = [
+            {'title': f'New Todo {index}', 'description': 'Bulk item.', 'due_date': '2025-02-15'}
+            for index in range(5)
+        ]
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 5)
+        self.assertTrue(all(item['id'] for item in response.data))
+        self.assertEqual(Todo.objects.count(), 8)
+
+    def test_bulk_create_reports_item_errors(self):
+        """
+        Test invalid items are reported by index and nothing is created.
+        """
+        data = [
+            {'title': 'Valid', 'description': 'Bulk item.', 'due_date': '2025-02-15'},
+            {'description': 'No title.', 'due_date': '2025-02-15'},
+        ]
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('title', response.data[1])
+        self.assertEqual(Todo.objects.count(), 3)
+
+    def test_bulk_partial_update(self):
+        """
+        Test updating many todos in one request.
+        """
+        data = [{'id': str(todo.id), 'completed': True} for todo in self.todo_s]
+        response = self.client.patch(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Todo.objects.filter(completed=True).count(), 3)
+
+    def test_bulk_update_unknown_id(self):
+        """
+        Test updating a todo that does not exist reports the item.
+        """
+        data = [
+            {'id': str(self.todo_s[0].id), 'completed': True},
+            {'id': str(uuid.uuid4()), 'completed': True},
+        ]
+        response = self.client.patch(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', response.data[1])
+        self.assertFalse(Todo.objects.filter(completed=True).exists())
+
+    def test_bulk_delete(self):
+        """
+        Test deleting many todos in one request.
+        """
+        data = {'ids': [str(todo.id) for todo in self.todo_s[:2]] + [str(uuid.uuid4())]}
+        response = self.client.delete(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['deleted'], 2)
+        self.assertEqual(response.data['not_found'], [uuid.UUID(data['ids'][2])])
+        self.assertEqual(Todo.objects.count(), 1)
+
+
+class TodoCacheAPITestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+        cache.clear()
+        self.todo = Todo.objects.create(
+            owner=self.user,
+            title='Cached Todo',
+            description='This is a sample todo item.',
+            due_date='2025-01-30',
+        )
+        self.list_url = reverse('create_list')
+        self.detail_url = reverse('update_delete_retrieve', kwargs={'pk': self.todo.id})
+
+    def test_detail_is_served_from_cache(self):
+        """
+        Test the second read of a todo does not touch the database.
+        """
+        self.client.get(self.detail_url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['title'], 'Cached Todo')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+    def test_detail_not_modified(self):
+        """
+        Test a client sending the current etag gets 304.
+        """
+        etag = self.client.get(self.detail_url)['ETag']
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_invalidated_on_put(self):
+        """
+        Test updating a todo drops its cached copy and changes the etag.
+        """
+        etag = self.client.get(self.detail_url)['ETag']
+        self.client.put(self.detail_url, {
+            'title': 'Updated Todo',
+            'description': 'This is the updated description.',
+            'due_date': '2025-02-15',
+        })
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['title'], 'Updated Todo')
+
+    def test_list_is_served_from_cache(self):
+        """
+        Test the same list request is answered from cache until a todo is created.
+        """
+        self.client.get(self.list_url, {'page_size': 5})
+        with self.assertNumQueries(0):
+            response = self.client.get(self.list_url, {'page_size': 5})
+        self.assertEqual(response.data['count'], 1)
+
+        self.client.post(self.list_url, {
+            'title': 'New Todo',
+            'description': 'This is a new todo item.',
+            'due_date': '2025-02-15',
+        })
+        response = self.client.get(self.list_url, {'page_size': 5})
+        self.assertEqual(response.data['count'], 2)
+
+    def test_list_invalidated_on_bulk_create(self):
+        """
+        Test bulk writes, which send no model signals, also drop cached lists.
+        """
+        self.client.get(self.list_url)
+        self.client.post(reverse('bulk'), [
+            {'title': 'Bulk Todo', 'description': 'Bulk item.', 'due_date': '2025-02-15'},
+        ], format='json')
+        response = self.client.get(self.list_url)
+
+        self.assertEqual(response.data['count'], 2)
+
+
+class AsyncTodoAPITestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+        self.headers = {'Authorization': f'Token {Token.objects.create(user=self.user).key}'}
+        self.client.credentials(HTTP_AUTHORIZATION=self.headers['Authorization'])
+        cache.clear()
+        self.todo = Todo.objects.create(
+            owner=self.user,
+            title='Sample Todo',
+            description='This is a sample todo item.',
+            due_date='2025-01-30',
+        )
+        self.list_url = reverse('async_create_list')
+        self.detail_url = reverse('async_update_delete_retrieve', kwargs={'pk': self.todo.id})
+
+    async def test_async_list_matches_sync_list(self):
+        """
+        Test the async list returns the same body as the sync list.
+        """
+        sync_response = await self.async_client.get(reverse('create_list'), {'title': 'Sample'}, headers=self.headers)
+        response = await self.async_client.get(self.list_url, {'title': 'Sample'}, headers=self.headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, sync_response.content)
+
+    async def test_async_cursor_list(self):
+        """
+        Test the async list supports the cursor mode.
+        """
+        response = await self.async_client.get(self.list_url, {'pagination': 'cursor'}, headers=self.headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()['results']), 1)
+
+    def test_async_writes_need_no_csrf_token(self):
+        """
+        Test the async apis accept token authenticated writes when CSRF is enforced, like the sync apis.
+        """
+        client = Client(enforce_csrf_checks=True, HTTP_AUTHORIZATION=self.headers['Authorization'])
+        data = {'title': 'New Todo', 'description': 'Sent without csrf token.', 'due_date': '2025-02-15'}
+
+        response = client.post(self.list_url, data, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = client.patch(self.detail_url, {'completed': True}, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(client.delete(self.detail_url).status_code, status.HTTP_204_NO_CONTENT)
+        response = client.post(reverse('create_list'), data, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    async def test_async_post(self):
+        """
+        Test creating a todo through the async api, with and without errors.
+        """
+        response = await self.async_client.post(self.list_url, {
+            'title': 'New Todo',
+            'description': 'This is a new todo item.',
+            'due_date': '2025-02-15',
+        }, content_type='application/json', headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(await Todo.objects.acount(), 2)
+
+        response = await self.async_client.post(self.list_url, {'description': 'No title.'},
+                                                content_type='application/json', headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('title', response.json())
+
+    async def test_async_detail(self):
+        """
+        Test reading, updating and deleting a todo through the async api.
+        """
+        response = await self.async_client.get(self.detail_url, headers=self.headers)
+        self.assertEqual(response.json()['id'], str(self.todo.id))
+
+        response = await self.async_client.put(self.detail_url, {
+            'title': 'Updated Todo',
+            'description': 'This is the updated description.',
+            'due_date': '2025-02-15',
+            'completed': True,
+        }, content_type='application/json', headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue((await Todo.objects.aget(id=self.todo.id)).completed)
+
+        response = await self.async_client.delete(self.detail_url, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        response = await self.async_client.get(self.detail_url, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TodoExportAPITestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+        self.headers = {'Authorization': f'Token {Token.objects.create(user=self.user).key}'}
+        self.client.credentials(HTTP_AUTHORIZATION=self.headers['Authorization'])
+        for index in range(3):
+            Todo.objects.create(
+                owner=self.user,
+                title=f'Export {index}',
+                description='This is a sample todo item.',
+                due_date='2025-01-30',
+                completed=index == 0,
+            )
+        self.url = reverse('export')
+
+    def test_export_ndjson(self):
+        """
+        Test the export streams one json object per todo.
+        """
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual({json.loads(line)['title'] for line in lines}, {'Export 0', 'Export 1', 'Export 2'})
+
+    def test_export_csv_with_filter(self):
+        """
+        Test the csv export applies the list filters.
+        """
+        response = self.client.get(self.url, {'output': 'csv', 'title': 'Export 0'})
+
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], ['id', 'title', 'description', 'due_date', 'completed', 'created_at', 'updated_at'])
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][4], 'true')
+
+    @override_settings(TODO_EXPORT_CHUNK_SIZE=1)
+    async def test_export_streams_under_asgi(self):
+        """
+        Test under asgi the export is an async stream sending a chunk per TODO_EXPORT_CHUNK_SIZE todos.
+        """
+        response = await self.async_client.get(self.url, {'output': 'csv'}, headers=self.headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(len(list(csv.reader(io.StringIO(b''.join(chunks).decode())))), 4)
+        self.assertFalse(self.client.get(self.url).is_async)
+
+    def test_export_unknown_output(self):
+        """
+        Test an unknown output format returns 400.
+        """
+        response = self.client.get(self.url, {'output': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(TODO_SYNC_LAG_SECONDS=0)
+class TodoSyncAPITestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+        self.todo_s = [
+            Todo.objects.create(owner=self.user, title=f'Sync {index}', description='Synced.', due_date='2025-01-30')
+            for index in range(3)
+        ]
+        self.url = reverse('sync')
+
+    def sync(self, since=None, **params):
+        if since:
+            params['since'] = since
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_first_sync_in_pages(self):
+        """
+        Test a first sync returns every todo in updated_at order, page by page.
+        """
+        data = self.sync(limit=2)
+        self.assertEqual([change['title'] for change in data['changes']], ['Sync 0', 'Sync 1'])
+        self.assertTrue(data['has_more'])
+
+        data = self.sync(data['watermark'], limit=2)
+        self.assertEqual([change['title'] for change in data['changes']], ['Sync 2'])
+        self.assertFalse(data['has_more'])
+
+    def test_only_changes_after_the_watermark(self):
+        """
+        Test a sync returns only the updates and deletes since the previous one.
+        """
+        watermark = self.sync()['watermark']
+        self.assertEqual(self.sync(watermark)['changes'], [])
+
+        self.client.patch(reverse('update_delete_retrieve', args=[self.todo_s[0].pk]), {'completed': True})
+        self.client.delete(reverse('update_delete_retrieve', args=[self.todo_s[1].pk]))
+
+        data = self.sync(watermark)
+        self.assertEqual(len(data['changes']), 2)
+        updated, deleted = data['changes']
+        self.assertEqual((updated['id'], updated['completed'], updated['deleted']), (str(self.todo_s[0].pk), True, False))
+        self.assertEqual((deleted['id'], deleted['deleted']), (str(self.todo_s[1].pk), True))
+        self.assertEqual(self.sync(data['watermark'])['changes'], [])
+
+    def test_orm_and_bulk_deletes_leave_tombstones(self):
+        """
+        Test todos deleted through the orm or the bulk api are reported too.
+        """
+        watermark = self.sync()['watermark']
+        ids = {str(self.todo_s[0].pk), str(self.todo_s[1].pk)}
+        self.todo_s[0].delete()
+        self.client.delete(reverse('bulk'), {'ids': [str(self.todo_s[1].pk)]}, format='json')
+
+        deleted = {change['id'] for change in self.sync(watermark)['changes'] if change['deleted']}
+        self.assertEqual(deleted, ids)
+
+    @override_settings(TODO_SYNC_LAG_SECONDS=60)
+    def test_recent_changes_are_held_back(self):
+        """
+        Test changes younger than the sync lag are not returned yet.
+        """
+        self.assertEqual(self.sync()['changes'], [])
+
+    def test_invalid_watermark(self):
+        """
+        Test a watermark that can not be decoded returns 400.
+        """
+        response = self.client.get(self.url, {'since': 'not a watermark'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(TODO_TOMBSTONE_RETENTION_DAYS=0)
+    def test_expired_watermark(self):
+        """
+        Test a watermark older than the kept tombstones returns 410.
+        """
+        watermark = self.sync()['watermark']
+
+        response = self.client.get(self.url, {'since': watermark})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+
+class TodoOwnershipAPITestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='secret')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.todo = Todo.objects.create(owner=self.user, title='Mine', description='Owned.', due_date='2025-01-30')
+        self.other = Todo.objects.create(
+            owner=User.objects.create_user('other'), title='Theirs', description='Owned.', due_date='2025-01-30',
+        )
+
+    @override_settings(TODO_SYNC_LAG_SECONDS=0)
+    def test_list_only_own_todos(self):
+        """
+        Test the list and sync apis return only the todos of the user.
+        """
+        response = self.client.get(reverse('create_list'))
+        self.assertEqual([todo['title'] for todo in response.data['results']], ['Mine'])
+
+        response = self.client.get(reverse('sync'))
+        self.assertEqual([change['title'] for change in response.data['changes']], ['Mine'])
+
+    def test_other_todo_is_not_found(self):
+        """
+        Test reading, writing or deleting the todo of another user returns 404 and leaves it alone.
+        """
+        url = reverse('update_delete_retrieve', args=[self.other.pk])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.patch(url, {'title': 'Taken'}).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.delete(reverse('bulk'), {'ids': [str(self.other.pk)]}, format='json')
+        self.assertEqual(response.data['deleted'], 0)
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.title, 'Theirs')
+
+    def test_create_sets_the_owner(self):
+        """
+        Test a created todo belongs to the user, whatever owner the body names.
+        """
+        response = self.client.post(reverse('create_list'), {
+            'title': 'New', 'description': 'Owned.', 'due_date': '2025-01-30', 'owner': self.other.owner_id,
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('owner', response.data)
+        self.assertEqual(Todo.objects.get(title='New').owner, self.user)
+
+    def test_needs_a_token(self):
+        """
+        Test the apis return 401 without a token or with an unknown one.
+        """
+        self.client.credentials()
+        response = self.client.get(reverse('create_list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token unknown')
+        self.assertEqual(self.client.get(reverse('create_list')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_async_needs_a_token(self):
+        """
+        Test the async apis return 401 without a token and scope the todos with one.
+        """
+        response = await self.async_client.get(reverse('async_create_list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = await self.async_client.get(
+            reverse('async_update_delete_retrieve', args=[self.other.pk]),
+            headers={'Authorization': f'Token {self.token.key}'},
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_obtain_token(self):
+        """
+        Test the token api returns the key of the user for a valid password.
+        """
+        self.client.credentials()
+        response = self.client.post(reverse('token'), {'username': 'owner', 'password': 'secret'})
+        self.assertEqual(response.data['token'], self.token.key)
+
+        response = self.client.post(reverse('token'), {'username': 'owner', 'password': 'wrong'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_token_is_cached_until_revoked(self):
+        """
+        Test the user of a token is read once, and a deleted token is refused right away.
+        """
+        self.client.get(reverse('create_list'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('create_list'))
+
+        self.token.delete()
+        self.assertEqual(self.client.get(reverse('create_list')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_refused(self):
+        """
+        Test saving a deactivated user drops the cached user of its tokens.
+        """
+        self.client.get(reverse('create_list'))
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(self.client.get(reverse('create_list')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TodoStatsAPITestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+        self.now = timezone.now()
+        self.today = self.now.astimezone(datetime.timezone.utc).date()
+        self.url = reverse('stats')
+
+    def day(self, days):
+        # noon, the todos of a day stay on that day
+        return self.now.replace(hour=12, minute=0) + datetime.timedelta(days=days)
+
+    def create(self, days, completed=False, owner=None):
+        return Todo.objects.create(owner=owner or self.user, title='Counted', description='Counted.',
+                                   due_date=self.day(days), completed=completed)
+
+    def test_stats(self):
+        """
+        Test the totals and the todos per due day of the user, through every write path of the apis.
+        """
+        self.create(-2)
+        self.create(-2, completed=True)
+        moved = self.create(1)
+        self.create(1, owner=User.objects.create_user('other'))
+        self.client.post(reverse('bulk'), [
+            {'title': 'Bulk', 'description': 'Counted.', 'due_date': self.day(3).isoformat()} for _ in range(2)
+        ], format='json')
+        self.client.patch(reverse('update_delete_retrieve', args=[moved.pk]), {
+            'completed': True, 'due_date': self.day(2).isoformat(),
+        }, format='json')
+        deleted = self.create(3)
+        self.client.delete(reverse('update_delete_retrieve', args=[deleted.pk]))
+
+        response = self.client.get(self.url, {'from': str(self.today), 'to': str(self.today + datetime.timedelta(3))})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            {key: response.data[key] for key in ('total', 'open', 'completed', 'overdue')},
+            {'total': 5, 'open': 3, 'completed': 2, 'overdue': 1},
+        )
+        self.assertEqual(response.data['due_per_day'], [
+            {'day': self.today + datetime.timedelta(2), 'open': 0, 'completed': 1},
+            {'day': self.today + datetime.timedelta(3), 'open': 2, 'completed': 0},
+        ])
+        with override_settings(TODO_STATS_SUMMARY=False):
+            self.assertEqual(self.client.get(self.url, {'from': str(self.today)}).data, response.data)
+
+    def test_overdue_today(self):
+        """
+        Test todos due earlier today are overdue and the later ones are not.
+        """
+        for minutes in (-1, 1):
+            due_date = self.now + datetime.timedelta(minutes=minutes)
+            if due_date.date() == self.today:
+                Todo.objects.create(owner=self.user, title='Today', description='Counted.', due_date=due_date)
+
+        expected = Todo.objects.filter(due_date__lt=self.now).count()
+        self.assertEqual(self.client.get(self.url).data['overdue'], expected)
+        with override_settings(TODO_STATS_SUMMARY=False):
+            self.assertEqual(self.client.get(self.url).data['overdue'], expected)
+
+    def test_summary_queries(self):
+        """
+        Test the summary answers in two queries whatever the number of todos, the grouped query in one.
+        """
+        for days in range(20):
+            self.create(days % 5)
+        # caches the user of the token
+        self.client.get(self.url)
+
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+        with override_settings(TODO_STATS_SUMMARY=False), self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_invalid_range(self):
+        """
+        Test an invalid date or a range longer than TODO_STATS_MAX_DAYS returns 400.
+        """
+        self.assertEqual(self.client.get(self.url, {'from': 'soon'}).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {'from': '2025-01-01', 'to': '2026-06-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {'from': '2025-01-02', 'to': '2025-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TodoIdempotencyAPITestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+        self.headers = {'Authorization': f'Token {Token.objects.create(user=self.user).key}'}
+        self.client.credentials(HTTP_AUTHORIZATION=self.headers['Authorization'])
+        self.url = reverse('create_list')
+        self.data = {'title': 'Once', 'description': 'Created once.', 'due_date': '2025-02-15T00:00:00Z'}
+
+    def post(self, key, data=None, url=None):
+        return self.client.post(url or self.url, data or self.data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_replay(self):
+        """
+        Test a retry with the same key gets the first response back without touching the todos.
+        """
+        first = self.post('create-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+
+        with CaptureQueriesContext(connection) as queries:
+            retry = self.post('create-1')
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertFalse(any('ToDO_list' in query['sql'] for query in queries.captured_queries))
+        self.assertEqual(Todo.objects.count(), 1)
+
+        self.assertEqual(self.post('create-2').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Todo.objects.count(), 2)
+
+    def test_replay_update(self):
+        """
+        Test a replayed update returns its ETag and does not write again.
+        """
+        todo = Todo.objects.create(owner=self.user, title='Old', description='Old.', due_date='2025-01-30')
+        url = reverse('update_delete_retrieve', args=[todo.pk])
+        first = self.client.patch(url, {'title': 'New'}, format='json', HTTP_IDEMPOTENCY_KEY='update-1')
+        updated_at = Todo.objects.get(pk=todo.pk).updated_at
+
+        retry = self.client.patch(url, {'title': 'New'}, format='json', HTTP_IDEMPOTENCY_KEY='update-1')
+        self.assertEqual(retry.status_code, status.HTTP_200_OK)
+        self.assertEqual(retry['ETag'], first['ETag'])
+        self.assertEqual(Todo.objects.get(pk=todo.pk).updated_at, updated_at)
+
+    def test_key_reused(self):
+        """
+        Test the same key with another body or endpoint returns 422.
+        """
+        self.post('create-1')
+
+        self.assertEqual(self.post('create-1', {**self.data, 'title': 'Twice'}).status_code,
+                         status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(self.post('create-1', [self.data], reverse('bulk')).status_code,
+                         status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Todo.objects.count(), 1)
+
+    def test_key_in_use(self):
+        """
+        Test a duplicate of a request still running returns 409 with Retry-After, until the lock times out.
+        """
+        self.post('create-1')
+        IdempotencyKey.objects.update(response_status=None, locked_at=timezone.now())
+
+        response = self.post('create-1')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response['Retry-After'], '1')
+
+        IdempotencyKey.objects.update(locked_at=timezone.now() - datetime.timedelta(minutes=5))
+        self.assertEqual(self.post('create-1').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Todo.objects.count(), 2)
+
+    def test_keys_per_user_and_ttl(self):
+        """
+        Test keys belong to their user and expire after TODO_IDEMPOTENCY_TTL_SECONDS.
+        """
+        self.post('create-1')
+        other = User.objects.create_user('other')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=other).key}')
+        self.assertNotIn('Idempotent-Replayed', self.post('create-1'))
+
+        IdempotencyKey.objects.update(expires_at=timezone.now() - datetime.timedelta(seconds=1))
+        self.assertNotIn('Idempotent-Replayed', self.post('create-1'))
+        self.assertEqual(Todo.objects.count(), 3)
+
+    def test_failed_request_frees_the_key(self):
+        """
+        Test a request with an invalid body or an invalid key keeps nothing.
+        """
+        self.assertEqual(self.post('create-1', {'title': ''}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.post('create-1').status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(self.post('k' * 256).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_replay(self):
+        """
+        Test a retried bulk create creates the todos once.
+        """
+        url = reverse('bulk')
+        first = self.post('bulk-1', [self.data, self.data], url)
+        retry = self.post('bulk-1', [self.data, self.data], url)
+
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Todo.objects.count(), 2)
+
+    async def test_async_replay(self):
+        """
+        Test the async create replays like the sync one.
+        """
+        headers = {**self.headers, 'Idempotency-Key': 'create-1'}
+        url = reverse('async_create_list')
+        first = await self.async_client.post(url, self.data, content_type='application/json', headers=headers)
+        retry = await self.async_client.post(url, self.data, content_type='application/json', headers=headers)
+
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(await Todo.objects.acount(), 1)
+
+    def test_purge(self):
+        """
+        Test the daily job drops the expired keys.
+        """
+        self.post('create-1')
+        self.post('create-2')
+        IdempotencyKey.objects.filter(key='create-1').update(expires_at=timezone.now() - datetime.timedelta(seconds=1))
+
+        tasks.purge_idempotency_keys({})
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['create-2'])
@@ -0,0 +1,219 @@
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from . import metrics
+
+"""
+    admission control of the todo apis.
+    every client (its user, or its ip before it authenticates) has a token
+    bucket over all the apis (the `client` rate) and one per endpoint (the
+    `throttle_scope` of the view), both set in DEFAULT_THROTTLE_RATES as
+    drf rates: '600/min' holds 600 tokens and refills 10 a second. a
+    request spends 1 token, or what get_throttle_cost of its view returns:
+    text filters, deep pages and big bulk batches cost more, so one client
+    can not keep the database busy with them. a refused request gets 429
+    with Retry-After.
+    a bucket is one float in the TODO_THROTTLE_CACHE_ALIAS cache (the
+    theoretical arrival time of the generic cell rate algorithm), use a
+    shared backend so the limits hold across workers. while that cache is
+    unreachable the buckets live in the process.
+    on top of that AdmissionMiddleware lets TODO_MAX_CONCURRENT_REQUESTS
+    requests per process in at a time and answers 503 to the next ones at
+    once, instead of queueing them in front of the database.
+"""
+
+logger = logging.getLogger(__name__)
+
+TEXT_PARAMS = ('search', 'title', 'description')
+
+
+def get_cache():
+    return caches[getattr(settings, 'TODO_THROTTLE_CACHE_ALIAS', 'default')]
+
+
+def spend(tat, now, cost, num_requests, duration):
+    """
+    spend `cost` tokens of a bucket of `num_requests` tokens refilled every
+    `duration` seconds, return the new arrival time and 0, or the unchanged
+    one and the seconds to wait
+    """
+    interval = duration / num_requests
+    new_tat = max(tat or now, now) + cost * interval
+    if new_tat - now > duration:
+        return tat, new_tat - now - duration
+    return new_tat, 0
+
+
+class LocalBuckets:
+    """
+    buckets of this process, used while the shared cache is unreachable
+    """
+    max_entries = 10000
+
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def take(self, key, cost, num_requests, duration):
+        now = time.time()
+        with self.lock:
+            if len(self.buckets) >= self.max_entries:
+                # full buckets carry no state
+                self.buckets = {key: tat for key, tat in self.buckets.items() if tat > now}
+            tat, wait = spend(self.buckets.get(key), now, cost, num_requests, duration)
+            if not wait:
+                self.buckets[key] = tat
+        return wait
+
+
+local_buckets = LocalBuckets()
+
+
+def take(key, cost, num_requests, duration):
+    """
+    take `cost` tokens from the bucket `key`, return 0 or the seconds to wait
+    """
+    now = time.time()
+    try:
+        cache = get_cache()
+        tat, wait = spend(cache.get(key), now, cost, num_requests, duration)
+        if not wait:
+            # get then set: concurrent requests may overdraw by a request or two
+            cache.set(key, tat, math.ceil(tat - now))
+        return wait
+    except InvalidCacheBackendError:
+        return local_buckets.take(key, cost, num_requests, duration)
+    except Exception:
+        logger.warning('throttle cache unreachable, using the buckets of the process', exc_info=True)
+        return local_buckets.take(key, cost, num_requests, duration)
+
+
+def parse_positive_int(value, default):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    return value if value > 0 else default
+
+
+def read_cost(request, pagination_class=None):
+    """
+    the tokens of a list read: text filters run a scan or a full text
+    search, deep page numbers make the database skip the rows before them
+    (cursor pages do not)
+    """
+    query_params = request.query_params
+    cost = 1
+    if any(query_params.get(param) for param in TEXT_PARAMS):
+        cost += getattr(settings, 'TODO_THROTTLE_TEXT_COST', 4)
+    if pagination_class is not None and query_params.get('pagination') != 'cursor':
+        page = parse_positive_int(query_params.get('page'), 1)
+        page_size = min(
+            parse_positive_int(query_params.get(pagination_class.page_size_query_param), pagination_class.page_size),
+            pagination_class.max_page_size,
+        )
+        cost += (page - 1) * page_size // getattr(settings, 'TODO_THROTTLE_DEEP_PAGE_ROWS', 1000)
+    return cost
+
+
+def write_cost(items):
+    """
+    the tokens of a bulk write of `items` todos
+    """
+    return 1 + items // getattr(settings, 'TODO_THROTTLE_BULK_ITEMS', 100)
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    drf throttle spending the cost of the request from a token bucket
+    """
+    cache_format = 'todo:throttle:%(scope)s:%(ident)s'
+
+    def __init__(self):
+        # the scope may come from the view, the rate is read in allow_request
+        self.wait_seconds = 0
+
+    def get_scope(self, view):
+        return self.scope
+
+    def get_rate(self):
+        # read on each request so override_settings and settings reloads apply
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def get_cache_key(self, request, view):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            ident = f'user:{user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def get_cost(self, request, view):
+        get_throttle_cost = getattr(view, 'get_throttle_cost', None)
+        return get_throttle_cost(request) if get_throttle_cost else 1
+
+    def allow_request(self, request, view):
+        self.scope = self.get_scope(view)
+        rate = self.get_rate() if self.scope else None
+        if rate is None:
+            return True
+        num_requests, duration = self.parse_rate(rate)
+        # a request costing more than the bucket holds would never pass
+        cost = min(self.get_cost(request, view), num_requests)
+        self.wait_seconds = take(self.get_cache_key(request, view), cost, num_requests, duration)
+        if self.wait_seconds:
+            metrics.THROTTLED.inc(scope=self.scope)
+            return False
+        return True
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class ClientRateThrottle(TokenBucketThrottle):
+    """
+    one bucket per client over every api
+    """
+    scope = 'client'
+
+
+class EndpointRateThrottle(TokenBucketThrottle):
+    """
+    one bucket per client and `throttle_scope` of the view
+    """
+    scope = None
+
+    def get_scope(self, view):
+        return getattr(view, 'throttle_scope', None)
+
+
+class ConcurrencyLimit:
+    """
+    the number of requests running in this process
+    """
+
+    def __init__(self):
+        self.active = 0
+        self.lock = threading.Lock()
+
+    def enter(self, limit):
+        with self.lock:
+            if limit and self.active >= limit:
+                return False
+            self.active += 1
+            return True
+
+    def leave(self):
+        with self.lock:
+            self.active -= 1
+
+
+in_flight = ConcurrencyLimit()
@@ -1,8 +1,18 @@
 from django.urls import path
 
-from todo import views
+from todo import views, async_views
 
 urlpatterns = [
+    path('token/', views.TodoTokenApiView.as_view(), name='token'),
     path('create_list/', views.TodoListCreateApiView.as_view(), name='create_list'),
-    path('update_delete_retrieve/<str:pk>',views.TodoDetailsApiView.as_view(), name='update_delete_retrieve')
+    path('update_delete_retrieve/<uuid:pk>', views.TodoDetailsApiView.as_view(), name='update_delete_retrieve'),
+    path('bulk/', views.TodoBulkApiView.as_view(), name='bulk'),
+    path('export/', views.TodoExportApiView.as_view(), name='export'),
+    path('sync/', views.TodoSyncApiView.as_view(), name='sync'),
+    path('stats/', views.TodoStatsApiView.as_view(), name='stats'),
+
+    path('async/create_list/', async_views.AsyncTodoListCreateView.as_view(), name='async_create_list'),
+    path('async/update_delete_retrieve/<uuid:pk>', async_views.AsyncTodoDetailsView.as_view(),
+         name='async_update_delete_retrieve'),
+    path('events/', async_views.TodoEventsView.as_view(), name='events'),
 ]
@@ -1,9 +1,20 @@
+import datetime
+import uuid
+
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from rest_framework import status, permissions
+from rest_framework.authtoken.models import Token
+from rest_framework.authtoken.serializers import AuthTokenSerializer
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from . import serializers, paginations, models
-from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse
+from . import (serializers, paginations, models, filters, cache, exports, routers, schema, sync, events, tasks,
+               throttling, stats, idempotency)
+from .schema import extend_schema, OpenApiParameter, OpenApiResponse
 
 """
     We can use ViewSets or Generic views for API optimization,
@@ -11,14 +22,56 @@ from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiRespon
     or customizing an API, using APIView is the best choice.
     This is why I use this technique. 
     But if you want, other options are also available.
+    Every api needs a token (see todo/authentication.py) and only reads and
+    writes the todos of its user.
 """
+class TodoTokenApiView(APIView):
+    """
+    this api give the token key of a user for its username and password,
+    like drf's obtain_auth_token, whose module does not import in the api
+    only profile (it has no schema class)
+    """
+    serializer_class = AuthTokenSerializer
+    authentication_classes = ()
+    permission_classes = ()
+
+    @extend_schema(tags=['Auth'],
+                   summary='this return the token to send as `Authorization: Token <key>`',
+                   request=serializer_class,
+                   responses={
+                       status.HTTP_200_OK: OpenApiResponse(
+                           description='{"token": "<key>"}, the same key on every call until it is deleted',
+                       ),
+                       status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+                           description='when the username or the password is wrong'
+                       )
+                   },
+                   )
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        token, _ = Token.objects.get_or_create(user=serializer.validated_data['user'])
+        return Response({'token': token.key})
+
+
 class TodoListCreateApiView(APIView):
     """
     this api do post and get http method
     """
     serializer_class = serializers.ToDoSerializer
-    permission_classes = (permissions.AllowAny,)
+    read_serializer_class = serializers.ToDoReadSerializer
+    permission_classes = (permissions.IsAuthenticated,)
     pagination_class = paginations.CustomPagination
+    cursor_pagination_class = paginations.CustomCursorPagination
+    throttle_scope = 'todo_list'
+
+    def get_paginator(self, request):
+        return paginations.select_paginator(request, self.pagination_class, self.cursor_pagination_class)
+
+    def get_throttle_cost(self, request):
+        if request.method != 'GET':
+            return 1
+        return throttling.read_cost(request, self.pagination_class)
 
     @extend_schema(tags=['ToDo'],
                    summary='this get all todo information or'
@@ -29,43 +82,57 @@ class TodoListCreateApiView(APIView):
                            description='i see this status when'
                                        'the api work great',
                        ),
+                       status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+                           description='when a filter or the ordering is not valid, '
+                                       'the errors are keyed by query param'
+                       ),
                        status.HTTP_404_NOT_FOUND: OpenApiResponse(
                            description='i see this status when'
                                        'i have not any response from'
                                        'database'
                        )
                    },
-                   parameters=[
+                   parameters=filters.TodoFilterSet.parameters() + [
+                       OpenApiParameter(
+                           name='pagination',
+                           location=OpenApiParameter.QUERY,
+                           type=str,
+                           enum=['page', 'cursor'],
+                           description='cursor mode skips the total count',
+                       ),
+                       OpenApiParameter(
+                           name='cursor',
+                           location=OpenApiParameter.QUERY,
+                           type=str,
+                       ),
                        OpenApiParameter(
-                           name=field,
+                           name='count',
                            location=OpenApiParameter.QUERY,
-                           type=type(field),
-                       ) for field in serializer_class().fields.keys()
+                           type=str,
+                           enum=list(paginations.CustomPagination.count_strategies),
+                           description='how the page number mode counts the rows, '
+                                       'capped and estimate report "<cap>+" past TODO_COUNT_CAP',
+                       ),
                    ]
                    )
+    @routers.replica_reads
     def get(self, request):
-        todo_s = models.Todo.objects.all()
+        key = cache.list_key(request)
+        entry = cache.get_entry(key)
+        if entry is None:
+            entry = cache.set_entry(key, self.get_page_entry(request))
+        return cache.cached_response(request, entry)
 
-        due_date = request.query_params.get('due_date', None)
-        if due_date:
-            todo_s = todo_s.filter(due_date=due_date)
+    def get_page_entry(self, request):
+        todo_s = filters.filter_todos(models.Todo.objects.owned_by(request.user), request.query_params)
 
-        created_at = request.query_params.get('created_at', None)
-        if created_at:
-            todo_s = todo_s.filter(created_at=created_at)
+        paginator = self.get_paginator(request)
+        page = paginator.paginate_queryset(self.read_serializer_class.get_queryset(todo_s), request=request)
 
-        title = request.query_params.get('title', None)
-        if title:
-            todo_s = todo_s.filter(title__icontains=title)
-        description = request.query_params.get('description', None)
-        if description:
-            todo_s = todo_s.filter(description__icontains=description)
-
-        paginator = self.pagination_class()
-        page = paginator.paginate_queryset(todo_s, request=request)
-
-        serializer = self.serializer_class(page, many=True)
-        return paginator.get_paginated_response(serializer.data)
+        serializer = self.read_serializer_class(page, many=True)
+        data = paginator.get_paginated_response(serializer.data).data
+        # no Last-Modified here, a delete changes the page but not max(updated_at)
+        return cache.make_entry(data, cache.etag_for_data(data))
 
     @extend_schema(tags=['ToDo'],
                    summary='this post todo information to server',
@@ -80,18 +147,13 @@ class TodoListCreateApiView(APIView):
                                        'is see the response'
                        )
                    },
-                   parameters=[
-                       OpenApiParameter(
-                           name=field,
-                           location=OpenApiParameter.QUERY,
-                           type=type(field),
-                       ) for field in serializer_class().fields.keys()
-                   ]
+                   parameters=schema.field_parameters(serializer_class)
                    )
+    @idempotency.idempotent
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        serializer.save(owner=request.user)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
@@ -100,7 +162,8 @@ class TodoDetailsApiView(APIView):
     this api do get put and retrieve http method
     """
     serializer_class = serializers.ToDoSerializer
-    permission_classes = (permissions.AllowAny,)
+    permission_classes = (permissions.IsAuthenticated,)
+    throttle_scope = 'todo_detail'
 
     @extend_schema(tags=['ToDo'],
                    summary='this get specific todo information from server',
@@ -111,22 +174,23 @@ class TodoDetailsApiView(APIView):
                                        'the api get that work great',
                        )
                    },
-                   parameters=[
-                       OpenApiParameter(
-                           name=field,
-                           location=OpenApiParameter.QUERY,
-                           type=type(field),
-                       ) for field in serializer_class().fields.keys()
-                   ]
+                   parameters=schema.field_parameters(serializer_class)
                    )
+    @routers.replica_reads
     def get(self, request, pk):
-        try:
-            todo = models.Todo.objects.get(id=pk)
-        except ObjectDoesNotExist:
-            return Response(status=status.HTTP_404_NOT_FOUND)
+        key = cache.detail_key(request.user.pk, pk)
+        entry = cache.get_entry(key)
+        if entry is None:
+            try:
+                todo = models.Todo.objects.owned_by(request.user).get(id=pk)
+            except ObjectDoesNotExist:
+                return Response(status=status.HTTP_404_NOT_FOUND)
 
-        serializer = self.serializer_class(todo)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+            serializer = self.serializer_class(todo)
+            entry = cache.set_entry(key, cache.make_entry(
+                serializer.data, cache.etag_for_updated_at(todo.updated_at), todo.updated_at,
+            ))
+        return cache.cached_response(request, entry)
 
     @extend_schema(tags=['ToDo'],
                    summary='this get specific todo information from server',
@@ -141,24 +205,67 @@ class TodoDetailsApiView(APIView):
                                        'is see the response'
                        )
                    },
-                   parameters=[
-                       OpenApiParameter(
-                           name=field,
-                           location=OpenApiParameter.QUERY,
-                           type=type(field),
-                       ) for field in serializer_class().fields.keys()
-                   ]
+                   parameters=schema.field_parameters(serializer_class)
                    )
     def put(self, request, pk):
-        try:
-            todo = models.Todo.objects.get(id=pk)
-        except ObjectDoesNotExist:
-            return Response(status=status.HTTP_404_NOT_FOUND)
+        return self.write(request, pk, partial=False)
+
+    @extend_schema(tags=['ToDo'],
+                   summary='this partially update specific todo, only the sent fields are written',
+                   request=serializer_class(partial=True),
+                   responses={
+                       status.HTTP_200_OK: OpenApiResponse(
+                           response=serializer_class,
+                           description='i see this status when'
+                                       'the api patch that work great',
+                       ),
+                       status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+                           description='when my api`s body is not valid'
+                                       'is see the response'
+                       ),
+                       status.HTTP_412_PRECONDITION_FAILED: OpenApiResponse(
+                           description='the If-Match etag is not the current one'
+                       )
+                   },
+                   )
+    def patch(self, request, pk):
+        return self.write(request, pk, partial=True)
+
+    def get_write_queryset(self, request, pk):
+        """
+        the todo to write, restricted to the If-Match etags when the client
+        sends them (optimistic concurrency on updated_at)
+        """
+        todo_s = models.Todo.objects.owned_by(request.user).filter(id=pk)
+        updated_at = cache.updated_at_from_if_match(request)
+        if updated_at is not None:
+            todo_s = todo_s.filter(updated_at__in=updated_at)
+        return todo_s
 
-        serializer = self.serializer_class(todo, data=request.data)
+    def missing_response(self, request, pk):
+        """
+        nothing was written, tell apart a missing todo from a stale etag
+        """
+        if request.headers.get('If-Match') and models.Todo.objects.owned_by(request.user).filter(id=pk).exists():
+            return Response(status=status.HTTP_412_PRECONDITION_FAILED)
+        return Response(status=status.HTTP_404_NOT_FOUND)
+
+    @idempotency.idempotent
+    def write(self, request, pk, partial):
+        serializer = self.serializer_class(data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return Response(serializer.data, status=status.HTTP_200_OK)
+
+        todo_s = self.get_write_queryset(request, pk).update_returning(**serializer.validated_data)
+        if not todo_s:
+            return self.missing_response(request, pk)
+
+        cache.invalidate_todos(request.user.pk, [pk])
+        todo = todo_s[0]
+        data = self.serializer_class(todo).data
+        events.publish('updated', [data], request.user.pk)
+        tasks.enqueue_due_checks([data])
+        return Response(data, status=status.HTTP_200_OK,
+                        headers={'ETag': cache.etag_for_updated_at(todo.updated_at)})
 
     @extend_schema(tags=['ToDo'],
                    summary='this get specific todo information from server',
@@ -169,19 +276,300 @@ class TodoDetailsApiView(APIView):
                                        'the api delete that work great',
                        )
                    },
+                   parameters=schema.field_parameters(serializer_class)
+                   )
+    def delete(self, request, pk):
+        if not self.get_write_queryset(request, pk).delete_returning():
+            return self.missing_response(request, pk)
+
+        cache.invalidate_todos(request.user.pk, [pk])
+        events.publish('deleted', [{'id': pk}], request.user.pk)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class TodoBulkApiView(APIView):
+    """
+    this api create, update and delete many todos in one request,
+    every method runs a fixed number of queries whatever the size of the batch
+    """
+    serializer_class = serializers.ToDoSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+    throttle_scope = 'todo_bulk'
+
+    def get_serializer(self, *args, **kwargs):
+        return self.serializer_class(
+            *args, many=True, max_length=serializers.ToDoListSerializer.get_max_items(), **kwargs
+        )
+
+    def get_throttle_cost(self, request):
+        items = request.data
+        if isinstance(items, dict):
+            items = items.get('ids')
+        return throttling.write_cost(len(items) if isinstance(items, list) else 0)
+
+    @extend_schema(tags=['ToDo'],
+                   summary='this post a list of todo information to server',
+                   request=serializer_class(many=True),
+                   responses={
+                       status.HTTP_201_CREATED: OpenApiResponse(
+                           response=serializer_class(many=True),
+                           description='i see this status when'
+                                       'all of the todos are created',
+                       ),
+                       status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+                           description='a list with the errors of every'
+                                       'item, nothing is created'
+                       )
+                   },
+                   )
+    @idempotency.idempotent
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(owner=request.user)
+        # bulk_create does not send post_save
+        cache.invalidate_todos(request.user.pk)
+        events.publish('created', serializer.data, request.user.pk)
+        tasks.enqueue_due_checks(serializer.data)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @idempotency.idempotent
+    def bulk_update(self, request, partial):
+        ids = []
+        if isinstance(request.data, list):
+            for item in request.data:
+                try:
+                    ids.append(uuid.UUID(str(item.get('id'))))
+                except (AttributeError, ValueError):
+                    continue
+        todo_s = models.Todo.objects.owned_by(request.user).in_bulk(ids)
+
+        serializer = self.get_serializer(todo_s, data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        # bulk_update does not send post_save
+        cache.invalidate_todos(request.user.pk, todo_s.keys())
+        events.publish('updated', serializer.data, request.user.pk)
+        tasks.enqueue_due_checks(serializer.data)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @extend_schema(tags=['ToDo'],
+                   summary='this update a list of todo, every item need its id',
+                   request=serializer_class(many=True),
+                   responses={
+                       status.HTTP_200_OK: OpenApiResponse(
+                           response=serializer_class(many=True),
+                           description='i see this status when'
+                                       'all of the todos are updated',
+                       ),
+                       status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+                           description='a list with the errors of every'
+                                       'item, nothing is updated'
+                       )
+                   },
+                   )
+    def put(self, request):
+        return self.bulk_update(request, partial=False)
+
+    @extend_schema(tags=['ToDo'],
+                   summary='this partially update a list of todo, every item need its id',
+                   request=serializer_class(many=True),
+                   responses={
+                       status.HTTP_200_OK: OpenApiResponse(
+                           response=serializer_class(many=True),
+                           description='i see this status when'
+                                       'all of the todos are updated',
+                       ),
+                       status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+                           description='a list with the errors of every'
+                                       'item, nothing is updated'
+                       )
+                   },
+                   )
+    def patch(self, request):
+        return self.bulk_update(request, partial=True)
+
+    @extend_schema(tags=['ToDo'],
+                   summary='this delete a list of todo by their ids',
+                   request=serializers.BulkDeleteSerializer,
+                   responses={
+                       status.HTTP_200_OK: OpenApiResponse(
+                           description='the number of deleted todos',
+                       ),
+                       status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+                           description='when my api`s body is not valid'
+                                       'is see the response'
+                       )
+                   },
+                   )
+    def delete(self, request):
+        serializer = serializers.BulkDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        ids = serializer.validated_data['ids']
+        todo_s = models.Todo.objects.owned_by(request.user).filter(id__in=ids)
+        deleted = {todo.pk for todo in todo_s.delete_returning()}
+        cache.invalidate_todos(request.user.pk, deleted)
+        events.publish('deleted', [{'id': pk} for pk in deleted], request.user.pk)
+        return Response({
+            'deleted': len(deleted),
+            'not_found': [pk for pk in dict.fromkeys(ids) if pk not in deleted],
+        }, status=status.HTTP_200_OK)
+
+
+class TodoExportApiView(APIView):
+    """
+    this api stream every todo matching the list filters as ndjson or csv
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+    throttle_scope = 'todo_export'
+
+    def get_throttle_cost(self, request):
+        return throttling.read_cost(request)
+
+    @extend_schema(tags=['ToDo'],
+                   summary='this export all todo (or the filtered ones) in one streamed response',
+                   responses={
+                       status.HTTP_200_OK: OpenApiResponse(
+                           description='one json object per line or csv rows',
+                       ),
+                       status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+                           description='when the output format is unknown',
+                       )
+                   },
+                   parameters=filters.TodoFilterSet.parameters() + [
+                       OpenApiParameter(
+                           name='output',
+                           location=OpenApiParameter.QUERY,
+                           type=str,
+                           enum=list(exports.FORMATS),
+                           default='ndjson',
+                       ),
+                   ]
+                   )
+    def get(self, request):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in exports.FORMATS:
+            return Response({'output': [f'choose one of {", ".join(exports.FORMATS)}.']},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        todo_s = filters.filter_todos(models.Todo.objects.owned_by(request.user), request.query_params)
+        format_class = exports.FORMATS[output]
+        # under asgi a sync iterator is read whole before the response starts
+        stream = exports.astream if isinstance(request._request, ASGIRequest) else exports.stream
+        response = StreamingHttpResponse(stream(format_class, todo_s), content_type=format_class.content_type)
+        response['Content-Disposition'] = f'attachment; filename="todos.{output}"'
+        return response
+
+
+class TodoSyncApiView(APIView):
+    """
+    this api return the todos created, updated or deleted since the
+    client's watermark, see todo/sync.py
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+    throttle_scope = 'todo_sync'
+    default_limit = 500
+    max_limit = 1000
+
+    @extend_schema(tags=['ToDo'],
+                   summary='this get the changes of the todo list since the last sync',
+                   responses={
+                       status.HTTP_200_OK: OpenApiResponse(
+                           description='the changes in (changed_at, id) order, deletes have '
+                                       '"deleted": true, plus the watermark of the next sync',
+                       ),
+                       status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+                           description='when the watermark or the limit is not valid',
+                       ),
+                       status.HTTP_410_GONE: OpenApiResponse(
+                           description='when the watermark is older than the kept tombstones, '
+                                       'sync again without one',
+                       )
+                   },
                    parameters=[
                        OpenApiParameter(
-                           name=field,
+                           name='since',
+                           location=OpenApiParameter.QUERY,
+                           type=str,
+                           description='watermark of the previous sync, empty for a first sync',
+                       ),
+                       OpenApiParameter(
+                           name='limit',
                            location=OpenApiParameter.QUERY,
-                           type=type(field),
-                       ) for field in serializer_class().fields.keys()
+                           type=int,
+                           default=default_limit,
+                       ),
                    ]
                    )
-    def delete(self, request, pk):
+    @routers.replica_reads
+    def get(self, request):
         try:
-            todo = models.Todo.objects.get(id=pk)
-        except ObjectDoesNotExist:
-            return Response(status=status.HTTP_404_NOT_FOUND)
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            return Response({'limit': ['A positive integer is required.']}, status=status.HTTP_400_BAD_REQUEST)
 
-        todo.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        changes, watermark, has_more = sync.get_changes(request.query_params.get('since'), limit, request.user.pk)
+        return Response({'changes': changes, 'watermark': watermark, 'has_more': has_more})
+
+
+class TodoStatsApiView(APIView):
+    """
+    this api return the dashboard numbers of the todos of the user: open,
+    completed and overdue todos and the todos due per day, see todo/stats.py
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+    throttle_scope = 'todo_stats'
+    default_days = 30
+
+    @extend_schema(tags=['ToDo'],
+                   summary='this get the number of open, completed and overdue todos and the todos due per day',
+                   responses={
+                       status.HTTP_200_OK: OpenApiResponse(
+                           description='total, open, completed and overdue counts, plus the open and '
+                                       'completed todos per due day (utc) from `from` to `to`',
+                       ),
+                       status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+                           description='when a date is not valid or the range is longer than TODO_STATS_MAX_DAYS',
+                       )
+                   },
+                   parameters=[
+                       OpenApiParameter(
+                           name='from',
+                           location=OpenApiParameter.QUERY,
+                           type=datetime.date,
+                           description='first due day of due_per_day, today by default',
+                       ),
+                       OpenApiParameter(
+                           name='to',
+                           location=OpenApiParameter.QUERY,
+                           type=datetime.date,
+                           description=f'last due day of due_per_day, {default_days} days after `from` by default',
+                       ),
+                   ]
+                   )
+    @routers.replica_reads
+    def get(self, request):
+        errors = {}
+        days = {}
+        for param in ('from', 'to'):
+            value = request.query_params.get(param)
+            try:
+                days[param] = parse_date(value) if value else None
+            except ValueError:
+                days[param] = None
+            if value and days[param] is None:
+                errors[param] = ['Enter a valid date.']
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        start = days['from'] or timezone.now().astimezone(datetime.timezone.utc).date()
+        end = days['to'] or start + datetime.timedelta(days=self.default_days)
+        max_days = getattr(settings, 'TODO_STATS_MAX_DAYS', 366)
+        if not 0 <= (end - start).days < max_days:
+            return Response({'to': [f'Must be on or after `from` and less than {max_days} days after it.']},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(stats.get_stats(request.user.pk, models.Todo.objects.owned_by(request.user), start, end))
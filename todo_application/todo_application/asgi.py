@@ -13,4 +13,19 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'todo_application.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from todo import events  # noqa: E402, needs the apps loaded by get_asgi_application
+
+
+async def application(scope, receive, send):
+    """
+    django answers http, the websocket flavour of the todo change feed
+    (/api/todo/events/ is the server sent events one) is a plain asgi app
+    """
+    if scope['type'] == 'websocket':
+        if scope['path'] == '/ws/todo/events/':
+            return await events.websocket_application(scope, receive, send)
+        await receive()
+        return await send({'type': 'websocket.close', 'code': 1000})
+    return await django_application(scope, receive, send)
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 from pathlib import Path
+import importlib.util
 import os, dotenv
 
 dotenv.load_dotenv()
@@ -38,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'todo.apps.TodoConfig',
     'rest_framework',
+    'rest_framework.authtoken',
     'drf_spectacular'
 ]
 
@@ -45,9 +47,13 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # a header per request, no session lookup and no csrf check, see todo/authentication.py
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
+        'todo.authentication.CachedTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'todo.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
@@ -61,6 +67,10 @@ SPECTACULAR_SETTINGS = {
 }
 
 MIDDLEWARE = [
+    'todo.middleware.MetricsMiddleware',
+    'todo.middleware.AdmissionMiddleware',
+    'todo.middleware.ReplicaPinningMiddleware',
+    'todo.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -101,12 +111,67 @@ DATABASES = {
         'PASSWORD': os.environ.get('PASSWORD'),
         'HOST': os.environ.get('HOST'),
         'PORT': os.environ.get('PORT'),
+        # keep connections open for DB_CONN_MAX_AGE seconds instead of one
+        # handshake per request, 0 closes them at the end of each request
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
         'TEST': {
             'NAME': os.environ.get('NAME_TEST'),
         }
     }
 }
 
+# DB_POOL=1 uses the connection pool of psycopg 3 (pip install "psycopg[pool]")
+# instead of persistent connections, django requires CONN_MAX_AGE 0 with it
+
+if os.environ.get('DB_POOL', '').lower() in ('1', 'true', 'yes'):
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+        'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+    }
+
+# read replicas, a comma separated list of hosts in REPLICA_HOSTS, they
+# share the name and credentials of the primary unless REPLICA_NAME,
+# REPLICA_USER_DB, REPLICA_PASSWORD or REPLICA_PORT are set.
+# the list and detail reads go to the replicas, see todo/routers.py
+
+TODO_READ_REPLICAS = []
+
+for index, replica_host in enumerate(filter(None, os.environ.get('REPLICA_HOSTS', '').split(','))):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        'NAME': os.environ.get('REPLICA_NAME', DATABASES['default']['NAME']),
+        'USER': os.environ.get('REPLICA_USER_DB', DATABASES['default']['USER']),
+        'PASSWORD': os.environ.get('REPLICA_PASSWORD', DATABASES['default']['PASSWORD']),
+        'HOST': replica_host.strip(),
+        'PORT': os.environ.get('REPLICA_PORT', DATABASES['default']['PORT']),
+        # tests read the rows they wrote to the primary
+        'TEST': {'MIRROR': 'default'},
+    }
+    TODO_READ_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['todo.routers.PrimaryReplicaRouter']
+
+# a client reads from the primary for TODO_REPLICA_PIN_SECONDS after a write,
+# keep it above the replication lag
+
+TODO_REPLICA_PIN_SECONDS = int(os.environ.get('TODO_REPLICA_PIN_SECONDS', 5))
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'todo-application'),
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -145,3 +210,152 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Todo api
+# bulk endpoints split their writes in batches of TODO_BULK_BATCH_SIZE rows
+# and refuse requests with more than TODO_BULK_MAX_ITEMS items
+
+TODO_BULK_BATCH_SIZE = int(os.environ.get('TODO_BULK_BATCH_SIZE', 500))
+
+TODO_BULK_MAX_ITEMS = int(os.environ.get('TODO_BULK_MAX_ITEMS', 10000))
+
+# todo read apis cache their responses for TODO_CACHE_TTL seconds, 0 disables it
+
+TODO_CACHE_TTL = int(os.environ.get('TODO_CACHE_TTL', 60))
+
+# the export api reads TODO_EXPORT_CHUNK_SIZE rows per round trip of its server side cursor
+
+TODO_EXPORT_CHUNK_SIZE = int(os.environ.get('TODO_EXPORT_CHUNK_SIZE', 2000))
+
+# queries slower than TODO_SLOW_QUERY_MS milliseconds are logged to the todo.slow_queries logger
+
+TODO_SLOW_QUERY_MS = float(os.environ.get('TODO_SLOW_QUERY_MS', 200))
+
+# page number lists count their rows with TODO_COUNT_STRATEGY (exact, capped, estimate or none),
+# capped and estimate stop counting past TODO_COUNT_CAP rows, counts are cached for TODO_COUNT_CACHE_TTL seconds
+
+TODO_COUNT_STRATEGY = os.environ.get('TODO_COUNT_STRATEGY', 'exact')
+
+TODO_COUNT_CAP = int(os.environ.get('TODO_COUNT_CAP', 10000))
+
+TODO_COUNT_CACHE_TTL = int(os.environ.get('TODO_COUNT_CACHE_TTL', 30))
+
+# `manage.py build_schema` writes the openapi schema to TODO_SCHEMA_DIR, /api/schema/ serves it from there
+
+TODO_SCHEMA_DIR = os.environ.get('TODO_SCHEMA_DIR', BASE_DIR / 'build' / 'schema')
+
+# responses of TODO_COMPRESS_MIN_SIZE bytes or more are compressed (zstd, br or gzip)
+
+TODO_COMPRESS_MIN_SIZE = int(os.environ.get('TODO_COMPRESS_MIN_SIZE', 1024))
+
+# internal clients can ask for MessagePack with `Accept: application/msgpack` when it is installed
+
+if importlib.util.find_spec('msgpack') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].insert(1, 'todo.renderers.MessagePackRenderer')
+
+# the sync api holds back changes younger than TODO_SYNC_LAG_SECONDS so late commits are not skipped,
+# tombstones of deleted todos are kept TODO_TOMBSTONE_RETENTION_DAYS (see `manage.py purge_tombstones`)
+
+TODO_SYNC_LAG_SECONDS = float(os.environ.get('TODO_SYNC_LAG_SECONDS', 2))
+
+TODO_TOMBSTONE_RETENTION_DAYS = int(os.environ.get('TODO_TOMBSTONE_RETENTION_DAYS', 30))
+
+# the change feed (/api/todo/events/, ws /ws/todo/events/) fans out through TODO_EVENTS_BROKER,
+# todo.events.InMemoryBroker within one process or todo.events.PostgresBroker across processes,
+# the last TODO_EVENTS_BUFFER_SIZE events can be replayed to a reconnecting client
+
+TODO_EVENTS_BROKER = os.environ.get('TODO_EVENTS_BROKER', 'todo.events.InMemoryBroker')
+
+TODO_EVENTS_BUFFER_SIZE = int(os.environ.get('TODO_EVENTS_BUFFER_SIZE', 1000))
+
+TODO_EVENTS_QUEUE_SIZE = int(os.environ.get('TODO_EVENTS_QUEUE_SIZE', 100))
+
+TODO_EVENTS_HEARTBEAT_SECONDS = float(os.environ.get('TODO_EVENTS_HEARTBEAT_SECONDS', 15))
+
+# on postgres 13+ the todo table is partitioned by month of due_date (migration 0007, set
+# TODO_PARTITION_TODOS=0 before migrating to keep a plain table), `manage.py todo_partitions`
+# keeps TODO_PARTITION_MONTHS_AHEAD months of partitions ready
+
+TODO_PARTITION_TODOS = os.environ.get('TODO_PARTITION_TODOS', '1').lower() in ('1', 'true', 'yes')
+
+TODO_PARTITION_MONTHS_AHEAD = int(os.environ.get('TODO_PARTITION_MONTHS_AHEAD', 3))
+
+# background jobs (todo/jobs.py, todo/tasks.py) run in `manage.py run_workers`, a worker claims
+# TODO_JOB_BATCH_SIZE jobs at a time, polls every TODO_JOB_POLL_SECONDS when the queue is empty,
+# and jobs running longer than TODO_JOB_TIMEOUT_SECONDS are taken back, finished jobs are kept
+# TODO_JOB_RETENTION_DAYS
+
+TODO_JOB_BATCH_SIZE = int(os.environ.get('TODO_JOB_BATCH_SIZE', 10))
+
+TODO_JOB_POLL_SECONDS = float(os.environ.get('TODO_JOB_POLL_SECONDS', 1))
+
+TODO_JOB_TIMEOUT_SECONDS = int(os.environ.get('TODO_JOB_TIMEOUT_SECONDS', 300))
+
+TODO_JOB_RETENTION_DAYS = int(os.environ.get('TODO_JOB_RETENTION_DAYS', 7))
+
+# every TODO_DUE_SCAN_SECONDS the not completed todos due within TODO_DUE_SOON_SECONDS, or overdue,
+# are notified on the change feed, TODO_DUE_SCAN_BATCH_SIZE todos per query
+
+TODO_DUE_SCAN_SECONDS = int(os.environ.get('TODO_DUE_SCAN_SECONDS', 60))
+
+TODO_DUE_SOON_SECONDS = int(os.environ.get('TODO_DUE_SOON_SECONDS', 3600))
+
+TODO_DUE_SCAN_BATCH_SIZE = int(os.environ.get('TODO_DUE_SCAN_BATCH_SIZE', 1000))
+
+# the apis authenticate with `Authorization: Token <key>` (POST /api/todo/token/ issues one),
+# the user of a key is cached TODO_TOKEN_CACHE_TTL seconds, 0 looks it up on every request
+
+TODO_TOKEN_CACHE_TTL = int(os.environ.get('TODO_TOKEN_CACHE_TTL', 60))
+
+# every client has a token bucket over all the apis and one per endpoint (todo/throttling.py), the
+# rates are drf rates ('600/min' holds 600 tokens, refilled 10 a second), text filters cost
+# TODO_THROTTLE_TEXT_COST more tokens, page numbers one more per TODO_THROTTLE_DEEP_PAGE_ROWS rows
+# skipped and bulk writes one more per TODO_THROTTLE_BULK_ITEMS todos, the buckets live in the
+# TODO_THROTTLE_CACHE_ALIAS cache
+
+REST_FRAMEWORK['DEFAULT_THROTTLE_CLASSES'] = [
+    'todo.throttling.ClientRateThrottle',
+    'todo.throttling.EndpointRateThrottle',
+]
+
+REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] = {
+    'client': os.environ.get('TODO_THROTTLE_CLIENT_RATE', '1200/min'),
+    'todo_list': os.environ.get('TODO_THROTTLE_LIST_RATE', '600/min'),
+    'todo_detail': os.environ.get('TODO_THROTTLE_DETAIL_RATE', '1200/min'),
+    'todo_bulk': os.environ.get('TODO_THROTTLE_BULK_RATE', '120/min'),
+    'todo_export': os.environ.get('TODO_THROTTLE_EXPORT_RATE', '30/min'),
+    'todo_sync': os.environ.get('TODO_THROTTLE_SYNC_RATE', '600/min'),
+    'todo_stats': os.environ.get('TODO_THROTTLE_STATS_RATE', '120/min'),
+}
+
+TODO_THROTTLE_CACHE_ALIAS = os.environ.get('TODO_THROTTLE_CACHE_ALIAS', 'default')
+
+TODO_THROTTLE_TEXT_COST = int(os.environ.get('TODO_THROTTLE_TEXT_COST', 4))
+
+TODO_THROTTLE_DEEP_PAGE_ROWS = int(os.environ.get('TODO_THROTTLE_DEEP_PAGE_ROWS', 1000))
+
+TODO_THROTTLE_BULK_ITEMS = int(os.environ.get('TODO_THROTTLE_BULK_ITEMS', 100))
+
+# at most TODO_MAX_CONCURRENT_REQUESTS requests run at a time in a worker process (0 for no cap),
+# the next ones get 503 with `Retry-After: TODO_ADMISSION_RETRY_AFTER` instead of waiting for
+# a database connection, keep it around the connections a process may open
+
+TODO_MAX_CONCURRENT_REQUESTS = int(os.environ.get('TODO_MAX_CONCURRENT_REQUESTS', 100))
+
+TODO_ADMISSION_RETRY_AFTER = int(os.environ.get('TODO_ADMISSION_RETRY_AFTER', 1))
+
+# the stats api (/api/todo/stats/) reads the ToDO_daily_stats summary kept by triggers on the todo
+# table (migration 0010, `manage.py rebuild_stats`), with TODO_STATS_SUMMARY=0 it counts the todos
+# in one grouped query instead, due_per_day spans at most TODO_STATS_MAX_DAYS days
+
+TODO_STATS_SUMMARY = os.environ.get('TODO_STATS_SUMMARY', '1').lower() in ('1', 'true', 'yes')
+
+TODO_STATS_MAX_DAYS = int(os.environ.get('TODO_STATS_MAX_DAYS', 366))
+
+# a write sent with an `Idempotency-Key` header keeps its response for TODO_IDEMPOTENCY_TTL_SECONDS
+# (ToDO_idempotency_key, purged daily by the todo.purge_idempotency_keys job), retries get it back,
+# a key left locked by a dead request is taken over after TODO_IDEMPOTENCY_LOCK_SECONDS
+
+TODO_IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('TODO_IDEMPOTENCY_TTL_SECONDS', 24 * 60 * 60))
+
+TODO_IDEMPOTENCY_LOCK_SECONDS = int(os.environ.get('TODO_IDEMPOTENCY_LOCK_SECONDS', 60))
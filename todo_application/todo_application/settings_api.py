@@ -0,0 +1,50 @@
+"""
+API only settings profile of todo_application.
+
+Serve the JSON endpoints with only what they need, for the workers behind
+the load balancer:
+
+    DJANGO_SETTINGS_MODULE=todo_application.settings_api gunicorn todo_application.wsgi
+
+No admin, sessions, messages, CSRF, templates, static files, browsable api
+or drf_spectacular: those stay in todo_application.settings, which is the
+profile to run migrations, the admin and the schema views with.
+`python manage.py benchmark --suite startup` compares both profiles.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    # drf resolves request.user to an AnonymousUser from contrib.auth
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'todo.apps.TodoConfig',
+    'rest_framework',
+    'rest_framework.authtoken',
+]
+
+MIDDLEWARE = [
+    'todo.middleware.MetricsMiddleware',
+    'todo.middleware.AdmissionMiddleware',
+    'todo.middleware.ReplicaPinningMiddleware',
+    'todo.middleware.CompressionMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+ROOT_URLCONF = 'todo_application.urls_api'
+
+TEMPLATES = []
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,  # noqa: F405
+    # no session middleware, so no session authentication
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'todo.authentication.CachedTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        renderer for renderer in REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES']  # noqa: F405
+        if renderer != 'rest_framework.renderers.BrowsableAPIRenderer'
+    ],
+    'DEFAULT_SCHEMA_CLASS': None,
+}
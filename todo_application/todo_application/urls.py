@@ -17,11 +17,16 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from todo.metrics import metrics_view
+from todo.schema import PrecomputedSchemaView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/todo/', include('todo.urls')),
 
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
+    # served from `manage.py build_schema`, generated on each hit until it is built
+    path('api/schema/', PrecomputedSchemaView.as_view(fallback=SpectacularAPIView.as_view()), name='schema'),
     path('api/schema/swagger-ui/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
+
+    path('metrics', metrics_view, name='metrics'),
 ]
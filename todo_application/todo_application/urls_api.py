@@ -0,0 +1,11 @@
+"""
+URL configuration of the API only settings profile, see settings_api.py.
+"""
+from django.urls import path, include
+from todo.metrics import metrics_view
+
+urlpatterns = [
+    path('api/todo/', include('todo.urls')),
+
+    path('metrics', metrics_view, name='metrics'),
+]